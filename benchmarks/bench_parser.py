@@ -0,0 +1,160 @@
+"""
+Compare the single-pass profile parser with the original BeautifulSoup implementation.
+
+Runs both parsers over the saved profile pages in benchmarks/fixtures and reports the time per
+page and the peak memory allocated while parsing one page.
+
+    python benchmarks/bench_parser.py [--iterations 50]
+
+The fixtures are reduced, synthetic Healthgrades profile pages that reproduce the markup the
+scraper reads (summary card, meta tags, pageState and utag_data scripts) with filler content.
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+sys.path.insert(0, str(REPO_ROOT))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from search_agent.parser import parse_profile  # noqa: E402
+
+
+def parse_with_soup(url, content):
+    """The BeautifulSoup implementation the profile tool used before search_agent.parser."""
+    try:
+        state = 'parse'
+
+        soup = BeautifulSoup(content, 'html.parser')
+
+        # Doctor name
+        state = 'name'
+        name = soup.find('h1', class_='summary-provider-name').text.strip()
+
+        # Specialty
+        state = 'specialty'
+        specialty = soup.find('div', class_='speciality-name-text').text.replace('*', '').strip()
+
+        # Years of experience
+        state = 'experience'
+        try:
+            experience = soup.find('div', class_='years-of-experience-text').text.split(' ')[0].replace('+', '').strip()
+            experience = f'{experience} years'
+        except AttributeError:
+            experience = 'not listed'
+
+        # Biography
+        state = 'bio'
+        bio = soup.find('p', attrs={'data-qa-target': 'premium-biography'}).text.strip()
+
+        # Address
+        state = 'address'
+        address = soup.find('address').text.strip()
+
+        # Conditions
+        state = 'conditions'
+        conditions = [
+            condition.split(':')[-1].strip()
+            for condition in soup.find('meta', attrs={'name': 'conditions'})['content'].split(',')
+        ]
+
+        # Procedures
+        state = 'procedures'
+        procedures = [
+            procedure.split(':')[-1].strip()
+            for procedure in soup.find('meta', attrs={'name': 'procedures'})['content'].split(',')
+        ]
+
+        # Review score and quantity
+        state = 'review'
+        score = soup.find('span', class_='score').text.strip()
+        qty_reviews = soup.find('span', class_='review-summary-horizontal-scroll__content').text.split(' ')[0].strip()
+
+        # Insurance data (from embedded script)
+        state = 'insurance'
+        try:
+            insurance_script = soup.find_all('script')[6]
+            insurance_data = None
+            for script in insurance_script.string.split('HG3.profile.pageState || ')[1].split(';'):
+                if 'insuranceAccepted' in script:
+                    insurance_data = dict(json.loads(script))['providerProfileModel']['insuranceAccepted']
+                    break
+        except:
+            insurance_data = None
+
+        # Accepting new patients (from utag_data script)
+        state = 'accepting_new_patients'
+        script = soup.find('script', string=re.compile(r'utag_data'))
+        raw_js = script.string
+        pattern = re.compile(r"utag_data\['(.*?)'\]\s*=\s*\"(.*?)\";")
+        utag_dict = dict(pattern.findall(raw_js))
+        accepting_new_patients = utag_dict.get('AcceptNewPatients') == 'yes'
+
+        return {
+            'name': name,
+            'url': url,
+            'specialty': specialty,
+            'experience': experience,
+            'bio': bio,
+            'address': address,
+            'conditions': conditions,
+            'procedures': procedures,
+            'insurance_data': insurance_data,
+            'score': score,
+            'qty_reviews': qty_reviews,
+            'accepting_new_patients': accepting_new_patients
+        }
+
+    except Exception as e:
+        import traceback
+        tb = traceback.extract_tb(e.__traceback__)
+        return f'Error in state {state} on line {tb[-1].lineno}: {e}'
+
+
+
+def parse_single_pass(url, content):
+    return parse_profile(content, url).to_dict()
+
+
+def measure(parse, url, content, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        parse(url, content)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse(url, content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument('--iterations', type=int, default=50)
+    args = arg_parser.parse_args()
+
+    implementations = [('beautifulsoup', parse_with_soup), ('single-pass', parse_single_pass)]
+    print(f"{'fixture':<28}{'parser':<16}{'ms/page':>10}{'peak KiB':>12}")
+    for path in sorted(FIXTURES_DIR.glob('profile_*.html')):
+        content = path.read_bytes()
+        url = f'https://www.healthgrades.com/physician/{path.stem}'
+        results = {}
+        for label, parse in implementations:
+            seconds, peak = measure(parse, url, content, args.iterations)
+            results[label] = parse(url, content)
+            print(f'{path.name:<28}{label:<16}{seconds * 1000:>10.2f}{peak / 1024:>12.1f}')
+        if results['beautifulsoup'] != results['single-pass']:
+            print(f'  WARNING: parsers disagree on {path.name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare loading the doctor directory from JSON with loading the columnar store.
+
+Builds a synthetic directory of `--doctors` records from assets/doctor_data_test100.json (names and
+URLs made unique, everything else repeated), writes it both as a JSON list and as a columnar store
+(maps_agent/store.py), then loads each one in a fresh interpreter and reports the load time, the
+resident memory it added, and the time of a sample query that materializes 25 records.
+
+    python benchmarks/bench_store.py [--doctors 200000]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+ASSETS_DIR = REPO_ROOT / 'assets'
+
+LOADERS = {
+    'json.load': 'import json\nwith open(path) as f:\n    directory = json.load(f)',
+    'json + index': 'from maps_agent.directory import DoctorDirectory\ndirectory = DoctorDirectory.from_file(path)',
+    'columnar': 'from maps_agent.store import ColumnarDirectory\ndirectory = ColumnarDirectory(path)',
+}
+
+# Run in a child process so each loader starts from the same baseline.
+CHILD = '''
+import sys, time, types
+sys.path.insert(0, {root!r})
+# Load the storage modules without maps_agent/__init__, which starts the agent and needs API keys.
+package = types.ModuleType('maps_agent')
+package.__path__ = [{root!r} + '/maps_agent']
+sys.modules['maps_agent'] = package
+
+def rss_kib():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+
+path = {path!r}
+before = rss_kib()
+start = time.perf_counter()
+{loader}
+elapsed = time.perf_counter() - start
+after = rss_kib()
+query_ms = None
+if hasattr(directory, 'select'):
+    start = time.perf_counter()
+    positions = sorted(directory.select(specialty='Oncology', insurance='Aetna', accepting_new_patients=True))
+    records = [directory.records[i] for i in positions[:25]]
+    query_ms = (time.perf_counter() - start) * 1000
+print(elapsed, after - before, query_ms)
+'''
+
+
+def build_fixture(doctors, tmp_dir):
+    sys.path.insert(0, str(REPO_ROOT))
+    package = types.ModuleType('maps_agent')
+    package.__path__ = [str(REPO_ROOT / 'maps_agent')]
+    sys.modules['maps_agent'] = package
+    from maps_agent.directory import DoctorRecord
+    from maps_agent.store import write_store
+
+    with open(ASSETS_DIR / 'doctor_data_test100.json') as f:
+        templates = json.load(f)
+    docs = []
+    for i in range(doctors):
+        doc = dict(templates[i % len(templates)])
+        doc['name'] = f"{doc['name']} #{i}"
+        doc['url'] = f"{doc.get('url', '')}?copy={i}"
+        docs.append(doc)
+
+    json_path = tmp_dir / 'directory.json'
+    with open(json_path, 'w') as f:
+        json.dump(docs, f)
+    store_path = tmp_dir / 'directory.store'
+    write_store([DoctorRecord.from_dict(doc) for doc in docs], str(store_path))
+    return json_path, store_path
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument('--doctors', type=int, default=200_000)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='carenav-store-') as tmp:
+        json_path, store_path = build_fixture(args.doctors, Path(tmp))
+        json_mib = json_path.stat().st_size / 2**20
+        store_mib = sum(p.stat().st_size for p in store_path.iterdir()) / 2**20
+        print(f'{args.doctors} doctors: JSON {json_mib:.1f} MiB, columnar store {store_mib:.1f} MiB on disk')
+        print(f"{'loader':<16}{'load s':>9}{'RSS MiB':>10}{'query ms':>10}")
+        for label, loader in LOADERS.items():
+            path = str(store_path if label == 'columnar' else json_path)
+            child = CHILD.format(root=str(REPO_ROOT), path=path, loader=loader)
+            output = subprocess.run([sys.executable, '-c', child], check=True, capture_output=True, text=True)
+            elapsed, rss, query_ms = output.stdout.split()
+            query = '-' if query_ms == 'None' else f'{float(query_ms):.1f}'
+            print(f'{label:<16}{float(elapsed):>9.2f}{int(rss) / 1024:>10.1f}{query:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+"""
+Offline benchmark suite for the agent tools and the full root_agent flow.
+
+Every external service is replaced by a stub from benchmarks/stubs.py: a local mock of
+Healthgrades serving the recorded pages in benchmarks/fixtures, a fake `googlemaps.Client` and
+a stub model in place of LiteLLM, each with a configurable latency. Each scenario is driven by
+`--concurrency` concurrent clients until `--requests` requests have completed, and reports
+p50/p95/p99 latency, requests per second and the process's peak resident memory.
+
+    get_doctors_list            one search page and its profiles (async tool)
+    parse_doctor_information    one profile download and parse (async, parsed in a worker thread)
+    rerank_doctors_by_distance  rank the local directory for a new patient address (maps tool)
+    root_agent                  a two-turn conversation: symptoms, then address and insurance
+
+Before the scenarios, the start-up cost is measured in fresh interpreters: the time to import
+root_agent and the time root_agent.warmup takes to load what the first request would otherwise
+load (the model client, HTTP pools and data files). The median of `--startup-runs` runs is reported.
+
+    python benchmarks/bench_suite.py [--scenarios root_agent ...] [--concurrency 1 8 32] [--requests 64]
+        [--http-latency-ms 50] [--maps-latency-ms 20] [--llm-latency-ms 300]
+        [--startup-runs 3] [--json results.json] [--baseline results.json --tolerance 0.25]
+
+Inputs are unique per request, so the caches only answer what they would answer in production
+(e.g. the local directory and profiles shared between searches). With `--baseline`, the run
+exits with status 1 when a scenario's p95 latency or throughput, or the import time, is worse
+than the baseline's by more than `--tolerance`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from stubs import FakeMapsClient, StubLlm, call_response, last_part, request_texts, start_server, text_response  # noqa: E402
+
+SCENARIOS = ('get_doctors_list', 'parse_doctor_information', 'rerank_doctors_by_distance', 'root_agent')
+# Format check only: the fake client never sends it anywhere.
+FAKE_MAPS_KEY = 'AIzaBENCHMARKBENCHMARKBENCHMARKBENCHMA'
+
+SYMPTOMS = (
+    'I am a 58 year old man with a lump in my neck, night sweats and weight loss for two months.',
+    'I am a 41 year old woman with a persistent cough, blood in my sputum and chest pain.',
+    'My 67 year old father has unexplained bruising, fatigue and frequent nosebleeds.',
+)
+
+
+def configure_environment(server):
+    """Point every module at the stubs and scratch files. Must run before the agents are imported."""
+    scratch = tempfile.mkdtemp(prefix='carenav-bench-')
+    os.environ['HEALTHGRADES_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ['CARENAV_CACHE_DIR'] = os.path.join(scratch, 'cache')
+    os.environ['CARENAV_PER_HOST_RATE'] = '100000'
+    os.environ['CARENAV_PER_HOST_BURST'] = '100000'
+    os.environ['CARENAV_MAX_CONNECTIONS_PER_HOST'] = '64'
+    os.environ['GOOGLE_MAPS_API_KEY'] = FAKE_MAPS_KEY
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    # The stub root_agent answers by calling find_providers.
+    os.environ['CARENAV_ORCHESTRATION'] = 'pipeline'
+
+    # A copy of the bundled directory with the stub's coordinates, as search_agent.ingest would store them.
+    from maps_agent.cache import locate_doctors
+
+    with open(REPO_ROOT / 'assets' / 'doctor_data_test100.json') as f:
+        doctors = json.load(f)
+    locate_doctors(FakeMapsClient(latency=0), doctors)
+    os.environ['CARENAV_DIRECTORY_PATH'] = os.path.join(scratch, 'directory.json')
+    with open(os.environ['CARENAV_DIRECTORY_PATH'], 'w') as f:
+        json.dump(doctors, f)
+
+
+# Run in a child process so every measurement starts from a cold interpreter.
+STARTUP_CHILD = '''
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import root_agent
+imported = time.perf_counter() - start
+from root_agent.warmup import warm_up
+start = time.perf_counter()
+warm_up()
+print(imported, time.perf_counter() - start)
+'''
+
+
+def measure_startup(runs):
+    """Median import and warm-up time of root_agent, in ms, over `runs` fresh interpreters."""
+    imports, warmups = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_CHILD.format(root=str(REPO_ROOT))],
+                                check=True, capture_output=True, text=True)
+        imported, warmed = output.stdout.split()[-2:]
+        imports.append(float(imported) * 1000)
+        warmups.append(float(warmed) * 1000)
+    return {'import_ms': round(statistics.median(imports), 1), 'warmup_ms': round(statistics.median(warmups), 1)}
+
+
+# --- Stub model answers, per agent ---
+
+def root_answer(llm_request):
+    part = last_part(llm_request)
+    if part is not None and part.function_response is not None:
+        return text_response('Here are the doctors I found near you, closest and best rated first.')
+    text = part.text if part is not None and part.text else ''
+    address = re.search(r'live at (.+?)\. My insurance is (.+?)\.', text)
+    if address is None:
+        return call_response('transfer_to_agent', {'agent_name': 'forecast_and_display_agent'})
+    specialty = 'Oncology'
+    for earlier in request_texts(llm_request):
+        match = re.search(r'"specialty":\s*"([^"]+)"', earlier)
+        if match:
+            specialty = match.group(1)
+    return call_response('find_providers', {
+        'specialty': specialty, 'patient_address': address.group(1), 'insurance_plan': address.group(2),
+    })
+
+
+def diagnosis_answer(llm_request):
+    return text_response(json.dumps({'diagnosis': 'Possible lymphoma', 'specialty': 'Oncology'}))
+
+
+def batch_insurance_answer(llm_request):
+    doctors = []
+    for text in request_texts(llm_request):
+        match = re.search(r'Doctors: (\[.*\])\. Please', text, re.S)
+        if match:
+            doctors = json.loads(match.group(1))
+    return text_response(json.dumps({'verdicts': [
+        {'url': doctor['url'], 'acceptsInsurance': True, 'reason': 'Plan listed by the doctor.'} for doctor in doctors
+    ]}))
+
+
+ANSWERS = {
+    'root_agent': root_answer,
+    'diagnosis_agent': diagnosis_answer,
+    'batch_insurance_agent': batch_insurance_answer,
+}
+
+
+def stub_models(agent, latency):
+    """Replace the LiteLLM model of `agent` and all of its sub-agents with a StubLlm."""
+    from google.adk.agents import LlmAgent
+
+    if isinstance(agent, LlmAgent):
+        answer = ANSWERS.get(agent.name, lambda llm_request: text_response('Done.'))
+        agent.model = StubLlm(latency=latency, respond=answer)
+    for sub_agent in agent.sub_agents:
+        stub_models(sub_agent, latency)
+
+
+# --- Scenarios ---
+
+def build_scenarios(args, maps_client):
+    """Import the agents (after configure_environment) and return {name: async request(key)}."""
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.genai import types
+
+    import maps_agent.agent as maps_tools
+    from insurance_agent.insurance_agent import batch_insurance_agent
+    from root_agent.agent import app
+    from search_agent import agent as search_tools
+
+    maps_tools.gmaps = maps_client
+    stub_models(app.root_agent, args.llm_latency_ms / 1000)
+    stub_models(batch_insurance_agent, args.llm_latency_ms / 1000)
+    runner = Runner(app=app, session_service=InMemorySessionService())
+
+    async def get_doctors_list(key):
+        doctors = await search_tools.get_doctors_list(f'bench-{key}', 41.88, -87.63)
+        if isinstance(doctors, str):
+            raise RuntimeError(doctors)
+        failed = [doctor['error'] for doctor in doctors if 'error' in doctor]
+        if failed:
+            raise RuntimeError(failed[0])
+
+    async def parse_doctor_information(key):
+        url = f"{os.environ['HEALTHGRADES_BASE_URL']}/physician/bench-{key}"
+        doctor = await search_tools.parse_doctor_information(url)
+        if isinstance(doctor, str):
+            raise RuntimeError(doctor)
+
+    async def rerank_doctors_by_distance(key):
+        doctors = await maps_tools.rerank_doctors_by_distance(f'{key} Benchmark Ave, Chicago, IL', specialty='Oncology')
+        if isinstance(doctors, str):
+            raise RuntimeError(doctors)
+
+    async def root_agent(key):
+        session = await runner.session_service.create_session(app_name=app.name, user_id='bench')
+        number = sum(map(ord, key))
+        turns = (
+            SYMPTOMS[number % len(SYMPTOMS)],
+            f'I live at {key} Benchmark Ave, Chicago, IL. My insurance is Aetna.',
+        )
+        for text in turns:
+            final = None
+            async for event in runner.run_async(
+                user_id='bench', session_id=session.id,
+                new_message=types.Content(role='user', parts=[types.Part(text=text)]),
+            ):
+                if event.is_final_response() and event.content and event.content.parts:
+                    final = event.content.parts[0].text
+            if not final:
+                raise RuntimeError(f'no answer to {text!r}')
+
+    return {
+        'get_doctors_list': get_doctors_list,
+        'parse_doctor_information': parse_doctor_information,
+        'rerank_doctors_by_distance': rerank_doctors_by_distance,
+        'root_agent': root_agent,
+    }
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_level(request, concurrency, requests, prefix):
+    """Run `requests` requests with `concurrency` clients; return latency percentiles and throughput."""
+    latencies = []
+    errors = []
+    next_index = iter(range(requests))
+
+    async def client():
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                await request(f'{prefix}-{i}')
+            except Exception as e:
+                errors.append(repr(e))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'rps': round(requests / wall, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        # ru_maxrss is in KiB on Linux; it is the high-water mark of the whole process so far.
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Scenario/concurrency pairs whose p95 or throughput is worse than `baseline` by more than `tolerance`."""
+    found = []
+    startup, previous_startup = results.get('startup'), baseline.get('startup')
+    if startup and previous_startup and startup['import_ms'] > previous_startup['import_ms'] * (1 + tolerance):
+        found.append(f"import root_agent: {previous_startup['import_ms']} -> {startup['import_ms']} ms")
+    for scenario, levels in results.items():
+        if scenario == 'startup':
+            continue
+        for concurrency, current in levels.items():
+            previous = baseline.get(scenario, {}).get(concurrency)
+            if previous is None:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                found.append(f"{scenario} x{concurrency}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+            if current['rps'] < previous['rps'] * (1 - tolerance):
+                found.append(f"{scenario} x{concurrency}: {previous['rps']} -> {current['rps']} requests/s")
+    return found
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    arg_parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    arg_parser.add_argument('--requests', type=int, default=64, help='Requests per scenario and concurrency level')
+    arg_parser.add_argument('--doctors', type=int, default=10, help='Profiles per mock search page')
+    arg_parser.add_argument('--http-latency-ms', type=float, default=50.0)
+    arg_parser.add_argument('--maps-latency-ms', type=float, default=20.0)
+    arg_parser.add_argument('--llm-latency-ms', type=float, default=300.0)
+    arg_parser.add_argument('--json', help='Write the results to this file')
+    arg_parser.add_argument('--baseline', help='Results file of an earlier run to compare against')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25)
+    arg_parser.add_argument('--startup-runs', type=int, default=3, help='Cold starts to measure; 0 skips it')
+    args = arg_parser.parse_args()
+
+    server = start_server(args.doctors, args.http_latency_ms / 1000)
+    configure_environment(server)
+    results = {}
+    if args.startup_runs:
+        results['startup'] = measure_startup(args.startup_runs)
+        print(f"start-up: import root_agent {results['startup']['import_ms']:.0f} ms, "
+              f"warm-up {results['startup']['warmup_ms']:.0f} ms")
+
+    maps_client = FakeMapsClient(args.maps_latency_ms / 1000)
+    scenarios = build_scenarios(args, maps_client)
+
+    print(f"{'scenario':<28}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'RSS MiB':>9}")
+    for name in args.scenarios:
+        results[name] = {}
+        for concurrency in args.concurrency:
+            level = asyncio.run(run_level(scenarios[name], concurrency, args.requests, f'{name}-{concurrency}'))
+            results[name][str(concurrency)] = level
+            print(f"{name:<28}{concurrency:>8}{level['rps']:>9.1f}{level['p50_ms']:>9.1f}{level['p95_ms']:>9.1f}"
+                  f"{level['p99_ms']:>9.1f}{level['errors']:>8}{level['peak_rss_mib']:>9.1f}")
+            if level['first_error']:
+                print(f"    first error: {level['first_error'][:200]}")
+    print(f"Maps API calls: {maps_client.calls}")
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print(f'REGRESSION {regression}')
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Measure how profile parsing scales with worker processes (search_agent/workers.py).
+
+Two measurements over the recorded pages in benchmarks/fixtures:
+
+    parse     `--pages` pages parsed in this process, then by pools of 1, 2, 4, ... worker
+              processes (up to `--workers`); reports pages/s, the speed-up over one process, and
+              the bytes sent to the workers against the bytes of the records returned
+    pipeline  `--pages` profiles downloaded from the local mock of Healthgrades and parsed, with
+              threads (the default mode) and with the worker pool
+
+    python benchmarks/bench_workers.py [--pages 400] [--workers 8] [--latency-ms 20]
+
+Parsing is CPU-bound, so the speed-up is capped by the number of cores (reported first).
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from stubs import PROFILES, start_server  # noqa: E402
+
+
+def worker_counts(maximum):
+    counts = [1]
+    while counts[-1] * 2 <= maximum:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != maximum:
+        counts.append(maximum)
+    return counts
+
+
+def bench_parse(pages, maximum):
+    from search_agent.workers import parse_page, start_pool
+
+    urls = [f'https://www.healthgrades.com/physician/bench-{i}' for i in range(pages)]
+    contents = [PROFILES[i % len(PROFILES)] for i in range(pages)]
+
+    start = time.perf_counter()
+    records = [parse_page(url, content) for url, content in zip(urls, contents)]
+    baseline = pages / (time.perf_counter() - start)
+    sent = sum(len(content) for content in contents) / pages
+    returned = sum(len(pickle.dumps(record)) for record in records) / pages
+    print(f'parse: {sent / 1024:.1f} KiB sent to a worker per page, {returned / 1024:.1f} KiB returned')
+    print(f"{'processes':<12}{'pages/s':>10}{'speed-up':>10}")
+    print(f"{'in-process':<12}{baseline:>10.1f}{'':>10}")
+
+    single = None
+    for workers in worker_counts(maximum):
+        pool = start_pool(workers)
+        # Start the processes before timing.
+        list(pool.map(parse_page, urls[:workers], contents[:workers]))
+        start = time.perf_counter()
+        list(pool.map(parse_page, urls, contents, chunksize=max(1, pages // (workers * 8))))
+        rate = pages / (time.perf_counter() - start)
+        pool.shutdown()
+        single = single or rate
+        print(f'{workers:<12}{rate:>10.1f}{rate / single:>10.2f}')
+
+
+def bench_pipeline(pages, maximum):
+    from search_agent import agent
+    from search_agent.fetch import close_async_engine
+    from search_agent.workers import fetch_profiles, parse_page, start_pool
+
+    base_url = os.environ['HEALTHGRADES_BASE_URL']
+
+    async def threads(urls):
+        return list(await asyncio.gather(*(agent.parse_doctor_information(url) for url in urls)))
+
+    async def processes(urls):
+        return await fetch_profiles(urls, pool=pool, workers=maximum)
+
+    async def run(label, fetch):
+        # Unique URLs, so every profile is downloaded and parsed.
+        urls = [f'{base_url}/physician/{label}-{i}' for i in range(pages)]
+        start = time.perf_counter()
+        doctors = await fetch(urls)
+        rate = pages / (time.perf_counter() - start)
+        errors = sum(isinstance(doctor, str) for doctor in doctors)
+        await close_async_engine()
+        return rate, errors
+
+    pool = start_pool(maximum)
+    # Start the processes before timing.
+    list(pool.map(parse_page, ['warm-up'] * maximum, PROFILES[:1] * maximum))
+    print(f"\n{'pipeline':<24}{'profiles/s':>12}{'errors':>8}")
+    for label, fetch in (('threads', threads), (f'{maximum} processes', processes)):
+        rate, errors = asyncio.run(run(label.replace(' ', '-'), fetch))
+        print(f'{label:<24}{rate:>12.1f}{errors:>8}')
+    pool.shutdown()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument('--pages', type=int, default=400)
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Largest pool to measure')
+    arg_parser.add_argument('--latency-ms', type=float, default=20.0, help='Mock server delay per page')
+    args = arg_parser.parse_args()
+
+    server = start_server(10, args.latency_ms / 1000)
+    # The search tools read these when they are imported.
+    os.environ['HEALTHGRADES_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ['CARENAV_CACHE_DIR'] = tempfile.mkdtemp(prefix='carenav-workers-')
+    os.environ['CARENAV_PER_HOST_RATE'] = '100000'
+    os.environ['CARENAV_PER_HOST_BURST'] = '100000'
+    os.environ['CARENAV_MAX_CONNECTIONS_PER_HOST'] = '64'
+
+    print(f'{os.cpu_count()} CPU cores')
+    bench_parse(args.pages, args.workers)
+    bench_pipeline(args.pages, args.workers)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Load test the search tools with many concurrent sessions against a local mock of Healthgrades.
+
+Each simulated session runs one `get_doctors_list` search on a shared event loop, the way
+concurrent `adk web` users do. Two implementations are compared:
+
+    engine    the bare search: the search page and its profiles downloaded with the loop's
+              `AsyncFetchEngine` and parsed on the event loop, without the cache or worker threads
+    async     the async tool registered with search_agent (shared engine, cache, parsing threads)
+
+    python benchmarks/load_test.py [--sessions 1 4 16] [--doctors 10] [--latency-ms 200]
+
+The mock server answers search pages with `--doctors` profile links and serves the profile
+fixtures from benchmarks/fixtures after `--latency-ms` of simulated network delay. Every
+session searches a different specialty so the on-disk cache never answers for it.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from stubs import start_server  # noqa: E402
+
+
+async def run_sessions(search, sessions, run_id):
+    latencies = []
+
+    async def session(number):
+        start = time.perf_counter()
+        doctors = await search(f'specialty-{run_id}-{number}', 41.88, -87.63)
+        latencies.append(time.perf_counter() - start)
+        failed = doctors if isinstance(doctors, str) else [doctor for doctor in doctors if 'error' in doctor]
+        if failed:
+            raise RuntimeError(f'session {number} failed: {failed if isinstance(failed, str) else failed[0]}')
+
+    from search_agent.fetch import close_async_engine
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(session(number) for number in range(sessions)))
+    finally:
+        await close_async_engine()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16])
+    arg_parser.add_argument('--doctors', type=int, default=10)
+    arg_parser.add_argument('--latency-ms', type=float, default=200.0)
+    args = arg_parser.parse_args()
+
+    server = start_server(args.doctors, args.latency_ms / 1000)
+    # The search tools read these when they are imported.
+    os.environ['HEALTHGRADES_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ['CARENAV_CACHE_DIR'] = tempfile.mkdtemp(prefix='carenav-load-')
+    os.environ['CARENAV_PER_HOST_RATE'] = '100000'
+    os.environ['CARENAV_PER_HOST_BURST'] = '100000'
+    os.environ['CARENAV_MAX_CONNECTIONS_PER_HOST'] = '64'
+
+    from search_agent import agent  # noqa: E402
+    from search_agent.fetch import get_async_engine  # noqa: E402
+
+    async def engine_profile(url):
+        page = await get_async_engine().fetch(url)
+        doctor = agent.parse_doctor_html(url, page.content) if page.ok else page.error
+        # Failures reported like get_doctors_list does.
+        return {'url': url, 'error': doctor} if isinstance(doctor, str) else doctor
+
+    async def engine_search(specialty, latitude, longitude):
+        page = await get_async_engine().fetch(agent.search_url(specialty, latitude, longitude))
+        if not page.ok:
+            return page.error
+        urls = agent.extract_profile_urls(page.content)
+        if isinstance(urls, str):
+            return urls
+        return list(await asyncio.gather(*(engine_profile(url) for url in urls)))
+
+    implementations = [('engine', engine_search), ('async', agent.get_doctors_list)]
+    print(f"{'mode':<10}{'sessions':>9}{'wall s':>9}{'sessions/s':>12}{'mean s':>9}{'max s':>9}")
+    for sessions in args.sessions:
+        for label, search in implementations:
+            wall, latencies = asyncio.run(run_sessions(search, sessions, f'{label}-{sessions}'))
+            print(f'{label:<10}{sessions:>9}{wall:>9.2f}{sessions / wall:>12.1f}'
+                  f'{statistics.mean(latencies):>9.2f}{max(latencies):>9.2f}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
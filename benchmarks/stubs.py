@@ -0,0 +1,169 @@
+"""
+Offline stand-ins for the services the agents call, shared by the benchmark scripts.
+
+    MockHealthgrades / start_server   local HTTP server answering search pages and serving the
+                                      recorded profile pages in benchmarks/fixtures
+    FakeMapsClient                    `googlemaps.Client` look-alike with deterministic geocodes
+                                      and straight-line driving distances
+    StubLlm                           ADK model that answers through a Python function, used in
+                                      place of LiteLLM
+
+Each stub sleeps for a configurable latency so the benchmarks see realistic waits without
+touching the network.
+"""
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+PROFILES = [path.read_bytes() for path in sorted(FIXTURES_DIR.glob('profile_*.html'))]
+
+# FakeMapsClient places every address in this box (around Chicago).
+LATITUDE_RANGE = (41.6, 42.4)
+LONGITUDE_RANGE = (-88.2, -87.5)
+METERS_PER_DEGREE = 111_000
+# Roads are longer than the straight line.
+DETOUR_FACTOR = 1.3
+
+
+class MockHealthgrades(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    doctors = 10
+    latency = 0.05
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        parts = urlsplit(self.path)
+        if parts.path == '/usearch':
+            query = parse_qs(parts.query)
+            what = query.get('what', ['doctor'])[0].replace(' ', '-')
+            page = query.get('pageNum', ['1'])[0]
+            body = ''.join(
+                f'<div role="presentation"><a href="/physician/dr-{what}-{page}-{i}">Dr {i}</a></div>'
+                for i in range(self.doctors)
+            )
+            self._send(f'<html><body>{body}</body></html>'.encode('utf-8'))
+        elif parts.path.startswith('/physician/'):
+            self._send(PROFILES[hash(parts.path) % len(PROFILES)])
+        else:
+            self.send_error(404)
+
+    def _send(self, body):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(doctors, latency):
+    """Start the mock Healthgrades server on a free local port, serving `doctors` profiles per search page."""
+    MockHealthgrades.doctors = doctors
+    MockHealthgrades.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockHealthgrades)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fake_latlon(address):
+    """Deterministic coordinates for an address, spread over LATITUDE_RANGE x LONGITUDE_RANGE."""
+    digest = hashlib.sha1(address.strip().lower().encode('utf-8')).digest()
+    x = int.from_bytes(digest[:4], 'big') / 2**32
+    y = int.from_bytes(digest[4:8], 'big') / 2**32
+    return (LATITUDE_RANGE[0] + x * (LATITUDE_RANGE[1] - LATITUDE_RANGE[0]),
+            LONGITUDE_RANGE[0] + y * (LONGITUDE_RANGE[1] - LONGITUDE_RANGE[0]))
+
+
+class FakeMapsClient:
+    """
+    The `geocode` and `distance_matrix` calls of `googlemaps.Client`, answered locally.
+
+    Each call sleeps for `latency` seconds and is counted in `calls`, so benchmarks can report
+    how many requests the real API would have received.
+    """
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.calls = {'geocode': 0, 'distance_matrix': 0}
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        time.sleep(self.latency)
+
+    def geocode(self, address):
+        self._call('geocode')
+        lat, lng = fake_latlon(address)
+        return [{'geometry': {'location': {'lat': lat, 'lng': lng}}, 'formatted_address': address}]
+
+    def distance_matrix(self, origins, destinations, mode='driving', units='imperial'):
+        self._call('distance_matrix')
+        rows = []
+        for origin in origins:
+            o_lat, o_lon = fake_latlon(origin)
+            elements = []
+            for destination in destinations:
+                d_lat, d_lon = fake_latlon(destination)
+                meters = DETOUR_FACTOR * METERS_PER_DEGREE * math.hypot(
+                    d_lat - o_lat, (d_lon - o_lon) * math.cos(math.radians(o_lat))
+                )
+                elements.append({'status': 'OK', 'distance': {'value': int(meters), 'text': ''}})
+            rows.append({'elements': elements})
+        return {'status': 'OK', 'rows': rows}
+
+
+def text_response(text: str) -> LlmResponse:
+    return LlmResponse(content=types.Content(role='model', parts=[types.Part(text=text)]))
+
+
+def call_response(name: str, args: Dict[str, Any]) -> LlmResponse:
+    return LlmResponse(content=types.Content(
+        role='model', parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))]
+    ))
+
+
+def request_texts(llm_request: LlmRequest) -> List[str]:
+    """Every text part in the request's conversation, oldest first."""
+    return [part.text for content in llm_request.contents for part in content.parts or [] if part.text]
+
+
+def last_part(llm_request: LlmRequest):
+    parts = llm_request.contents[-1].parts if llm_request.contents else None
+    return parts[-1] if parts else None
+
+
+class StubLlm(BaseLlm):
+    """
+    ADK model that waits `latency` seconds, then returns `respond(llm_request)`.
+
+    Token counts are estimated at four characters per token so LLM spans still carry usage.
+    """
+    model: str = 'stub'
+    latency: float = 0.3
+    respond: Callable[[LlmRequest], LlmResponse]
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self.latency)
+        response = self.respond(llm_request)
+        prompt_chars = sum(len(text) for text in request_texts(llm_request))
+        output_chars = sum(len(part.text or '') for part in response.content.parts)
+        response.usage_metadata = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_chars // 4, candidates_token_count=max(1, output_chars // 4)
+        )
+        yield response
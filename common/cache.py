@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+
+DEFAULT_CACHE_DIR = Path(os.getenv('CARENAV_CACHE_DIR', Path.home() / '.cache' / 'carenavigator'))
+
+# Profiles, geocodes and driving distances barely change from day to day.
+DEFAULT_TTL = 24 * 60 * 60
+# Expired entries are kept this long as a fallback for when the source is down (see `get_stale`).
+DEFAULT_STALE_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class DiskCache:
+    """
+    Persistent key/value cache backed by a SQLite file.
+
+    Values are stored as JSON, optionally zlib-compressed. Entries expire after `ttl` seconds but
+    stay readable through `get_stale` until `stale_ttl`, and once the stored payload grows past
+    `max_bytes` the least recently used entries are evicted. The cache is safe to share between
+    worker threads.
+    """
+
+    def __init__(self, path: Path, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES,
+                 compress: bool = True, stale_ttl: float = DEFAULT_STALE_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.stale_ttl = max(ttl, stale_ttl)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY, value BLOB NOT NULL, compressed INTEGER NOT NULL,'
+            ' size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        # Bytes stored, kept up to date on every write so `set` need not sum the table.
+        self._total = self._stored_bytes()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value for `key`, or None if it is missing or expired.
+        """
+        return self._get(key, self.ttl)
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value for `key` even if it has expired, as long as it is younger than
+        `stale_ttl`. Meant for when the source cannot be reached.
+        """
+        return self._get(key, self.stale_ttl)
+
+    def _get(self, key: str, max_age: float) -> Optional[Any]:
+        now = time.time()
+        with self._lock, self._transaction():
+            row = self._db.execute(
+                'SELECT value, compressed, created FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, compressed, created = row
+            if now - created > max_age:
+                if now - created > self.stale_ttl:
+                    self._delete(key)
+                return None
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        if compressed:
+            value = zlib.decompress(value)
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a JSON-serializable `value` under `key`, evicting old entries if needed.
+        """
+        payload = json.dumps(value).encode('utf-8')
+        compressed = 0
+        if self.compress:
+            payload = zlib.compress(payload)
+            compressed = 1
+        now = time.time()
+        with self._lock, self._transaction():
+            row = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._db.execute(
+                'INSERT INTO entries (key, value, compressed, size, created, accessed)'
+                ' VALUES (?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, compressed = excluded.compressed,'
+                ' size = excluded.size, created = excluded.created, accessed = excluded.accessed',
+                (key, payload, compressed, len(payload), now, now)
+            )
+            self._total += len(payload) - (row[0] if row is not None else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._transaction():
+            self._delete(key)
+
+    def clear(self) -> None:
+        with self._lock, self._transaction():
+            self._db.execute('DELETE FROM entries')
+            self._total = 0
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so another process sharing the file waits
+        # for it instead of interleaving its own read-then-write on the same key.
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            self._total = self._stored_bytes()
+            raise
+        self._db.execute('COMMIT')
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _delete(self, key: str) -> None:
+        row = self._db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._total -= row[0]
+
+    def _evict(self) -> None:
+        # Another process may have written to or evicted from the same file; recount before deleting.
+        self._total = self._stored_bytes()
+        if self._total <= self.max_bytes:
+            return
+        rows = self._db.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall()
+        for key, size in rows:
+            if self._total <= self.max_bytes:
+                break
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._total -= size
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str = 'healthgrades', **kwargs) -> DiskCache:
+    """
+    Return the process-wide cache stored as `<CARENAV_CACHE_DIR>/<name>.sqlite3`.
+
+    Keyword arguments are passed to `DiskCache` the first time the cache is opened.
+    """
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = DiskCache(DEFAULT_CACHE_DIR / f'{name}.sqlite3', **kwargs)
+        return _caches[name]
@@ -0,0 +1,333 @@
+"""
+Timing spans for the agents' hot paths.
+
+A span times one operation (a tool call, an outbound HTTP request, a Distance Matrix call, an HTML
+parse, an LLM call) and carries attributes such as `cache` ("hit"/"miss"), `bytes` and token
+counts. A span started while another is open becomes its child and shares its trace id, so the
+spans of one request add up to a latency breakdown.
+
+Every finished span is added to in-memory Prometheus-style counters (see `prometheus_text`) and,
+when CARENAV_TELEMETRY_PATH is set, appended to that file as one JSON line. With
+CARENAV_METRICS_PORT set, the counters are served at http://localhost:<port>/metrics.
+
+    python -m common.telemetry spans.jsonl [--slowest 5]
+
+prints latency percentiles per span name and the breakdown of the slowest requests in a span file.
+"""
+import argparse
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+TELEMETRY_PATH = os.getenv('CARENAV_TELEMETRY_PATH', '')
+METRICS_PORT = int(os.getenv('CARENAV_METRICS_PORT', '0'))
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Numeric attributes summed into counters, with the counter they feed.
+COUNTED_ATTRIBUTES = {
+    'bytes': 'carenav_bytes_total',
+    'prompt_tokens': 'carenav_llm_prompt_tokens_total',
+    'completion_tokens': 'carenav_llm_completion_tokens_total',
+    'cache_hits': 'carenav_cache_hits_total',
+    'cache_misses': 'carenav_cache_misses_total',
+}
+
+# Values of a span's `cache` attribute, with the counter they feed. "stale" is an expired entry
+# served because the source could not be reached.
+CACHE_COUNTERS = {
+    'hit': 'carenav_cache_hits_total',
+    'miss': 'carenav_cache_misses_total',
+    'stale': 'carenav_cache_stale_total',
+}
+
+# Sentinel for "parent not given": use the span open in the current context.
+_CURRENT = object()
+
+
+@dataclass
+class Span:
+    """One timed operation. Attributes are free-form JSON values."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    duration_ms: Optional[float] = None
+    status: str = 'ok'
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def set(self, **attributes: Any) -> 'Span':
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, name: str, amount: float) -> 'Span':
+        """Add `amount` to a numeric attribute, e.g. bytes received over several reads."""
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+        return self
+
+    def fail(self, error: Any) -> 'Span':
+        self.status = 'error'
+        self.attributes['error'] = str(error)
+        return self
+
+    @property
+    def ended(self) -> bool:
+        return self.duration_ms is not None
+
+    def end(self) -> None:
+        """Stop the clock and export the span. Ending a span twice has no effect."""
+        if self.ended:
+            return
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        _export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = asdict(self)
+        del record['_started']
+        return record
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('carenav_span', default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, parent: Any = _CURRENT, **attributes: Any) -> Span:
+    """
+    Start a span without making it current. The caller must call `end()`.
+
+    Args:
+        name: Span name, e.g. "http.get". Names are metric labels, so keep them to a fixed set.
+        parent: The parent span; by default the span open in the current context. None starts a new trace.
+        **attributes: Initial attributes.
+    """
+    if parent is _CURRENT:
+        parent = _current.get()
+    return Span(
+        name=name,
+        trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+
+
+@contextmanager
+def span(name: str, parent: Any = _CURRENT, **attributes: Any) -> Iterator[Span]:
+    """
+    Time the enclosed block as a span, current for the duration of the block.
+
+    An exception escaping the block marks the span as an error and is re-raised.
+
+        with span('maps.geocode', address=address) as s:
+            ...
+            s.set(cache='hit')
+    """
+    current = start_span(name, parent, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(repr(e))
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Decorator running each call of a sync or async function in a span named `name`
+    (the function's name by default).
+    """
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Metrics:
+    """Prometheus-style counters and latency histograms, labelled by span name."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._spans: Dict[Tuple[str, str], int] = {}
+        self._histograms: Dict[str, List[float]] = {}
+        self._sums: Dict[str, float] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+
+    def observe(self, finished: Span) -> None:
+        seconds = finished.duration_ms / 1000
+        cache = finished.attributes.get('cache')
+        with self._lock:
+            key = (finished.name, finished.status)
+            self._spans[key] = self._spans.get(key, 0) + 1
+            counts = self._histograms.setdefault(finished.name, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[finished.name] = self._sums.get(finished.name, 0.0) + seconds
+            if cache in CACHE_COUNTERS:
+                counter = (CACHE_COUNTERS[cache], finished.name)
+                self._counters[counter] = self._counters.get(counter, 0) + 1
+            for attribute, metric in COUNTED_ATTRIBUTES.items():
+                value = finished.attributes.get(attribute)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    counter = (metric, finished.name)
+                    self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def text(self) -> str:
+        """The counters in the Prometheus text exposition format."""
+        lines = ['# TYPE carenav_spans_total counter']
+        with self._lock:
+            for (name, status), count in sorted(self._spans.items()):
+                lines.append(f'carenav_spans_total{{span="{name}",status="{status}"}} {count}')
+            lines.append('# TYPE carenav_span_seconds histogram')
+            for name, counts in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'carenav_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'carenav_span_seconds_bucket{{span="{name}",le="+Inf"}} {counts[-1]}')
+                lines.append(f'carenav_span_seconds_sum{{span="{name}"}} {self._sums[name]:.6f}')
+                lines.append(f'carenav_span_seconds_count{{span="{name}"}} {counts[-1]}')
+            for metric in sorted({metric for metric, _ in self._counters}):
+                lines.append(f'# TYPE {metric} counter')
+                for (other, name), value in sorted(self._counters.items()):
+                    if other == metric:
+                        lines.append(f'{metric}{{span="{name}"}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._histograms.clear()
+            self._sums.clear()
+            self._counters.clear()
+
+
+metrics = Metrics()
+_export_lock = threading.Lock()
+_export_file = None
+
+
+def _export(finished: Span) -> None:
+    global _export_file
+    metrics.observe(finished)
+    if not TELEMETRY_PATH:
+        return
+    line = json.dumps(finished.to_dict(), default=str) + '\n'
+    with _export_lock:
+        if _export_file is None:
+            _export_file = open(TELEMETRY_PATH, 'a', buffering=1)
+        _export_file.write(line)
+
+
+def prometheus_text() -> str:
+    return metrics.text()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port: int) -> ThreadingHTTPServer:
+    """Serve `prometheus_text()` at /metrics on `port` from a background thread."""
+    server = ThreadingHTTPServer(('', port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+
+if METRICS_PORT:
+    serve_metrics(METRICS_PORT)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(path: str, slowest: int = 5) -> str:
+    """
+    Latency percentiles per span name in a JSON-lines span file, then the child spans of the
+    `slowest` root spans, indented by depth.
+    """
+    spans = []
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                spans.append(json.loads(line))
+
+    durations: Dict[str, List[float]] = {}
+    for record in spans:
+        durations.setdefault(record['name'], []).append(record['duration_ms'])
+    lines = [f"{'span':<36}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        values.sort()
+        lines.append(
+            f'{name:<36}{len(values):>7}{_percentile(values, 0.5):>10.1f}{_percentile(values, 0.95):>10.1f}'
+            f'{_percentile(values, 0.99):>10.1f}{values[-1]:>10.1f}'
+        )
+
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for record in spans:
+        children.setdefault(record['parent_id'], []).append(record)
+
+    def walk(record: Dict[str, Any], depth: int) -> None:
+        details = ', '.join(
+            f'{key}={value}' for key, value in record['attributes'].items()
+            if key in ('cache', 'bytes', 'queued_ms', 'prompt_tokens', 'completion_tokens', 'cache_hits', 'cache_misses', 'error')
+        )
+        lines.append(f"{'  ' * depth}{record['name']:<{40 - 2 * depth}}{record['duration_ms']:>10.1f} ms  {details}")
+        for child in sorted(children.get(record['span_id'], []), key=lambda child: child['start']):
+            walk(child, depth + 1)
+
+    for root in sorted(children.get(None, []), key=lambda record: -record['duration_ms'])[:slowest]:
+        lines.append('')
+        walk(root, 0)
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Summarize a JSON-lines span file.')
+    arg_parser.add_argument('path', help='File written with CARENAV_TELEMETRY_PATH set')
+    arg_parser.add_argument('--slowest', type=int, default=5, help='Number of slowest requests to break down')
+    args = arg_parser.parse_args()
+    print(summarize(args.path, args.slowest))
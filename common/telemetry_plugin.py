@@ -0,0 +1,121 @@
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+from .telemetry import Span, _current, start_span
+
+
+class TelemetryPlugin(BasePlugin):
+    """
+    ADK plugin recording a span (see `common.telemetry`) for every runner invocation, agent run,
+    LLM call and tool call.
+
+    LLM spans carry the prompt and completion token counts reported by the model. A tool's span
+    is current while the tool runs, so the spans the tool opens itself (HTTP requests, cache
+    lookups, parsing) become its children.
+    """
+
+    def __init__(self, name: str = 'carenav_telemetry'):
+        super().__init__(name=name)
+        self._open: Dict[Tuple[str, ...], Span] = {}
+        self._tokens: Dict[str, Any] = {}
+
+    def _start(self, key: Tuple[str, ...], name: str, parent: Optional[Span], **attributes: Any) -> Span:
+        opened = start_span(name, parent if parent is not None else _current.get(), **attributes)
+        self._open[key] = opened
+        return opened
+
+    def _end(self, key: Tuple[str, ...], error: Optional[Exception] = None) -> Optional[Span]:
+        opened = self._open.pop(key, None)
+        if opened is not None:
+            if error is not None:
+                opened.fail(repr(error))
+            opened.end()
+        return opened
+
+    async def before_run_callback(self, *, invocation_context):
+        self._start(('run', invocation_context.invocation_id), f'run.{invocation_context.app_name}', None,
+                    app=invocation_context.app_name, agent=invocation_context.agent.name)
+        return None
+
+    async def after_run_callback(self, *, invocation_context):
+        invocation_id = invocation_context.invocation_id
+        # Agents cut short by a before_agent_callback never reach after_agent_callback.
+        for key in [key for key in self._open if key[0] != 'run' and key[1] == invocation_id]:
+            self._end(key)
+        self._end(('run', invocation_id))
+
+    async def on_run_error_callback(self, *, invocation_context, error):
+        invocation_id = invocation_context.invocation_id
+        for key in [key for key in self._open if key[1] == invocation_id]:
+            self._end(key, error)
+
+    async def before_agent_callback(self, *, agent, callback_context):
+        invocation_id = callback_context.invocation_id
+        # Sub-agents (and agents transferred to) nest under the innermost agent still running.
+        running = [opened for key, opened in self._open.items() if key[0] == 'agent' and key[1] == invocation_id]
+        parent = running[-1] if running else self._open.get(('run', invocation_id))
+        self._start(('agent', invocation_id, agent.name), f'agent.{agent.name}', parent, agent=agent.name)
+        return None
+
+    async def after_agent_callback(self, *, agent, callback_context):
+        self._end(('agent', callback_context.invocation_id, agent.name))
+        return None
+
+    async def on_agent_error_callback(self, *, agent, callback_context, error):
+        self._end(('agent', callback_context.invocation_id, agent.name), error)
+
+    async def on_event_callback(self, *, invocation_context, event):
+        # A final response ends the agent's work even when its after_agent_callback never runs.
+        if event.content and event.content.parts and event.is_final_response():
+            self._end(('agent', invocation_context.invocation_id, event.author))
+        return None
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        invocation_id = callback_context.invocation_id
+        self._start(('model', invocation_id, callback_context.agent_name), f'llm.{callback_context.agent_name}',
+                    self._open.get(('agent', invocation_id, callback_context.agent_name)),
+                    agent=callback_context.agent_name, model=llm_request.model)
+        return None
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        if llm_response.partial:
+            return None
+        key = ('model', callback_context.invocation_id, callback_context.agent_name)
+        opened = self._open.get(key)
+        usage = llm_response.usage_metadata
+        if opened is not None and usage is not None:
+            opened.set(prompt_tokens=usage.prompt_token_count or 0,
+                       completion_tokens=usage.candidates_token_count or 0)
+        self._end(key)
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        self._end(('model', callback_context.invocation_id, callback_context.agent_name), error)
+        return None
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        invocation_id = tool_context.invocation_id
+        opened = self._start(('tool', invocation_id, tool_context.function_call_id), f'tool.{tool.name}',
+                             self._open.get(('agent', invocation_id, tool_context.agent_name)),
+                             tool=tool.name, agent=tool_context.agent_name)
+        self._tokens[tool_context.function_call_id] = _current.set(opened)
+        return None
+
+    def _end_tool(self, tool_context, error: Optional[Exception] = None) -> None:
+        token = self._tokens.pop(tool_context.function_call_id, None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Set in another context (a parallel tool call); nothing to restore here.
+                pass
+        self._end(('tool', tool_context.invocation_id, tool_context.function_call_id), error)
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        self._end_tool(tool_context)
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        self._end_tool(tool_context, error)
+        return None
@@ -1,32 +1,22 @@
 from google.adk.agents import Agent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
 from google.adk.models.lite_llm import LiteLlm
+from google.genai import types
 from pydantic import BaseModel
+from typing import Optional
 import json
 
-# gaurdrails for the list of specialties from json file
-'''class ReadJson():
-    def __init__(self):
-        self.list_of_providers=[]
-        self.list_of_dicts=[]
-    def init_json(self):
-        with open('/home/labadmin/Documents/agentic-ai/CareNavigator/diagnosis_agent/providers_name.json', 'r') as f:
-            self.list_of_dicts = json.load(f)
-    def reading_items(self):
-        for items in self.list_of_dicts:
-            self.list_of_providers.append(items['Provider Type'])
-        return(self.list_of_providers)
-    def create_list(self):
-        self.init_json()
-        return(self.reading_items())'''
+from .cache import diagnosis_cache
+from .render import render_diagnosis, use_template
+from .specialties import get_resolver
 
 #For structured response generation
 class DiagnosisOutput(BaseModel):
     diagnosis: str
     specialty: str
-# this is to cover cases  Family Medicine/  Internal Medicine
-list_of_specialties=ReadJson().create_list()
 
-SYSTEM_INSTRUCTIONS = f"""
+SYSTEM_INSTRUCTIONS = """
 You are a helpful medical assistant. Your main task is to provide a diagnosis based on the 
 patient's symptoms.
 
@@ -40,13 +30,98 @@ MANDATORY: SUGGEST ONLY ONE SPECIALTY, WITHOUT ADDITIONAL EXPLANATIONS, AND DO N
 """
 
 
+def _patient_text(context: ReadonlyContext) -> str:
+    """
+    What the patient has said since the last diagnosis, which is what this diagnosis is based on.
+    Later turns (address, insurance) and earlier triages are left out.
+    """
+    texts = []
+    for event in context.session.events:
+        # A diagnosis from an earlier turn; this turn's own answer (seen by cache_diagnosis) is not a reset.
+        if event.author == 'diagnosis_agent' and event.invocation_id != context.invocation_id:
+            texts = []
+        elif event.author == 'user' and event.content and event.content.parts:
+            texts.extend(part.text for part in event.content.parts if part.text)
+    if not texts and context.user_content and context.user_content.parts:
+        texts = [part.text for part in context.user_content.parts if part.text]
+    return ' '.join(texts)
+
+
+# gaurdrails for the list of specialties from json file
+def build_instructions(context: ReadonlyContext) -> str:
+    """Offer the model only a short list of specialties relevant to the patient's symptoms."""
+    shortlist = get_resolver().shortlist(_patient_text(context))
+    return SYSTEM_INSTRUCTIONS.format(list_of_specialties=shortlist)
+
+
+def enforce_specialty(callback_context: CallbackContext) -> None:
+    """Map the model's specialty onto a provider type from providers_name.json."""
+    diagnosis = callback_context.state.get('diagnosis')
+    if not isinstance(diagnosis, dict):
+        return
+    specialty = get_resolver().resolve(diagnosis.get('specialty', ''))
+    if specialty != diagnosis.get('specialty'):
+        callback_context.state['diagnosis'] = {**diagnosis, 'specialty': specialty}
+
+
+# --- Diagnosis cache callbacks ---
+def use_cached_diagnosis(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Skip the diagnosis LLM call when an equivalent description was triaged before."""
+    entry = diagnosis_cache.lookup(_patient_text(callback_context))
+    if entry is None:
+        callback_context.state['diagnosis_cache_key'] = None
+        return None
+    callback_context.state['diagnosis'] = entry.diagnosis
+    callback_context.state['diagnosis_cache_key'] = entry.key
+    return types.Content(role='model', parts=[types.Part(text=json.dumps(entry.diagnosis))])
+
+
+def cache_diagnosis(callback_context: CallbackContext) -> None:
+    diagnosis = callback_context.state.get('diagnosis')
+    if isinstance(diagnosis, dict):
+        key = diagnosis_cache.store(_patient_text(callback_context), diagnosis)
+        callback_context.state['diagnosis_cache_key'] = key
+
+
+def use_cached_explanation(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Skip the display LLM call when the cached diagnosis already has a rendered explanation."""
+    explanation = diagnosis_cache.explanation(
+        callback_context.state.get('diagnosis_cache_key'), callback_context.state.get('diagnosis')
+    )
+    if explanation is None:
+        return None
+    return types.Content(role='model', parts=[types.Part(text=explanation)])
+
+
+def render_display(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Render the diagnosis from the local template instead of calling the display LLM (CARENAV_DISPLAY_MODE=template)."""
+    if not use_template():
+        return use_cached_explanation(callback_context)
+    explanation = render_diagnosis(callback_context.state.get('diagnosis'))
+    if explanation is None:
+        # Nothing structured to render, let the LLM explain whatever diagnosis_agent produced.
+        return use_cached_explanation(callback_context)
+    callback_context.state['diagnosis_display'] = explanation
+    return types.Content(role='model', parts=[types.Part(text=explanation)])
+
+
+def cache_explanation(callback_context: CallbackContext) -> None:
+    explanation = callback_context.state.get('diagnosis_display')
+    if explanation:
+        diagnosis_cache.store_explanation(
+            callback_context.state.get('diagnosis_cache_key'), callback_context.state.get('diagnosis'), explanation
+        )
+
+
 diagnosis_agent = Agent(
     model=LiteLlm(model="openai/gpt-4o"),
     name='diagnosis_agent',
     description='An agent that provides possible diagnoses based on symptoms, age, and gender.',
-    instruction=SYSTEM_INSTRUCTIONS,
+    instruction=build_instructions,
     output_key='diagnosis',
-    output_schema=DiagnosisOutput
+    output_schema=DiagnosisOutput,
+    before_agent_callback=use_cached_diagnosis,
+    after_agent_callback=[enforce_specialty, cache_diagnosis]
 )
 
 display_diagnosis_agent = Agent(
@@ -59,8 +134,10 @@ display_diagnosis_agent = Agent(
     {diagnosis}
     
     End with: Would you like me to assist you with finding the provider?    
-    '''
-        
+    ''',
+    output_key='diagnosis_display',
+    before_agent_callback=render_display,
+    after_agent_callback=cache_explanation
 )
 
 
@@ -0,0 +1,220 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# Cosine similarity (over TF-IDF vectors of symptom terms) above which a stored triage is reused
+# for a differently worded description. Set to 1 or more to only reuse exact canonical matches.
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("CARENAV_DIAGNOSIS_CACHE_THRESHOLD", "0.85"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("CARENAV_DIAGNOSIS_CACHE_SIZE", "512"))
+DEFAULT_TTL = float(os.getenv("CARENAV_DIAGNOSIS_CACHE_TTL", str(7 * 24 * 60 * 60)))
+
+AGE_BANDS = ((1, "infant"), (12, "child"), (17, "teen"), (39, "adult"), (64, "middle-aged"))
+
+# Only phrases that state an age ("60 years old", "a 7-year-old", "45 yo", "age 30"), so that a
+# duration such as "headaches for 2 years" is not read as one.
+AGE_PATTERN = re.compile(
+    r"\b(\d{1,3})\s*-?\s*(?:years?|yrs?)\s*-?\s*old\b|\b(\d{1,3})\s*y/?o\b|\bage[d:]?\s*(?:of\s+|is\s+)?(\d{1,3})\b",
+    re.IGNORECASE,
+)
+# Words that state the patient's sex; pronouns and relatives are left out, they may be about someone else.
+SEX_WORDS = {
+    "female": {"female", "woman", "girl", "lady"},
+    "male": {"male", "man", "boy", "gentleman"},
+}
+# "45 yo F", "32 y/o male": a sex letter is only read right after an age.
+SEX_AFTER_AGE = re.compile(r"\b\d{1,3}\s*(?:y/?o|years?\s*old)\s*,?\s*(f|m)\b", re.IGNORECASE)
+MALE_WORDS = {"male", "man", "boy", "he", "him", "his", "m", "gentleman", "father", "husband", "son"}
+FEMALE_WORDS = {"female", "woman", "girl", "she", "her", "hers", "f", "lady", "mother", "wife", "daughter"}
+
+STOPWORDS = {
+    "a", "about", "after", "all", "also", "am", "an", "and", "any", "are", "as", "at", "bad", "be", "been",
+    "but", "by", "can", "could", "days", "do", "does", "doctor", "feel", "feeling", "for", "from",
+    "get", "getting", "had", "has", "have", "having", "i", "i'm", "im", "in", "is", "it", "its", "just",
+    "last", "like", "me", "my", "of", "old", "on", "or", "past", "please", "really", "since", "so",
+    "some", "that", "the", "there", "this", "to", "very", "was", "week", "weeks", "what", "when",
+    "with", "year", "years", "yo", "you", "age", "aged",
+} | MALE_WORDS | FEMALE_WORDS
+
+# Lay terms mapped onto a shared word so "tummy ache" and "stomach pain" look alike.
+SYNONYMS = {
+    "tummy": "stomach", "belly": "stomach", "abdomen": "stomach", "abdominal": "stomach",
+    "ache": "pain", "aches": "pain", "aching": "pain", "hurts": "pain", "hurt": "pain",
+    "sore": "pain", "painful": "pain",
+    "puking": "vomit", "vomiting": "vomit", "throwing": "vomit",
+    "feverish": "fever", "temperature": "fever",
+    "headaches": "headache", "migraine": "headache", "migraines": "headache",
+    "tired": "fatigue", "exhausted": "fatigue", "exhaustion": "fatigue",
+    "breathless": "breath", "breathing": "breath",
+    "dizzy": "dizziness", "lightheaded": "dizziness",
+}
+
+
+def age_band(text: str) -> str:
+    match = AGE_PATTERN.search(text)
+    if not match:
+        return "unknown"
+    age = int(next(group for group in match.groups() if group))
+    for upper, band in AGE_BANDS:
+        if age <= upper:
+            return band
+    return "senior"
+
+
+def sex(text: str) -> str:
+    # Contractions are dropped first, so "I'm" is not read as "m".
+    words = set(re.findall(r"[a-z]+", re.sub(r"['\u2019](?:m|s|re|ve|ll|d)\b", "", text.lower())))
+    letter = SEX_AFTER_AGE.search(text)
+    if letter:
+        words.add("female" if letter.group(1).lower() == "f" else "male")
+    for value in ("female", "male"):
+        if words & SEX_WORDS[value]:
+            return value
+    return "unknown"
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[: -len(suffix)]
+    return word
+
+
+def symptom_terms(text: str) -> Counter:
+    """Normalized symptom words in `text`, without stop words, ages or sex."""
+    terms = Counter()
+    for word in re.findall(r"[a-z][a-z']+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        terms[_stem(SYNONYMS.get(word, word))] += 1
+    return terms
+
+
+def canonical_key(text: str) -> str:
+    """The "age band|sex|sorted symptom terms" key for a patient description."""
+    return "|".join((age_band(text), sex(text), " ".join(sorted(symptom_terms(text)))))
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    terms: Counter
+    diagnosis: Dict[str, Any]
+    created: float = field(default_factory=time.time)
+    explanation: Optional[str] = None
+
+
+class DiagnosisCache:
+    """
+    In-memory LRU cache of triage results keyed on normalized patient descriptions.
+
+    A lookup first tries the exact canonical key. Failing that, it compares the description's
+    TF-IDF vector with stored entries of the same age band and sex and reuses the closest one if
+    its cosine similarity reaches `similarity_threshold`. Hit and miss counters are kept in `stats`.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._document_frequency: Counter = Counter()
+        self._lock = threading.Lock()
+        self.stats = Counter(hits=0, similar_hits=0, misses=0, explanation_hits=0)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["similar_hits"] + self.stats["misses"]
+        return (self.stats["hits"] + self.stats["similar_hits"]) / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _idf(self, term: str) -> float:
+        return math.log((len(self._entries) + 1) / (self._document_frequency[term] + 1)) + 1
+
+    def _cosine(self, a: Counter, b: Counter) -> float:
+        weights_a = {term: count * self._idf(term) for term, count in a.items()}
+        weights_b = {term: count * self._idf(term) for term, count in b.items()}
+        dot = sum(weight * weights_b.get(term, 0.0) for term, weight in weights_a.items())
+        norm = math.sqrt(sum(w * w for w in weights_a.values())) * math.sqrt(sum(w * w for w in weights_b.values()))
+        return dot / norm if norm else 0.0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._document_frequency.subtract(entry.terms.keys())
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.created > self.ttl
+
+    def lookup(self, text: str) -> Optional[CacheEntry]:
+        """Return the stored triage for a patient description, or None on a miss."""
+        key = canonical_key(text)
+        group, symptoms = key.rsplit("|", 1)
+        if not symptoms:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+            terms = symptom_terms(text)
+            best, best_score = None, 0.0
+            for candidate in list(self._entries.values()):
+                if candidate.key.rsplit("|", 1)[0] != group:
+                    continue
+                if self._expired(candidate):
+                    self._remove(candidate.key)
+                    continue
+                score = self._cosine(terms, candidate.terms)
+                if score > best_score:
+                    best, best_score = candidate, score
+            if best is not None and best_score >= self.similarity_threshold:
+                self._entries.move_to_end(best.key)
+                self.stats["similar_hits"] += 1
+                return best
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, text: str, diagnosis: Dict[str, Any]) -> Optional[str]:
+        """Store the triage result for a patient description and return its cache key."""
+        key = canonical_key(text)
+        if not key.rsplit("|", 1)[1]:
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            terms = symptom_terms(text)
+            self._entries[key] = CacheEntry(key=key, terms=terms, diagnosis=dict(diagnosis))
+            self._document_frequency.update(terms.keys())
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return key
+
+    def explanation(self, key: Optional[str], diagnosis: Any) -> Optional[str]:
+        """Return the rendered explanation stored for `key` if it was written for `diagnosis`."""
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry.explanation is None or entry.diagnosis != diagnosis:
+                return None
+            self.stats["explanation_hits"] += 1
+            return entry.explanation
+
+    def store_explanation(self, key: Optional[str], diagnosis: Any, explanation: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None and entry.diagnosis == diagnosis:
+                entry.explanation = explanation
+
+
+diagnosis_cache = DiagnosisCache()
@@ -0,0 +1,43 @@
+import json
+import os
+from typing import Any, Optional
+
+# "template" renders the diagnosis locally; "llm" keeps display_diagnosis_agent's gpt-4o rewording.
+DISPLAY_MODE = os.getenv("CARENAV_DISPLAY_MODE", "template").strip().lower()
+
+DISPLAY_TEMPLATE = """Based on the symptoms you described, a possible diagnosis is **{diagnosis}**.
+
+A **{specialty}** specialist would be the right kind of doctor to evaluate and treat this condition.
+
+Please keep in mind that this is a preliminary diagnosis only. It is not a substitute for an examination by a medical professional, and if your symptoms are severe or getting worse, please seek urgent care.
+
+Would you like me to assist you with finding the provider?"""
+
+
+def use_template(mode: Optional[str] = None) -> bool:
+    """Whether diagnoses are rendered from DISPLAY_TEMPLATE rather than by the display LLM."""
+    return (mode or DISPLAY_MODE) != "llm"
+
+
+def render_diagnosis(diagnosis: Any) -> Optional[str]:
+    """
+    Render the diagnosis_agent output as the message shown to the patient.
+
+    Args:
+        diagnosis (dict or str): The `DiagnosisOutput` stored in state, as a dict or its JSON text.
+
+    Returns:
+        str: The rendered message, or None if `diagnosis` has no diagnosis/specialty to show.
+    """
+    if isinstance(diagnosis, str):
+        try:
+            diagnosis = json.loads(diagnosis)
+        except ValueError:
+            return None
+    if not isinstance(diagnosis, dict):
+        return None
+    condition = str(diagnosis.get("diagnosis") or "").strip()
+    specialty = str(diagnosis.get("specialty") or "").strip()
+    if not condition or not specialty:
+        return None
+    return DISPLAY_TEMPLATE.format(diagnosis=condition, specialty=specialty)
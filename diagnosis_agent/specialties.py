@@ -0,0 +1,142 @@
+import difflib
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROVIDERS_PATH = Path(__file__).parent / 'providers_name.json'
+
+# Used when the model's answer cannot be mapped onto any provider type;
+# this is to cover cases  Family Medicine/  Internal Medicine
+DEFAULT_SPECIALTY = 'Family Medicine'
+
+# Common clinical specialties always offered to the model.
+CORE_SPECIALTIES = [
+    'Family Medicine', 'Internal Medicine', 'Pediatrics', 'Cardiology', 'Dermatology',
+    'Gastroenterology', 'Neurology', 'Oncology', 'Orthopedic Surgery', 'Psychiatry',
+    'Pulmonary Disease', 'Obstetrics & Gynecology',
+]
+
+# Free-text answers the model tends to give, mapped onto provider types from providers_name.json.
+SYNONYMS = {
+    'primary care': 'Family Medicine', 'general practice': 'Family Medicine', 'general practitioner': 'Family Medicine',
+    'gp': 'Family Medicine', 'pcp': 'Family Medicine', 'family doctor': 'Family Medicine',
+    'internist': 'Internal Medicine', 'pediatrician': 'Pediatrics',
+    'cardiologist': 'Cardiology', 'cardiovascular disease': 'Cardiology',
+    'dermatologist': 'Dermatology', 'neurologist': 'Neurology',
+    'gastroenterologist': 'Gastroenterology', 'gi': 'Gastroenterology',
+    'oncologist': 'Oncology', 'medical oncology': 'Oncology', 'hematologist': 'Hematology',
+    'hematology oncology': 'Oncology', 'hematology and oncology': 'Oncology',
+    'endocrinology': 'Endocrinology, Diabetes & Metabolism', 'endocrinologist': 'Endocrinology, Diabetes & Metabolism',
+    'pulmonology': 'Pulmonary Disease', 'pulmonologist': 'Pulmonary Disease',
+    'ent': 'Ear, Nose, and Throat', 'otolaryngology': 'Ear, Nose, and Throat', 'otolaryngologist': 'Ear, Nose, and Throat',
+    'ob gyn': 'Obstetrics & Gynecology', 'obgyn': 'Obstetrics & Gynecology', 'gynecology': 'Obstetrics & Gynecology',
+    'gynecologist': 'Obstetrics & Gynecology', 'obstetrician': 'Obstetrics & Gynecology',
+    'orthopedics': 'Orthopedic Surgery', 'orthopaedics': 'Orthopedic Surgery', 'orthopedist': 'Orthopedic Surgery',
+    'orthopedic surgeon': 'Orthopedic Surgery', 'psychiatrist': 'Psychiatry', 'psychologist': 'Psychology',
+    'urologist': 'Urology', 'nephrologist': 'Nephrology', 'rheumatologist': 'Rheumatology',
+    'allergist': 'Allergy & Immunology', 'allergy': 'Allergy & Immunology', 'immunology': 'Allergy & Immunology',
+    'infectious disease': 'Infectious Disease Medicine', 'infectious diseases': 'Infectious Disease Medicine',
+    'ophthalmologist': 'Ophthalmology', 'eye doctor': 'Ophthalmology', 'dentist': 'Dentistry',
+    'podiatrist': 'Podiatry', 'physiatry': 'Physical Medicine & Rehabilitation',
+    'sleep specialist': 'Sleep Medicine', 'emergency room': 'Emergency Medicine', 'er': 'Emergency Medicine',
+    'surgeon': 'General Surgery', 'general surgeon': 'General Surgery', 'geriatrics': 'Geriatric Medicine',
+}
+
+# Symptom words that make a specialty worth offering in the prompt shortlist. A plain key matches
+# the whole word and its plural ("ear", "ears", not "early"); a key ending in "*" is a stem
+# matching any word it starts ("dizz*": "dizzy", "dizziness").
+SYMPTOM_HINTS = {
+    'chest': ['Cardiology'], 'heart': ['Cardiology'], 'palpitation*': ['Cardiology', 'Clinical Cardiac Electrophysiology'],
+    'rash': ['Dermatology'], 'skin': ['Dermatology'], 'itch*': ['Dermatology', 'Allergy & Immunology'],
+    'headache': ['Neurology'], 'migraine': ['Neurology'], 'seizure': ['Neurology'], 'numb': ['Neurology'],
+    'numbness': ['Neurology'], 'dizz*': ['Neurology', 'Ear, Nose, and Throat'], 'cough*': ['Pulmonary Disease'],
+    'breath*': ['Pulmonary Disease'], 'wheez*': ['Pulmonary Disease', 'Allergy & Immunology'],
+    'asthma*': ['Allergy & Immunology', 'Pulmonary Disease'],
+    'stomach': ['Gastroenterology'], 'abdom*': ['Gastroenterology'], 'nause*': ['Gastroenterology'],
+    'vomit*': ['Gastroenterology'], 'diarr*': ['Gastroenterology'], 'constipat*': ['Gastroenterology'],
+    'urin*': ['Urology', 'Nephrology'], 'kidney': ['Nephrology'], 'joint': ['Rheumatology', 'Orthopedic Surgery'],
+    'knee': ['Orthopedic Surgery', 'Sports Medicine'], 'back': ['Orthopedic Spine Surgery', 'Physical Medicine & Rehabilitation'],
+    'fracture*': ['Orthopedic Surgery'], 'anxi*': ['Psychiatry', 'Psychology'], 'depress*': ['Psychiatry', 'Psychology'],
+    'sleep*': ['Sleep Medicine'], 'insomnia': ['Sleep Medicine'], 'pregnan*': ['Obstetrics & Gynecology'],
+    'period': ['Obstetrics & Gynecology'], 'menstrua*': ['Obstetrics & Gynecology'],
+    'thyroid': ['Endocrinology, Diabetes & Metabolism'], 'diabet*': ['Endocrinology, Diabetes & Metabolism'],
+    'thirst*': ['Endocrinology, Diabetes & Metabolism'], 'ear': ['Ear, Nose, and Throat'],
+    'earache': ['Ear, Nose, and Throat'], 'throat': ['Ear, Nose, and Throat'],
+    'sinus*': ['Ear, Nose, and Throat'], 'eye': ['Ophthalmology'], 'vision': ['Ophthalmology'],
+    'lump': ['Oncology', 'General Surgery'], 'cancer*': ['Oncology'], 'tumor*': ['Oncology'],
+    'bruis*': ['Hematology'], 'anemi*': ['Hematology'], 'bleed*': ['Hematology'], 'fever*': ['Infectious Disease Medicine'],
+    'tooth': ['Dentistry'], 'teeth': ['Dentistry'], 'gum': ['Periodontics'], 'foot': ['Podiatry'], 'feet': ['Podiatry'],
+    'allerg*': ['Allergy & Immunology'], 'memory': ['Neurology', 'Geriatric Medicine'],
+}
+
+_HINT_PATTERNS = [
+    (re.compile(rf'{re.escape(key[:-1])}[a-z]*' if key.endswith('*') else rf'{re.escape(key)}(?:e?s)?'), names)
+    for key, names in SYMPTOM_HINTS.items()
+]
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower().replace('&', ' and ')).split())
+
+
+class SpecialtyResolver:
+    """
+    Maps free-text specialties onto the provider types listed in providers_name.json.
+
+    Resolution tries, in order: an exact (normalized) match, the synonym table, a provider type
+    or synonym contained in the answer, and finally fuzzy matching. Anything left falls back to DEFAULT_SPECIALTY,
+    which keeps the suggested specialty inside the guardrail list.
+    """
+
+    def __init__(self, specialties: List[str]):
+        self.specialties = list(specialties)
+        self._by_key: Dict[str, str] = {_normalize(name): name for name in self.specialties}
+        self._synonyms = {
+            _normalize(alias): name for alias, name in SYNONYMS.items() if _normalize(name) in self._by_key
+        }
+
+    def match(self, text: str) -> Optional[str]:
+        """Return the provider type `text` refers to, or None if nothing is close enough."""
+        key = _normalize(text)
+        if not key:
+            return None
+        if key in self._by_key:
+            return self._by_key[key]
+        if key in self._synonyms:
+            return self._synonyms[key]
+        contained = [name for k, name in self._by_key.items() if re.search(rf'\b{re.escape(k)}\b', key)]
+        if contained:
+            return max(contained, key=len)
+        for alias in sorted(self._synonyms, key=len, reverse=True):
+            if re.search(rf'\b{re.escape(alias)}\b', key):
+                return self._synonyms[alias]
+        close = difflib.get_close_matches(key, list(self._by_key) + list(self._synonyms), n=1, cutoff=0.8)
+        if close:
+            return self._by_key.get(close[0]) or self._synonyms[close[0]]
+        return None
+
+    def resolve(self, text: str) -> str:
+        """Return the provider type for `text`, falling back to DEFAULT_SPECIALTY."""
+        return self.match(text) or DEFAULT_SPECIALTY
+
+    def shortlist(self, symptoms: str, limit: int = 15) -> List[str]:
+        """Specialties relevant to the described symptoms, followed by the core specialties."""
+        words = re.findall(r'[a-z]+', symptoms.lower())
+        hinted = [
+            name
+            for word in words
+            for pattern, names in _HINT_PATTERNS
+            if pattern.fullmatch(word)
+            for name in names
+        ]
+        shortlist = [name for name in dict.fromkeys(hinted + CORE_SPECIALTIES) if _normalize(name) in self._by_key]
+        return shortlist[:limit]
+
+
+@lru_cache(maxsize=1)
+def get_resolver() -> SpecialtyResolver:
+    """Load providers_name.json next to this module once and build the resolver."""
+    with open(PROVIDERS_PATH, 'r') as f:
+        return SpecialtyResolver([item['Provider Type'] for item in json.load(f)])
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from google.genai import types
+
+from .insurance_agent import BatchInsuranceOutput, batch_insurance_agent
+from .matcher import NO_PLANS_REASON, match_insurance, plan_names
+
+APP_NAME = "insurance_batch_app"
+USER_ID = "search_agent"
+
+# Rough prompt budget per LLM call (about 4 characters per token), well inside gpt-4o's context
+# window once the instruction and the structured response are added.
+MAX_PROMPT_CHARS = 48_000
+
+
+@lru_cache(maxsize=1)
+def get_runner():
+    """The runner for batch_insurance_agent, built on the first batch that needs the LLM."""
+    from google.adk.apps import App
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from common.telemetry_plugin import TelemetryPlugin
+
+    return Runner(
+        app=App(name=APP_NAME, root_agent=batch_insurance_agent, plugins=[TelemetryPlugin()]),
+        session_service=InMemorySessionService(),
+    )
+
+
+def _doctor_entry(doctor: Dict[str, Any]) -> Dict[str, Any]:
+    insurance = doctor.get("insurance_plans") or doctor.get("insurance_data")
+    return {"url": doctor.get("url", ""), "insurance_plans": plan_names(insurance)}
+
+
+def split_batches(entries: List[Dict[str, Any]], max_chars: int = MAX_PROMPT_CHARS) -> List[List[Dict[str, Any]]]:
+    """
+    Split doctor entries into batches whose JSON fits in `max_chars`. A single oversized entry
+    still gets its own batch.
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    size = 0
+    for entry in entries:
+        entry_size = len(json.dumps(entry)) + 2
+        if current and size + entry_size > max_chars:
+            batches.append(current)
+            current, size = [], 0
+        current.append(entry)
+        size += entry_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _ask_llm(patient_plan: str, batch: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    runner = get_runner()
+    session = await runner.session_service.create_session(
+        app_name=APP_NAME, user_id=USER_ID, session_id=str(uuid.uuid4())
+    )
+    user_message_text = (
+        f"Patient insurance plan: {patient_plan}. "
+        f"Doctors: {json.dumps(batch)}. "
+        "Please check each doctor."
+    )
+    user_content = types.Content(role="user", parts=[types.Part(text=user_message_text)])
+
+    final_text = ""
+    async for event in runner.run_async(user_id=USER_ID, session_id=session.id, new_message=user_content):
+        if event.is_final_response() and event.content and event.content.parts:
+            final_text = event.content.parts[0].text or ""
+
+    output = BatchInsuranceOutput.model_validate_json(final_text)
+    return {
+        verdict.url: {"acceptsInsurance": verdict.acceptsInsurance, "reason": verdict.reason}
+        for verdict in output.verdicts
+    }
+
+
+async def check_insurance_batch(patient_plan: str, doctors: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Check a patient's insurance plan against many doctors at once.
+
+    Clear-cut cases are decided locally by the insurance matcher. The remaining doctors are sent
+    to batch_insurance_agent in as few calls as fit the model's context window, run concurrently,
+    so 20 doctors cost one or two LLM round trips instead of 20.
+
+    Args:
+        patient_plan (str): The patient's insurance plan.
+        doctors (list[dict]): Doctor profiles, each with a "url" and either "insurance_plans"
+            or "insurance_data".
+
+    Returns:
+        dict: Verdicts keyed by doctor URL, each {"acceptsInsurance": bool, "reason": str}. Doctors
+        whose plans are not listed, and the doctors of a batch that fails, get "acceptsInsurance":
+        null with the reason.
+    """
+    verdicts: Dict[str, Dict[str, Any]] = {}
+    ambiguous: Dict[str, Dict[str, Any]] = {}
+    for doctor in doctors:
+        entry = _doctor_entry(doctor)
+        verdict = match_insurance(patient_plan, entry["insurance_plans"])
+        if verdict is None and not entry["insurance_plans"]:
+            # Nothing for the model to compare either.
+            verdicts[entry["url"]] = {"acceptsInsurance": None, "reason": NO_PLANS_REASON}
+        elif verdict is None:
+            ambiguous[entry["url"]] = entry
+        else:
+            verdicts[entry["url"]] = verdict
+
+    batches = split_batches(list(ambiguous.values()))
+    results = await asyncio.gather(
+        *(_ask_llm(patient_plan, batch) for batch in batches), return_exceptions=True
+    )
+    for batch, result in zip(batches, results):
+        for entry in batch:
+            if isinstance(result, Exception):
+                verdicts[entry["url"]] = {"acceptsInsurance": None, "reason": f"Insurance check failed: {result}"}
+            else:
+                verdicts[entry["url"]] = result.get(
+                    entry["url"], {"acceptsInsurance": None, "reason": "No verdict returned for this doctor."}
+                )
+    return verdicts
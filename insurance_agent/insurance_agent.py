@@ -2,13 +2,14 @@
 import os
 import json
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from google.adk.agents.llm_agent import Agent
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
 from google.genai import types
+from pydantic import BaseModel
 
 
 insurance_agent = Agent(
@@ -27,6 +28,35 @@ insurance_agent = Agent(
     ),
     tools=[],
 )
+
+
+#For structured batch response generation
+class InsuranceVerdict(BaseModel):
+    url: str
+    acceptsInsurance: bool
+    reason: str
+
+
+class BatchInsuranceOutput(BaseModel):
+    verdicts: List[InsuranceVerdict]
+
+
+batch_insurance_agent = Agent(
+    model=LiteLlm(model="openai/gpt-4o", api_key=os.getenv("OPENAI_API_KEY")),
+    name="batch_insurance_agent",
+    description="Agent that checks a patient's insurance against the accepted plans of many doctors in one call.",
+    instruction=(
+        "You are an expert insurance matching assistant. "
+        "The user will provide the patient's plan and a JSON list of doctors, each with a url and accepted insurance plans. "
+        "For every doctor, determine if the patient's insurance is accepted. "
+        "When checking, be flexible with plan variations (e.g., 'Blue Cross' matches 'Blue Cross Blue Shield'). "
+        "However, do not assume unrelated plans are compatible (e.g., 'Blue Cross' is not a match for 'Blue Shield of California'). "
+        "Provide a concise, direct reason for each match or non-match. "
+        "Return exactly one verdict per doctor, using the doctor's url unchanged."
+    ),
+    output_schema=BatchInsuranceOutput,
+    output_key="insurance_verdicts",
+)
 '''
 session_service = InMemorySessionService()
 
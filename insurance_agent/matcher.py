@@ -0,0 +1,192 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+# Canonical carrier -> spellings and abbreviations patients and Healthgrades use for it.
+CARRIER_ALIASES = {
+    "unitedhealthcare": ["unitedhealthcare", "united healthcare", "united health care", "unitedhealth",
+                         "united health", "unitedhealth group", "uhc", "unh"],
+    "aetna": ["aetna"],
+    "cigna": ["cigna", "cigna healthcare"],
+    "humana": ["humana"],
+    "kaiser permanente": ["kaiser permanente", "kaiser"],
+    "molina healthcare": ["molina healthcare", "molina"],
+    "centene": ["centene corporation", "centene", "ambetter", "wellcare"],
+    "blue shield of california": ["blue shield of california", "blue shield california"],
+    "medicare": ["medicare"],
+    "medicaid": ["medicaid"],
+    "tricare": ["tricare"],
+    # Blue Cross Blue Shield licensees.
+    "anthem": ["anthem"],
+    "highmark": ["highmark"],
+    "regence": ["regence"],
+    "premera": ["premera"],
+    "carefirst": ["carefirst"],
+    "wellmark": ["wellmark"],
+    "excellus": ["excellus"],
+    "horizon": ["horizon"],
+    "blue cross blue shield": ["blue cross blue shield", "blue cross and blue shield", "blue cross",
+                               "bluecross blueshield", "bluecross", "bcbs", "bcbsa"],
+}
+
+# Plans that belong to the Blue Cross Blue Shield family. Blue Shield of California is deliberately
+# left out: "Blue Cross" must not be treated as a match for it.
+BCBS_FAMILY = frozenset({"blue cross blue shield", "anthem", "highmark", "regence", "premera",
+                         "carefirst", "wellmark", "excellus", "horizon"})
+
+# Government programs, also sold through commercial carriers (Medicare Advantage, managed Medicaid),
+# so a shared program name alone does not say the networks match.
+GOVERNMENT_PROGRAMS = frozenset({"medicare", "medicaid", "tricare"})
+
+NO_PLANS_REASON = "The doctor's accepted insurance plans are not listed; confirm with the office."
+
+_ALIAS_PATTERNS = sorted(
+    ((alias, carrier) for carrier, aliases in CARRIER_ALIASES.items() for alias in aliases),
+    key=lambda item: len(item[0]),
+    reverse=True,
+)
+
+
+def normalize_plan(plan: str) -> str:
+    """Lower-case a plan name and reduce punctuation and repeated whitespace to single spaces."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", plan.casefold()).split())
+
+
+def plan_carriers(plan: str) -> FrozenSet[str]:
+    """
+    Return the canonical carriers named in a plan.
+
+    "Highmark (Blue Cross Blue Shield affiliate)" names both highmark and blue cross blue shield.
+    Longer aliases are matched first so "Blue Shield of California" is not read as a BCBS plan.
+    """
+    text = f" {normalize_plan(plan)} "
+    carriers = set()
+    for alias, carrier in _ALIAS_PATTERNS:
+        needle = f" {alias} "
+        if needle in text:
+            carriers.add(carrier)
+            text = text.replace(needle, " ")
+    return frozenset(carriers)
+
+
+def plan_names(insurance: Any) -> List[str]:
+    """
+    Flatten doctor insurance information into a list of plan names.
+
+    Accepts the `insurance_plans` list of strings used by the doctor directory as well as the
+    nested `insurance_data` structure scraped from Healthgrades, where plan and carrier names are
+    stored under keys such as "name" or "carrierName".
+    """
+    names: List[str] = []
+    if insurance is None:
+        return names
+    if isinstance(insurance, str):
+        names.append(insurance)
+    elif isinstance(insurance, dict):
+        for key, value in insurance.items():
+            if isinstance(value, str) and "name" in key.lower():
+                names.append(value)
+            elif isinstance(value, (list, dict)):
+                names.extend(plan_names(value))
+    elif isinstance(insurance, (list, tuple)):
+        for item in insurance:
+            names.extend(plan_names(item))
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+def _verdict(accepts: Optional[bool], reason: str) -> Dict[str, Any]:
+    return {"acceptsInsurance": accepts, "reason": reason}
+
+
+@lru_cache(maxsize=4096)
+def _match(patient_plan: str, doctor_plans: Tuple[str, ...]) -> Optional[Tuple[bool, str]]:
+    if not doctor_plans:
+        # Missing or not parsed from the profile, which says nothing about what the doctor accepts.
+        return None
+
+    patient_key = normalize_plan(patient_plan)
+    for plan in doctor_plans:
+        if normalize_plan(plan) == patient_key:
+            return (True, f"The doctor accepts {plan}.")
+
+    patient = plan_carriers(patient_plan)
+    doctor = {plan: plan_carriers(plan) for plan in doctor_plans}
+    if not patient:
+        return None
+
+    undecided = False
+    for plan, carriers in doctor.items():
+        shared = (patient & carriers) - {"blue cross blue shield"}
+        if not shared:
+            continue
+        programs = patient & GOVERNMENT_PROGRAMS
+        if programs != carriers & GOVERNMENT_PROGRAMS or (programs and patient - programs != carriers - programs):
+            # e.g. "Medicare" and "Aetna Medicare Advantage", or "Aetna" and "Aetna Medicare Advantage".
+            undecided = True
+            continue
+        return (True, f"{patient_plan} is the same carrier as the accepted plan {plan}.")
+
+    if "blue cross blue shield" in patient:
+        specific = (patient & BCBS_FAMILY) - {"blue cross blue shield"}
+        for plan, carriers in doctor.items():
+            if "blue cross blue shield" not in carriers and not carriers & BCBS_FAMILY:
+                continue
+            if not specific:
+                return (True, f"{patient_plan} is a Blue Cross Blue Shield plan and the doctor accepts {plan}.")
+        if specific and any(carriers & BCBS_FAMILY for carriers in doctor.values()):
+            # Different BCBS licensees; coverage depends on the plan's network rules.
+            return None
+    elif patient & BCBS_FAMILY and any(carriers & BCBS_FAMILY for carriers in doctor.values()):
+        return None
+
+    if undecided or any(not carriers for carriers in doctor.values()):
+        # The doctor lists a plan we do not recognize, so we cannot rule a match out.
+        return None
+
+    return (False, f"{patient_plan} does not match any plan the doctor accepts: {', '.join(doctor_plans)}.")
+
+
+def match_insurance(patient_plan: str, doctor_plans: Any) -> Optional[Dict[str, Any]]:
+    """
+    Decide locally whether a doctor accepts the patient's insurance.
+
+    Applies the same rules as insurance_agent's instruction: plan name variations and known
+    aliases (e.g. "UNH" for UnitedHealthcare, "BCBS" for Blue Cross Blue Shield affiliates such as
+    Highmark or Anthem) match, while unrelated plans such as "Blue Cross" and "Blue Shield of
+    California" do not. Results are memoized per (plan, doctor plan set).
+
+    Args:
+        patient_plan: The patient's insurance plan.
+        doctor_plans: The doctor's `insurance_plans` or `insurance_data`.
+
+    Returns:
+        dict: {"acceptsInsurance": bool, "reason": str} when the answer is clear.
+        None: When the case is ambiguous and should be sent to insurance_agent, or when the doctor's
+        plans are missing.
+    """
+    plans = tuple(sorted(plan_names(doctor_plans)))
+    result = _match(patient_plan.strip(), plans)
+    if result is None:
+        return None
+    return _verdict(*result)
+
+
+def check_insurance(patient_plan: str, doctor_plans: List[str]) -> Dict[str, Any]:
+    """
+    Check whether a doctor accepts the patient's insurance plan.
+
+    Args:
+        patient_plan (str): The patient's insurance plan, e.g. "UNH" or "Blue Cross".
+        doctor_plans (list[str]): The insurance plans the doctor accepts.
+
+    Returns:
+        dict: {"acceptsInsurance": true or false, "reason": "explanation text"}. When the plans
+        cannot be matched with certainty, "acceptsInsurance" is null and the question should be
+        passed to insurance_agent.
+    """
+    verdict = match_insurance(patient_plan, doctor_plans)
+    if verdict is None and not plan_names(doctor_plans):
+        return _verdict(None, NO_PLANS_REASON)
+    if verdict is None:
+        return _verdict(None, "Ambiguous plan names; ask insurance_agent to decide.")
+    return verdict
@@ -1,14 +1,16 @@
-import json
 import os
 import asyncio
-import googlemaps
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional, Union
 from dotenv import load_dotenv
 
 # Import Google ADK components
 from google.adk.agents import Agent
 from google.adk.models.lite_llm import LiteLlm
 from pathlib import Path
+
+from .directory import get_directory
+from .ranking import DEFAULT_RADIUS_MILES, DEFAULT_RESULTS, DEFAULT_SHORTLIST_K, rank_doctors
 # Load environment variables
 load_dotenv()
 
@@ -18,64 +20,91 @@ current_dir = Path(__file__).parent
 env_path = current_dir / '.env'
 load_dotenv(env_path)
 
-# Debug: Check if API key is loaded
-api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_MAPS_API_KEY not found in environment variables")
+# Keep-alive connections shared by the geocoding and Distance Matrix calls of every session.
+MAPS_POOL_SIZE = 16
+
+# Created by get_client() on first use, so importing the agent needs neither the key nor googlemaps.
+gmaps = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the shared `googlemaps.Client`, creating it on first use.
+
+    Raises:
+        ValueError: If GOOGLE_MAPS_API_KEY is not set.
+    """
+    global gmaps
+    with _client_lock:
+        if gmaps is None:
+            api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_MAPS_API_KEY not found in environment variables")
+            import googlemaps
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=MAPS_POOL_SIZE))
+            gmaps = googlemaps.Client(key=api_key, requests_session=session)
+        return gmaps
 
-gmaps = googlemaps.Client(key=api_key)
 
 # --- Tool function for ADK ---
-def rerank_doctors_by_distance(patient_address: str) -> str:
+async def rerank_doctors_by_distance(patient_address: str, k: int = DEFAULT_RESULTS,
+                                     specialty: Optional[str] = None, insurance: Optional[str] = None,
+                                     min_rating: Optional[float] = None,
+                                     shortlist: int = DEFAULT_SHORTLIST_K,
+                                     radius: float = DEFAULT_RADIUS_MILES) -> Union[List[Dict[str, Any]], str]:
     """
-    Rerank doctors by driving distance to the patient's address.
+    Rank doctors accepting new patients for the patient's address.
+
+    Doctors are ranked by a weighted score of driving distance, rating, number of reviews and
+    years of experience. Doctors with another specialty, a plan that does not match the patient's
+    insurance or a rating below `min_rating` are dropped first. Only the `shortlist` remaining
+    doctors closest in a straight line, within `radius` miles, are sent to the Distance Matrix API.
 
     Args:
         patient_address: The user's full address or general location.
+        k: Number of doctors to return.
+        specialty: Only return doctors with this specialty.
+        insurance: The patient's insurance plan.
+        min_rating: Minimum Healthgrades rating, from 1 to 5.
+        shortlist: Maximum number of nearby doctors to compute driving distances for.
+        radius: Straight-line search radius in miles.
 
     Returns:
-        str: Formatted string with top 3 doctors ranked by distance.
+        list[dict]: Up to `k` doctors, best first, each with name, url, specialty, address,
+            distance_miles, rating, qty_reviews, experience_years, accepting_new_patients,
+            accepts_insurance (None when it could not be decided) and rank_score.
+        str: An error message if the doctors could not be loaded or none matched.
     """
+    # googlemaps is a blocking client; its calls run in a worker thread so other sessions keep going.
+    return await asyncio.to_thread(
+        rank_doctors_by_distance, patient_address, k, specialty, insurance, min_rating, shortlist, radius
+    )
+
+
+def rank_doctors_by_distance(patient_address: str, k: int = DEFAULT_RESULTS, specialty: Optional[str] = None,
+                             insurance: Optional[str] = None, min_rating: Optional[float] = None,
+                             shortlist: int = DEFAULT_SHORTLIST_K,
+                             radius: float = DEFAULT_RADIUS_MILES) -> Union[List[Dict[str, Any]], str]:
+    """Blocking implementation of `rerank_doctors_by_distance`."""
+    try:
+        client = get_client()
+    except ValueError as e:
+        return f"Maps client unavailable: {e}"
     try:
-        # current_dir = os.path.dirname(os.path.abspath(__file__))
-        # json_path = os.path.join(current_dir, "doctor_data.json")
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # Go up to CareNavigator directory, then into assets
-        assets_path = os.path.join(os.path.dirname(current_dir), "assets", "doctor_data_test100.json")
-
-        with open(assets_path, "r") as f:
-            doctors = json.load(f)
+        directory = get_directory()
     except Exception as e:
         return f"Error loading doctors: {e}"
 
-    ranked = []
-    for doc in doctors:
-        try:
-            result = gmaps.distance_matrix(
-                origins=[patient_address],
-                destinations=[doc["address"]],
-                mode="driving",
-                units="imperial"
-            )
-            miles_text = result["rows"][0]["elements"][0]["distance"]["text"]
-            miles = float(miles_text.replace("mi", "").replace(",", "").strip())
-            doc["distance"] = miles
-            ranked.append(doc)
-        except Exception as e:
-            print(f"Error calculating distance for {doc.get('name', 'Unknown')}: {e}")
-            continue
-
-    # Get top 3 closest doctors
-    top_doctors = sorted(ranked, key=lambda d: d["distance"])[:3]
-
-    if not top_doctors:
+    ranked = rank_doctors(client, directory, patient_address, k=k, specialty=specialty, insurance=insurance,
+                          min_rating=min_rating, shortlist=shortlist, radius=radius)
+    if not ranked:
         return "No doctors found within reasonable distance."
-
-    return "\n".join(
-        f"{doc['name']} – {doc['distance']} mi – "
-        f"{doc.get('experience', '?')} yrs – rated {doc.get('score', '?')}"
-        for doc in top_doctors
-    )
+    return [doctor.to_dict() for doctor in ranked]
 
 
 # --- Tool schema for OpenAI function calling (ADK compatible) ---
@@ -83,13 +112,37 @@ distance_tool = {
     "type": "function",
     "function": {
         "name": "rerank_doctors_by_distance",
-        "description": "Rerank doctors by driving distance to the patient's address. The list of doctors are given",
+        "description": "Rank doctors for the patient's address by distance, rating, reviews and experience.",
         "parameters": {
             "type": "object",
             "properties": {
                 "patient_address": {
                     "type": "string",
                     "description": "The user's full address or general location."
+                },
+                "k": {
+                    "type": "integer",
+                    "description": "Number of doctors to return."
+                },
+                "specialty": {
+                    "type": "string",
+                    "description": "Only return doctors with this specialty."
+                },
+                "insurance": {
+                    "type": "string",
+                    "description": "The patient's insurance plan."
+                },
+                "min_rating": {
+                    "type": "number",
+                    "description": "Minimum Healthgrades rating, from 1 to 5."
+                },
+                "shortlist": {
+                    "type": "integer",
+                    "description": "Maximum number of nearby doctors to compute driving distances for."
+                },
+                "radius": {
+                    "type": "number",
+                    "description": "Straight-line search radius in miles."
                 }
             },
             "required": ["patient_address"]
@@ -103,11 +156,12 @@ maps_agent = Agent(
     model=LiteLlm(model="gpt-4o"),  # Use OpenAI GPT-4o via LiteLLM
     instruction="""You are a helpful medical assistant that finds doctors near patients. 
     When a user provides their location, use the rerank_doctors_by_distance tool to find the 
-    closest doctors. 
+    best doctors nearby. Pass their insurance plan and the specialty they need when you know them.
 
     Always be helpful and provide clear, formatted information about the doctors including:
     - Doctor name
     - Distance from patient
+    - Rating, number of reviews and years of experience
     """,
     description="An agent that helps patients find nearby doctors ranked by distance.",
     tools=[rerank_doctors_by_distance]
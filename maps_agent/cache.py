@@ -0,0 +1,127 @@
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from common.cache import DiskCache, get_cache
+from common.telemetry import span
+from .distance import driving_distances
+from .geo import LatLon, geocode_address
+
+# Patient origins are snapped to a grid of this many degrees (0.01 is about 0.7 miles north-south),
+# so patients in the same neighbourhood share cached distances.
+GRID_DEGREES = float(os.getenv("CARENAV_DISTANCE_GRID_DEGREES", "0.01"))
+
+# Addresses almost never move; routes change with road works, so distances expire sooner.
+GEOCODE_TTL = 30 * 24 * 60 * 60
+DISTANCE_TTL = 7 * 24 * 60 * 60
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def geocode_cache() -> DiskCache:
+    return get_cache("geocodes", ttl=GEOCODE_TTL, max_bytes=MAX_BYTES, compress=False)
+
+
+def distance_cache() -> DiskCache:
+    return get_cache("distances", ttl=DISTANCE_TTL, max_bytes=MAX_BYTES, compress=False)
+
+
+def normalize_address(address: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", address.lower()).split())
+
+
+def origin_cell(latlon: LatLon, grid: float = GRID_DEGREES) -> str:
+    """The grid cell a patient location falls in, used as the origin part of distance keys."""
+    lat, lon = latlon
+    return f"{round(lat / grid) * grid:.5f},{round(lon / grid) * grid:.5f}"
+
+
+def cached_geocode(client, address: str) -> Optional[LatLon]:
+    """Geocode `address`, reusing stored coordinates for up to GEOCODE_TTL seconds."""
+    key = normalize_address(address)
+    with span("maps.geocode") as lookup:
+        latlon = geocode_cache().get(key)
+        lookup.set(cache="miss" if latlon is None else "hit")
+        if latlon is not None:
+            return tuple(latlon)
+        latlon = geocode_address(client, address)
+        if latlon is not None:
+            geocode_cache().set(key, list(latlon))
+        return latlon
+
+
+def locate_doctors(client, doctors: Iterable[Dict[str, Any]]) -> int:
+    """
+    Add "latitude" and "longitude" to the doctor dictionaries that do not have them yet,
+    through `cached_geocode`, so addresses shared with other doctors or looked up before are not
+    sent to the API again. Run when a directory is built (search_agent.ingest, maps_agent.store),
+    so requests only read the stored coordinates.
+
+    Returns:
+        int: Number of doctors that still have no coordinates (address not found or geocoding failed).
+    """
+    pending = [doc for doc in doctors if doc.get("latitude") is None or doc.get("longitude") is None]
+    for doc in pending:
+        latlon = cached_geocode(client, doc.get("address", ""))
+        if latlon is not None:
+            doc["latitude"], doc["longitude"] = latlon
+    return sum(1 for doc in pending if doc.get("latitude") is None)
+
+
+def cached_distances(client, origin: str, destinations: Sequence[str],
+                     origin_latlon: Optional[LatLon] = None) -> List[Optional[float]]:
+    """
+    Driving distances in miles from `origin` to each destination, through the shared cache.
+
+    Distances are keyed on the origin's grid cell and the normalized destination address, so a
+    patient down the street reuses the distances computed for an earlier one. Only the pairs not
+    cached yet are sent to the Distance Matrix API, in batches. If the origin cannot be geocoded
+    the distances are computed without caching.
+
+    Args:
+        client: A `googlemaps.Client`.
+        origin: The patient's address.
+        destinations: Doctor addresses.
+        origin_latlon: The patient's coordinates, if the caller already geocoded them.
+
+    Returns:
+        list[float | None]: One entry per destination, in the same order; None where no route was found.
+    """
+    with span("maps.distances", destinations=len(destinations)) as lookup:
+        if origin_latlon is None:
+            origin_latlon = cached_geocode(client, origin)
+        if origin_latlon is None:
+            lookup.set(cache_misses=len(destinations))
+            return driving_distances(client, origin, list(destinations))
+
+        cache = distance_cache()
+        cell = origin_cell(origin_latlon)
+        keys = [f"{cell}|{normalize_address(address)}" for address in destinations]
+        distances: List[Optional[float]] = [cache.get(key) for key in keys]
+
+        # Each missing destination is looked up once, even if several doctors share an address.
+        missing = {}
+        for i, miles in enumerate(distances):
+            if miles is None:
+                missing.setdefault(keys[i], destinations[i])
+        lookup.set(cache_hits=len(keys) - sum(miles is None for miles in distances), cache_misses=len(missing))
+        if missing:
+            fresh = dict(zip(missing, driving_distances(client, origin, list(missing.values()))))
+            for key, miles in fresh.items():
+                if miles is not None:
+                    cache.set(key, miles)
+            distances = [fresh.get(key) if miles is None else miles for key, miles in zip(keys, distances)]
+        return distances
+
+
+def rank_by_distance(client, origin: str, destinations: Sequence[str], limit: Optional[int] = None,
+                     origin_latlon: Optional[LatLon] = None) -> List[Tuple[int, float]]:
+    """
+    Positions of `destinations` with their driving distance from `origin`, closest first.
+
+    Destinations without a route are left out. At most `limit` entries are returned.
+    """
+    distances = cached_distances(client, origin, destinations, origin_latlon)
+    ranked = sorted(
+        ((i, miles) for i, miles in enumerate(distances) if miles is not None), key=lambda item: item[1]
+    )
+    return ranked[:limit] if limit is not None else ranked
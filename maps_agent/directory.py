@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+# A JSON list of doctors, a JSON-lines store built by `python -m search_agent.ingest`, or a
+# columnar store built by `python -m maps_agent.store`.
+DEFAULT_DIRECTORY_PATH = os.getenv("CARENAV_DIRECTORY_PATH", os.path.join(ASSETS_DIR, "doctor_data_test100.json"))
+
+
+class DoctorRecord(NamedTuple):
+    """
+    One immutable doctor entry. A NamedTuple has no per-instance __dict__, so records stay compact.
+    """
+    name: str
+    url: str
+    specialty: str
+    experience: str
+    bio: str
+    address: str
+    conditions: Tuple[str, ...]
+    procedures: Tuple[str, ...]
+    score: str
+    qty_reviews: str
+    accepting_new_patients: bool
+    insurance_plans: Tuple[str, ...]
+    # The specialty searched for when the record was ingested, which may be broader than `specialty`.
+    specialty_query: str = ""
+    # Office coordinates, geocoded when the record was ingested (see maps_agent.cache.locate_doctors).
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, doc: dict) -> "DoctorRecord":
+        return cls(
+            name=doc["name"],
+            url=doc.get("url", ""),
+            specialty=doc.get("specialty", ""),
+            experience=str(doc.get("experience", "not listed")),
+            bio=doc.get("bio", ""),
+            address=doc["address"],
+            conditions=tuple(doc.get("conditions") or ()),
+            procedures=tuple(doc.get("procedures") or ()),
+            score=str(doc.get("score", "")),
+            qty_reviews=str(doc.get("qty_reviews", "")),
+            accepting_new_patients=bool(doc.get("accepting_new_patients", False)),
+            insurance_plans=tuple(doc.get("insurance_plans") or ()),
+            specialty_query=doc.get("specialty_query", ""),
+            latitude=doc.get("latitude"),
+            longitude=doc.get("longitude"),
+        )
+
+    def to_dict(self) -> dict:
+        doc = self._asdict()
+        for field in ("conditions", "procedures", "insurance_plans"):
+            doc[field] = list(doc[field])
+        return doc
+
+
+def _key(value: str) -> str:
+    return " ".join(value.split()).casefold()
+
+
+def _build_index(records: List[DoctorRecord], values) -> Dict[str, FrozenSet[int]]:
+    index: Dict[str, set] = {}
+    for i, record in enumerate(records):
+        for value in values(record):
+            index.setdefault(_key(value), set()).add(i)
+    return {key: frozenset(ids) for key, ids in index.items()}
+
+
+class DoctorDirectory:
+    """
+    Read-only, in-memory doctor directory with secondary indexes.
+
+    Every index maps a normalized value (case and whitespace insensitive) to the set of record
+    positions having it, so a query such as "Oncology, Aetna, accepting" is a set intersection.
+    """
+
+    def __init__(self, records: Iterable[DoctorRecord], path: Optional[str] = None,
+                 mtime: Optional[float] = None):
+        self.records: Tuple[DoctorRecord, ...] = tuple(records)
+        self.path = path
+        self.mtime = mtime
+        records = list(self.records)
+        self.by_specialty = _build_index(records, lambda r: {r.specialty, r.specialty_query} - {""})
+        self.by_condition = _build_index(records, lambda r: r.conditions)
+        self.by_procedure = _build_index(records, lambda r: r.procedures)
+        self.by_insurance = _build_index(records, lambda r: r.insurance_plans)
+        self.accepting = frozenset(i for i, r in enumerate(records) if r.accepting_new_patients)
+        self.not_accepting = frozenset(range(len(records))) - self.accepting
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_DIRECTORY_PATH) -> "DoctorDirectory":
+        mtime = os.path.getmtime(path)
+        with open(path, "r") as f:
+            if path.endswith(".jsonl"):
+                doctors = [json.loads(line) for line in f if line.strip()]
+            else:
+                doctors = json.load(f)
+        return cls((DoctorRecord.from_dict(doc) for doc in doctors), path=path, mtime=mtime)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def addresses(self) -> List[str]:
+        return [record.address for record in self.records]
+
+    def value(self, field: str, i: int):
+        """One field of the record at position i (see `ColumnarDirectory.value`)."""
+        return getattr(self.records[i], field)
+
+    def coordinates(self) -> List[Optional[Tuple[float, float]]]:
+        """Each record's (latitude, longitude), or None if it was never geocoded."""
+        return [
+            None if record.latitude is None or record.longitude is None else (record.latitude, record.longitude)
+            for record in self.records
+        ]
+
+    def select(self, specialty: Optional[str] = None, condition: Optional[str] = None,
+               procedure: Optional[str] = None, insurance: Optional[str] = None,
+               accepting_new_patients: Optional[bool] = None) -> FrozenSet[int]:
+        """
+        Return the positions of the records matching every given criterion.
+
+        Criteria left as None are not applied. String criteria must match exactly, ignoring case
+        and repeated whitespace.
+        """
+        selected = None
+        for index, value in (
+            (self.by_specialty, specialty),
+            (self.by_condition, condition),
+            (self.by_procedure, procedure),
+            (self.by_insurance, insurance),
+        ):
+            if value is None:
+                continue
+            ids = index.get(_key(value), frozenset())
+            selected = ids if selected is None else selected & ids
+        if accepting_new_patients is not None:
+            ids = self.accepting if accepting_new_patients else self.not_accepting
+            selected = ids if selected is None else selected & ids
+        if selected is None:
+            return frozenset(range(len(self.records)))
+        return selected
+
+    def query(self, **criteria) -> List[DoctorRecord]:
+        """
+        Return the records matching `criteria` (see `select`), in directory order.
+        """
+        return [self.records[i] for i in sorted(self.select(**criteria))]
+
+
+def directory_mtime(path: str) -> float:
+    """Modification time of a directory file, or of a columnar store's metadata (see maps_agent.store)."""
+    meta_path = os.path.join(path, "meta.json")
+    return os.path.getmtime(meta_path if os.path.isdir(path) else path)
+
+
+def load_directory(path: str = DEFAULT_DIRECTORY_PATH):
+    """
+    Load a directory from a JSON list, a JSON-lines file or a columnar store directory.
+    """
+    if os.path.isdir(path):
+        from .store import ColumnarDirectory
+        return ColumnarDirectory(path)
+    return DoctorDirectory.from_file(path)
+
+
+_directories: Dict[str, DoctorDirectory] = {}
+_directories_lock = threading.Lock()
+
+
+def get_directory(path: str = DEFAULT_DIRECTORY_PATH) -> DoctorDirectory:
+    """
+    Return the shared directory loaded from `path`.
+
+    The file is loaded on the first call and again only when its modification time changes,
+    so tool calls get the same immutable object without re-reading the JSON.
+    """
+    mtime = directory_mtime(path)
+    with _directories_lock:
+        directory = _directories.get(path)
+        if directory is None or directory.mtime != mtime:
+            directory = load_directory(path)
+            _directories[path] = directory
+        return directory
@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from common.telemetry import current_span, span
+
+# The Distance Matrix API allows at most 25 destinations (and 100 elements) per request.
+MAX_DESTINATIONS_PER_REQUEST = 25
+MAX_CONCURRENT_REQUESTS = 4
+
+METERS_PER_MILE = 1609.344
+
+
+def element_miles(element: Dict[str, Any]) -> Optional[float]:
+    """
+    Convert one Distance Matrix element to miles, or None if the route was not found.
+    """
+    if element.get("status", "OK") != "OK" or "distance" not in element:
+        return None
+    return round(element["distance"]["value"] / METERS_PER_MILE, 1)
+
+
+def driving_distances(
+    client,
+    origin: str,
+    destinations: List[str],
+    mode: str = "driving",
+    chunk_size: int = MAX_DESTINATIONS_PER_REQUEST,
+    max_workers: int = MAX_CONCURRENT_REQUESTS,
+) -> List[Optional[float]]:
+    """
+    Compute distances in miles from one origin to many destinations.
+
+    Destinations are split into chunks of `chunk_size`, and the chunks are sent to the
+    Distance Matrix API concurrently, so 100 doctors cost 4 requests instead of 100.
+
+    Args:
+        client: A `googlemaps.Client`, or any object with a compatible `distance_matrix` method.
+        origin: The patient's address.
+        destinations: Doctor addresses.
+        mode: Travel mode passed to the API.
+        chunk_size: Destinations per request, at most the API's per-request limit.
+        max_workers: Number of requests in flight at the same time.
+
+    Returns:
+        list[float | None]: One entry per destination, in the same order. Destinations whose element
+        failed, or whose whole request failed, are None.
+    """
+    chunks = [
+        (start, destinations[start:start + chunk_size])
+        for start in range(0, len(destinations), chunk_size)
+    ]
+    distances: List[Optional[float]] = [None] * len(destinations)
+    # Pool threads do not inherit the caller's context, so the parent span is passed explicitly.
+    parent = current_span()
+
+    def run(chunk):
+        start, batch = chunk
+        with span("googlemaps.distance_matrix", parent, elements=len(batch)) as request:
+            try:
+                result = client.distance_matrix(
+                    origins=[origin],
+                    destinations=batch,
+                    mode=mode,
+                    units="imperial"
+                )
+                elements = result["rows"][0]["elements"]
+            except Exception as e:
+                # Recorded as a failed span (and counted in carenav_spans_total); the batch stays None.
+                request.set(first_destination=start)
+                request.fail(e)
+                return
+        for offset, element in enumerate(elements[:len(batch)]):
+            distances[start + offset] = element_miles(element)
+
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            list(pool.map(run, chunks))
+    return distances
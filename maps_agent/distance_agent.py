@@ -1,12 +1,32 @@
 import json
 import os
-import openai
-import googlemaps
+from functools import lru_cache
+
 from dotenv import load_dotenv
 
+from common.telemetry import span
+from .agent import get_client
+from .cache import rank_by_distance
+
 load_dotenv()
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-gmaps = googlemaps.Client(key=os.getenv("GOOGLE_MAPS_API_KEY"))
+
+
+@lru_cache(maxsize=1)
+def openai_client():
+    """The OpenAI client, created on first use like the Maps client (see `get_client`)."""
+    import openai
+
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def chat(**request):
+    """One chat completion, timed as an LLM span with its token counts."""
+    with span("llm.distance_agent", model=request.get("model")) as call:
+        response = openai_client().chat.completions.create(**request)
+        if response.usage is not None:
+            call.set(prompt_tokens=response.usage.prompt_tokens, completion_tokens=response.usage.completion_tokens)
+        return response
+
 
 # --- Tool function ---
 def rerank_doctors_by_distance(patient_address: str) -> str:
@@ -16,24 +36,9 @@ def rerank_doctors_by_distance(patient_address: str) -> str:
     except Exception as e:
         return f"Error loading doctors: {e}"
 
-    ranked = []
-    for doc in doctors:
-        try:
-            result = gmaps.distance_matrix(
-                origins=[patient_address],
-                destinations=[doc["address"]],
-                mode="driving",
-                units="imperial"
-            )
-            miles_text = result["rows"][0]["elements"][0]["distance"]["text"]
-            miles = float(miles_text.replace("mi", "").replace(",", "").strip())
-            doc["distance"] = miles
-            ranked.append(doc)
-        except Exception as e:
-            continue
-
-    # Get top 3
-    top_doctors = sorted(ranked, key=lambda d: d["distance"])[:3]
+    # Same shared geocode/distance cache and batched lookups as maps_agent.
+    ranked = rank_by_distance(get_client(), patient_address, [doc["address"] for doc in doctors], limit=3)
+    top_doctors = [dict(doctors[i], distance=miles) for i, miles in ranked]
 
     return "\n".join(
         f"{doc['name']} – {doc['distance']} mi – "
@@ -74,7 +79,7 @@ def run_agent(user_message: str):
         }
     ]
 
-    response = openai_client.chat.completions.create(
+    response = chat(
         model="gpt-4o",
         messages=messages,
         tools=[distance_tool],
@@ -85,7 +90,8 @@ def run_agent(user_message: str):
     args = json.loads(tool_call.function.arguments)
     address = args["patient_address"]
 
-    tool_result = rerank_doctors_by_distance(address)
+    with span("tool.rerank_doctors_by_distance"):
+        tool_result = rerank_doctors_by_distance(address)
 
     # Let GPT summarize the tool output (optional):
     messages.append({
@@ -99,7 +105,7 @@ def run_agent(user_message: str):
         "content": tool_result
     })
 
-    final_response = openai_client.chat.completions.create(
+    final_response = chat(
         model="gpt-4o",
         messages=messages
     )
@@ -0,0 +1,140 @@
+import heapq
+import json
+import math
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from common.telemetry import span
+
+EARTH_RADIUS_MILES = 3958.8
+
+LatLon = Tuple[float, float]
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in miles between two points given in degrees."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _to_xyz(lat: float, lon: float) -> Tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def _miles_to_chord(miles: float) -> float:
+    # Straight-line distance through the unit sphere grows monotonically with great-circle distance.
+    return 2 * math.sin(min(math.pi, miles / EARTH_RADIUS_MILES) / 2)
+
+
+class GeoIndex:
+    """
+    Static k-d tree over points on the earth's surface.
+
+    Points are stored as 3D unit vectors so that Euclidean (chord) distance orders them exactly
+    like great-circle distance, with no special cases at the poles or the antimeridian. The tree
+    is implicit: after building, the node for a range [lo, hi) is its middle element.
+    """
+
+    def __init__(self, points: Sequence[LatLon]):
+        self._latlon = list(points)
+        nodes = [(_to_xyz(lat, lon), i) for i, (lat, lon) in enumerate(self._latlon)]
+        self._build(nodes, 0, len(nodes), 0)
+        self._xyz = [xyz for xyz, _ in nodes]
+        self._ids = [i for _, i in nodes]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _build(nodes, lo: int, hi: int, axis: int) -> None:
+        # Iterative to stay clear of the recursion limit on large directories.
+        stack = [(lo, hi, axis)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if hi - lo <= 1:
+                continue
+            nodes[lo:hi] = sorted(nodes[lo:hi], key=lambda node: node[0][axis])
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, (axis + 1) % 3))
+            stack.append((mid + 1, hi, (axis + 1) % 3))
+
+    def nearest(self, lat: float, lon: float, k: int = 25,
+                radius: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Find the `k` points closest to (lat, lon), optionally limited to `radius` miles.
+
+        Returns:
+            list[tuple[int, float]]: (point index, great-circle miles) pairs, closest first.
+        """
+        if k <= 0 or not self._ids:
+            return []
+        target = _to_xyz(lat, lon)
+        bound = _miles_to_chord(radius) ** 2 if radius is not None else float("inf")
+        heap: List[Tuple[float, int]] = []  # max-heap of (-squared chord, index)
+
+        # Each entry carries a lower bound on the squared distance to anything in its range.
+        stack = [(0, len(self._ids), 0, 0.0)]
+        while stack:
+            lo, hi, axis, floor = stack.pop()
+            limit = -heap[0][0] if len(heap) == k else bound
+            if lo >= hi or floor > limit:
+                continue
+            mid = (lo + hi) // 2
+            point = self._xyz[mid]
+            d2 = sum((p - t) ** 2 for p, t in zip(point, target))
+            if d2 <= limit:
+                if len(heap) == k:
+                    heapq.heapreplace(heap, (-d2, self._ids[mid]))
+                else:
+                    heapq.heappush(heap, (-d2, self._ids[mid]))
+            diff = target[axis] - point[axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            # Push the far side first so the near side is explored first.
+            stack.append((far[0], far[1], (axis + 1) % 3, diff * diff))
+            stack.append((near[0], near[1], (axis + 1) % 3, floor))
+
+        results = []
+        for _, idx in heap:
+            p_lat, p_lon = self._latlon[idx]
+            results.append((idx, haversine_miles(lat, lon, p_lat, p_lon)))
+        return sorted(results, key=lambda item: item[1])
+
+
+def geocode_address(client, address: str) -> Optional[LatLon]:
+    """Geocode one address with the Google Maps client, or return None if it cannot be found."""
+    with span("googlemaps.geocode") as request:
+        try:
+            results = client.geocode(address)
+        except Exception as e:
+            request.fail(e)
+            return None
+    if not results:
+        return None
+    location = results[0]["geometry"]["location"]
+    return (location["lat"], location["lng"])
+
+
+if __name__ == "__main__":
+    # Add coordinates to the doctors of a JSON list or JSON-lines directory file, in place:
+    #   python -m maps_agent.geo assets/doctor_data_test100.json
+    import sys
+
+    from .agent import get_client
+    from .cache import locate_doctors
+
+    path = sys.argv[1]
+    with open(path, "r") as f:
+        doctors = [json.loads(line) for line in f if line.strip()] if path.endswith(".jsonl") else json.load(f)
+    missing = locate_doctors(get_client(), doctors)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        if path.endswith(".jsonl"):
+            f.writelines(json.dumps(doc) + "\n" for doc in doctors)
+        else:
+            json.dump(doctors, f, indent=4)
+    os.replace(tmp_path, path)
+    print(f"{len(doctors) - missing} of {len(doctors)} doctors located in {path}")
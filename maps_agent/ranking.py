@@ -0,0 +1,288 @@
+import contextvars
+import heapq
+import math
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from common.telemetry import span
+from insurance_agent.matcher import match_insurance
+from .cache import cached_distances, cached_geocode
+from .directory import DoctorDirectory, DoctorRecord
+from .distance import MAX_CONCURRENT_REQUESTS
+from .geo import GeoIndex, haversine_miles
+
+# Nearest-neighbour shortlist size and search radius used before paying for driving distances.
+DEFAULT_SHORTLIST_K = 25
+DEFAULT_RADIUS_MILES = 100.0
+DEFAULT_RESULTS = 3
+
+# Distance at which the distance component drops to one half.
+DISTANCE_HALF_SCORE_MILES = 10.0
+# Ratings are shrunk towards PRIOR_RATING as if it came from PRIOR_REVIEWS extra reviews, so a
+# 5.0 from one review does not outrank a 4.8 from a hundred.
+PRIOR_RATING = 4.0
+PRIOR_REVIEWS = 5
+# Review counts and years of experience beyond these add nothing.
+REVIEWS_SATURATION = 100
+EXPERIENCE_SATURATION_YEARS = 30
+
+
+@dataclass(frozen=True)
+class RankingWeights:
+    """
+    Relative weight of each component of a doctor's score. Components are scaled to 0-1, and
+    the weights are normalized by their sum, so only their ratios matter.
+    """
+    distance: float = 0.4
+    rating: float = 0.3
+    reviews: float = 0.1
+    experience: float = 0.2
+
+    @classmethod
+    def from_string(cls, spec: str) -> "RankingWeights":
+        """Parse "distance=0.5,rating=0.5"; components left out keep their default weight."""
+        names = {f.name for f in fields(cls)}
+        values = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            name, _, value = item.partition("=")
+            if name.strip() not in names:
+                raise ValueError(f"Unknown ranking weight {name!r}; expected one of {sorted(names)}")
+            values[name.strip()] = float(value)
+        return cls(**values)
+
+
+DEFAULT_WEIGHTS = RankingWeights.from_string(os.getenv("CARENAV_RANKING_WEIGHTS", ""))
+
+
+@dataclass
+class RankedDoctor:
+    """One ranking result. `to_dict` gives the dictionary returned by the maps tools."""
+    name: str
+    url: str
+    specialty: str
+    address: str
+    distance_miles: Optional[float]
+    rating: Optional[float]
+    qty_reviews: int
+    experience_years: Optional[int]
+    accepting_new_patients: bool
+    accepts_insurance: Optional[bool]
+    rank_score: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _number(text: str) -> Optional[float]:
+    match = re.search(r"\d+(?:\.\d+)?", text or "")
+    return float(match.group()) if match else None
+
+
+def _years(text: str) -> Optional[int]:
+    years = _number(text)
+    return int(years) if years is not None else None
+
+
+def rating(record: DoctorRecord) -> Optional[float]:
+    return _number(record.score)
+
+
+def review_count(record: DoctorRecord) -> int:
+    return int(_number(record.qty_reviews.replace(",", "")) or 0)
+
+
+def experience_years(record: DoctorRecord) -> Optional[int]:
+    return _years(record.experience)
+
+
+def score_doctor(record: DoctorRecord, miles: Optional[float], weights: RankingWeights = DEFAULT_WEIGHTS) -> float:
+    """
+    Weighted score of a doctor between 0 and 1; higher is better.
+
+    Missing values score zero for their component (an unknown distance, no rating, experience
+    "not listed"), except that an unrated doctor still gets the prior rating.
+    """
+    reviews = review_count(record)
+    stars = rating(record)
+    shrunk = ((stars or 0.0) * reviews + PRIOR_RATING * PRIOR_REVIEWS) / (reviews + PRIOR_REVIEWS) if stars else PRIOR_RATING
+    years = experience_years(record) or 0
+    components = (
+        (weights.distance, 0.0 if miles is None else 1.0 / (1.0 + miles / DISTANCE_HALF_SCORE_MILES)),
+        (weights.rating, shrunk / 5.0),
+        (weights.reviews, min(1.0, math.log1p(reviews) / math.log1p(REVIEWS_SATURATION))),
+        (weights.experience, min(years, EXPERIENCE_SATURATION_YEARS) / EXPERIENCE_SATURATION_YEARS),
+    )
+    total = sum(weight for weight, _ in components)
+    return sum(weight * value for weight, value in components) / total if total else 0.0
+
+
+def top_k(records: Sequence[DoctorRecord], distances: Sequence[Optional[float]], k: int,
+          weights: RankingWeights = DEFAULT_WEIGHTS) -> List[Tuple[float, int]]:
+    """
+    (score, position) of the `k` best records, best first, without sorting all of them.
+    """
+    return heapq.nlargest(
+        k, ((score_doctor(record, miles, weights), i) for i, (record, miles) in enumerate(zip(records, distances)))
+    )
+
+
+# (directory path, mtime) -> (GeoIndex, record position for each indexed point, positions not located)
+_index_cache = {}
+# Concurrent first requests wait for one build instead of each building their own.
+_index_lock = threading.Lock()
+
+
+def doctor_index(directory: DoctorDirectory) -> Tuple[GeoIndex, List[int], List[int]]:
+    """
+    Build (once per version of the directory) a spatial index over the doctors' stored coordinates.
+
+    Coordinates are geocoded when the directory is built (see maps_agent.cache.locate_doctors);
+    records without them are returned separately, in directory order.
+    """
+    key = (directory.path, directory.mtime)
+    with _index_lock:
+        if key not in _index_cache:
+            coordinates = directory.coordinates()
+            positions = [i for i, latlon in enumerate(coordinates) if latlon is not None]
+            unlocated = [i for i, latlon in enumerate(coordinates) if latlon is None]
+            index = GeoIndex([coordinates[i] for i in positions])
+            _index_cache.clear()
+            _index_cache[key] = (index, positions, unlocated)
+        return _index_cache[key]
+
+
+def _nearest_candidates(index: GeoIndex, positions: List[int], candidates: Set[int], latlon, shortlist: int,
+                        radius: float) -> List[Tuple[int, float]]:
+    """
+    (position, miles) of the `shortlist` candidates closest in a straight line, widening the
+    search until enough are found.
+    """
+    k = shortlist
+    while True:
+        nearby = index.nearest(*latlon, k=k, radius=radius)
+        hits = [(positions[i], miles) for i, miles in nearby if positions[i] in candidates]
+        if len(hits) >= shortlist or len(nearby) < k:
+            return hits[:shortlist]
+        k *= 4
+
+
+def _geocode_addresses(client, addresses: Sequence[str]) -> List[Optional[Tuple[float, float]]]:
+    """Coordinates of each address through `cached_geocode`, a few requests at a time."""
+    if not addresses:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(addresses))) as pool:
+        # Each lookup runs in a copy of the caller's context, so its span joins the caller's trace.
+        futures = [
+            pool.submit(contextvars.copy_context().run, cached_geocode, client, address) for address in addresses
+        ]
+        return [future.result() for future in futures]
+
+
+def nearby_doctors(directory: DoctorDirectory, latlon, candidates: Iterable[int],
+                   shortlist: int = DEFAULT_SHORTLIST_K, radius: float = DEFAULT_RADIUS_MILES,
+                   client=None) -> List[int]:
+    """
+    Positions of the `shortlist` candidates closest to `latlon` in a straight line, within `radius` miles.
+
+    Candidates without stored coordinates are geocoded through `cached_geocode` when a `client` is
+    given (once per address; later requests read the shared cache) and placed with the others.
+    Those that still cannot be placed fill whatever room the located ones leave in the shortlist.
+    """
+    index, positions, unlocated = doctor_index(directory)
+    candidates = set(candidates)
+    nearest = _nearest_candidates(index, positions, candidates, latlon, shortlist, radius)
+    pending = [i for i in unlocated if i in candidates]
+    if pending and client is not None:
+        geocoded = _geocode_addresses(client, [directory.value("address", i) for i in pending])
+        placed = [(i, haversine_miles(*latlon, *point)) for i, point in zip(pending, geocoded) if point is not None]
+        nearest = heapq.nsmallest(
+            shortlist, nearest + [(i, miles) for i, miles in placed if miles <= radius], key=lambda hit: hit[1]
+        )
+        pending = [i for i, point in zip(pending, geocoded) if point is None]
+    shortlisted = [i for i, _ in nearest]
+    if len(shortlisted) < shortlist:
+        shortlisted += pending[:shortlist - len(shortlisted)]
+    return shortlisted
+
+
+def rank_doctors(client, directory: DoctorDirectory, patient_address: str, k: int = DEFAULT_RESULTS,
+                 weights: RankingWeights = DEFAULT_WEIGHTS, specialty: Optional[str] = None,
+                 insurance: Optional[str] = None, accepting_new_patients: Optional[bool] = True,
+                 min_rating: Optional[float] = None, min_experience: Optional[int] = None,
+                 shortlist: int = DEFAULT_SHORTLIST_K, radius: float = DEFAULT_RADIUS_MILES) -> List[RankedDoctor]:
+    """
+    Rank directory doctors for a patient by a weighted score of distance, rating, reviews and experience.
+
+    Hard filters run first and only touch the in-memory directory. The `shortlist` survivors
+    closest to the patient in a straight line, within `radius` miles, are the only ones whose
+    driving distance is looked up, and the best `k` of those are returned. Survivors without
+    stored coordinates are geocoded to place them (see `nearby_doctors`).
+
+    Args:
+        client: A `googlemaps.Client`.
+        directory: The doctor directory to rank.
+        patient_address: The patient's address or general location.
+        k: Number of doctors to return.
+        weights: Weight of each score component.
+        specialty: Only doctors with this specialty.
+        insurance: The patient's plan. Doctors the insurance matcher says do not take it are dropped;
+            doctors it cannot decide on are kept with `accepts_insurance` None.
+        accepting_new_patients: Only doctors accepting (True) or not accepting (False) new patients; None for both.
+        min_rating: Only doctors rated at least this.
+        min_experience: Only doctors with at least this many years of experience listed.
+        shortlist: Maximum number of doctors to compute driving distances for.
+        radius: Straight-line search radius in miles.
+
+    Returns:
+        list[RankedDoctor]: Up to `k` doctors, best first.
+    """
+    candidates = directory.select(specialty=specialty, accepting_new_patients=accepting_new_patients)
+    verdicts: Dict[int, Optional[dict]] = {}
+    kept = []
+    # The filters read single fields (from the columns of a columnar store); records are only
+    # built for the shortlist.
+    for i in candidates:
+        if min_rating is not None and (_number(directory.value("score", i)) or 0.0) < min_rating:
+            continue
+        if min_experience is not None and (_years(directory.value("experience", i)) or 0) < min_experience:
+            continue
+        if insurance:
+            verdicts[i] = match_insurance(insurance, list(directory.value("insurance_plans", i)))
+            if verdicts[i] is not None and not verdicts[i]["acceptsInsurance"]:
+                continue
+        kept.append(i)
+
+    with span("maps.shortlist", candidates=len(kept)) as shortlisting:
+        patient_latlon = cached_geocode(client, patient_address)
+        if patient_latlon is not None:
+            kept = nearby_doctors(directory, patient_latlon, kept, shortlist, radius, client)
+        else:
+            # Without the patient's location every matching doctor gets a driving distance.
+            shortlisting.fail("patient address not geocoded")
+            kept.sort()
+
+    records = [directory.records[i] for i in kept]
+    distances = cached_distances(client, patient_address, [record.address for record in records], patient_latlon)
+
+    results = []
+    for score, i in top_k(records, distances, k, weights):
+        record = records[i]
+        verdict = verdicts.get(kept[i])
+        results.append(RankedDoctor(
+            name=record.name,
+            url=record.url,
+            specialty=record.specialty,
+            address=record.address,
+            distance_miles=distances[i],
+            rating=rating(record),
+            qty_reviews=review_count(record),
+            experience_years=experience_years(record),
+            accepting_new_patients=record.accepting_new_patients,
+            accepts_insurance=verdict["acceptsInsurance"] if verdict else None,
+            rank_score=round(score, 3),
+        ))
+    return results
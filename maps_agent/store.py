@@ -0,0 +1,359 @@
+"""
+Compact columnar storage for the doctor directory.
+
+A store is a directory of flat files:
+
+    meta.json             record count, byte order and the interned string tables
+    <field>.col           one fixed-width value per record (typed `array` data), including
+                          each office's latitude and longitude
+    <field>.ids/.offsets  multi-valued fields: interned ids, with each record's slice in `.offsets`
+    <field>.postings/.posting_offsets
+                          inverted index: record positions for each interned value (and for
+                          accepting / not accepting new patients)
+    <field>.heap/.offsets UTF-8 text, with each record's slice in `.offsets`
+
+Specialties, scores, conditions, procedures and insurance names are stored once and referenced by
+integer id, numbers live in typed arrays, and the long `bio` text stays on disk and is memory-mapped,
+so a record's biography is only read when the record is materialized. Every file is written under a
+temporary name and moved into place, so re-importing never changes a file a running process has
+mapped.
+
+    python -m maps_agent.store assets/doctor_data_test100.json assets/doctor_directory.store [--geocode]
+
+imports a JSON list or JSON-lines directory into a store; with `--geocode`, doctors without
+coordinates are geocoded during the import.
+"""
+import argparse
+import array
+import json
+import math
+import mmap
+import os
+import sys
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .directory import DoctorRecord, _key, directory_mtime
+
+FORMAT_VERSION = 3
+META_FILE = "meta.json"
+
+# Interned single-valued and multi-valued string fields. The score is kept as Healthgrades wrote it.
+INTERNED_FIELDS = ("specialty", "specialty_query", "score")
+SPECIALTY_FIELDS = ("specialty", "specialty_query")
+LIST_FIELDS = ("conditions", "procedures", "insurance_plans")
+# Short text kept in memory, and long text memory-mapped.
+TEXT_FIELDS = ("name", "url", "address")
+MAPPED_TEXT_FIELDS = ("bio",)
+
+NOT_LISTED = "not listed"
+# Sentinels for missing numbers in the typed columns.
+MISSING_INT = -1
+
+
+@contextmanager
+def _replacing(path: str):
+    """Write a file under a temporary name and move it into place, so readers never see it half written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        yield f
+    os.replace(tmp_path, path)
+
+
+def _write_array(path: str, typecode: str, values: Iterable) -> None:
+    with _replacing(path) as f:
+        array.array(typecode, values).tofile(f)
+
+
+def _read_array(path: str, typecode: str, swap: bool) -> array.array:
+    values = array.array(typecode)
+    with open(path, "rb") as f:
+        values.frombytes(f.read())
+    if swap:
+        values.byteswap()
+    return values
+
+
+def _offsets(lengths: Iterable[int]) -> List[int]:
+    offsets = [0]
+    for length in lengths:
+        offsets.append(offsets[-1] + length)
+    return offsets
+
+
+def _experience_years(value: str) -> int:
+    value = value.strip()
+    return int(value) if value.isdigit() else MISSING_INT
+
+
+def _review_count(value: str) -> int:
+    value = value.replace(",", "").strip()
+    return int(value) if value.isdigit() else MISSING_INT
+
+
+def _coordinate(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def write_store(records: Sequence[DoctorRecord], path: str) -> None:
+    """
+    Write `records` as a columnar store at `path` (a directory, created if needed).
+    """
+    os.makedirs(path, exist_ok=True)
+    meta = {"version": FORMAT_VERSION, "count": len(records), "byteorder": sys.byteorder,
+            "strings": {}}
+
+    for field in INTERNED_FIELDS + LIST_FIELDS:
+        table: Dict[str, int] = {}
+        postings: Dict[int, List[int]] = {}
+        per_record = []
+        for position, record in enumerate(records):
+            values = getattr(record, field)
+            ids = [table.setdefault(value, len(table)) for value in ((values,) if field in INTERNED_FIELDS else values)]
+            per_record.append(ids)
+            for value_id in set(ids):
+                postings.setdefault(value_id, []).append(position)
+        meta["strings"][field] = list(table)
+        if field in INTERNED_FIELDS:
+            _write_array(os.path.join(path, f"{field}.col"), "I", (ids[0] for ids in per_record))
+        else:
+            _write_array(os.path.join(path, f"{field}.ids"), "I", (i for ids in per_record for i in ids))
+            _write_array(os.path.join(path, f"{field}.offsets"), "I", _offsets(len(ids) for ids in per_record))
+        _write_array(os.path.join(path, f"{field}.postings"), "I",
+                     (p for value_id in range(len(table)) for p in postings.get(value_id, ())))
+        _write_array(os.path.join(path, f"{field}.posting_offsets"), "I",
+                     _offsets(len(postings.get(value_id, ())) for value_id in range(len(table))))
+
+    for field in TEXT_FIELDS + MAPPED_TEXT_FIELDS:
+        encoded = [getattr(record, field).encode("utf-8") for record in records]
+        with _replacing(os.path.join(path, f"{field}.heap")) as f:
+            for text in encoded:
+                f.write(text)
+        _write_array(os.path.join(path, f"{field}.offsets"), "Q", _offsets(len(text) for text in encoded))
+
+    _write_array(os.path.join(path, "experience.col"), "h", (_experience_years(r.experience) for r in records))
+    _write_array(os.path.join(path, "qty_reviews.col"), "i", (_review_count(r.qty_reviews) for r in records))
+    _write_array(os.path.join(path, "accepting_new_patients.col"), "B",
+                 (int(r.accepting_new_patients) for r in records))
+    # Postings for accepting (value 1) and not accepting (value 0) doctors.
+    accepting = [[i for i, r in enumerate(records) if r.accepting_new_patients == bool(value)] for value in (0, 1)]
+    _write_array(os.path.join(path, "accepting_new_patients.postings"), "I", (i for ids in accepting for i in ids))
+    _write_array(os.path.join(path, "accepting_new_patients.posting_offsets"), "I", _offsets(map(len, accepting)))
+    _write_array(os.path.join(path, "latitude.col"), "d", (_coordinate(r.latitude) for r in records))
+    _write_array(os.path.join(path, "longitude.col"), "d", (_coordinate(r.longitude) for r in records))
+
+    # meta.json is written last: its modification time is the store's version (see directory_mtime).
+    tmp_path = os.path.join(path, f"{META_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+
+
+class _Records(Sequence):
+    """Read-only sequence view that builds each DoctorRecord when it is accessed."""
+
+    def __init__(self, directory: "ColumnarDirectory"):
+        self._directory = directory
+
+    def __len__(self) -> int:
+        return len(self._directory)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._directory.record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        return self._directory.record(index)
+
+
+class ColumnarDirectory:
+    """
+    Doctor directory backed by a columnar store, with the same query API as `DoctorDirectory`.
+
+    Columns are loaded as typed arrays, interned strings as one list per field, and the bios are
+    memory-mapped. `records[i]` builds the DoctorRecord for position i on demand.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = directory_mtime(path)
+        with open(os.path.join(path, META_FILE), "r") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported directory store version {meta.get('version')} in {path}")
+        self._count = meta["count"]
+        swap = meta["byteorder"] != sys.byteorder
+        self.strings: Dict[str, List[str]] = meta["strings"]
+
+        def read(name: str, typecode: str) -> array.array:
+            return _read_array(os.path.join(path, name), typecode, swap)
+
+        self._columns = {field: read(f"{field}.col", "I") for field in INTERNED_FIELDS}
+        self._columns.update(
+            experience=read("experience.col", "h"),
+            qty_reviews=read("qty_reviews.col", "i"),
+            accepting_new_patients=read("accepting_new_patients.col", "B"),
+            latitude=read("latitude.col", "d"),
+            longitude=read("longitude.col", "d"),
+        )
+        self._lists = {field: (read(f"{field}.ids", "I"), read(f"{field}.offsets", "I")) for field in LIST_FIELDS}
+        self._postings = {
+            field: (read(f"{field}.postings", "I"), read(f"{field}.posting_offsets", "I"))
+            for field in INTERNED_FIELDS + LIST_FIELDS + ("accepting_new_patients",)
+        }
+        self._keys = {
+            field: self._key_table(self.strings[field]) for field in INTERNED_FIELDS + LIST_FIELDS
+        }
+
+        self._text = {}
+        for field in TEXT_FIELDS:
+            with open(os.path.join(path, f"{field}.heap"), "rb") as f:
+                self._text[field] = (f.read(), read(f"{field}.offsets", "Q"))
+        self._mapped = {}
+        for field in MAPPED_TEXT_FIELDS:
+            with open(os.path.join(path, f"{field}.heap"), "rb") as f:
+                # mmap cannot map an empty file.
+                heap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+            self._mapped[field] = (heap, read(f"{field}.offsets", "Q"))
+
+        self.records = _Records(self)
+
+    @staticmethod
+    def _key_table(values: List[str]) -> Dict[str, List[int]]:
+        table: Dict[str, List[int]] = {}
+        for value_id, value in enumerate(values):
+            table.setdefault(_key(value), []).append(value_id)
+        return table
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[DoctorRecord]:
+        return (self.record(i) for i in range(self._count))
+
+    def _text_value(self, field: str, i: int) -> str:
+        heap, offsets = self._text[field] if field in self._text else self._mapped[field]
+        return heap[offsets[i]:offsets[i + 1]].decode("utf-8")
+
+    def _list_value(self, field: str, i: int) -> tuple:
+        ids, offsets = self._lists[field]
+        strings = self.strings[field]
+        return tuple(strings[value_id] for value_id in ids[offsets[i]:offsets[i + 1]])
+
+    def value(self, field: str, i: int):
+        """
+        One field of the record at position i, as `DoctorRecord` holds it, read from its column
+        without building the record; the bio is only read when it is the field asked for.
+        """
+        if field in self._text or field in self._mapped:
+            return self._text_value(field, i)
+        if field in self._lists:
+            return self._list_value(field, i)
+        if field in INTERNED_FIELDS:
+            return self.strings[field][self._columns[field][i]]
+        if field == "experience":
+            years = self._columns["experience"][i]
+            return NOT_LISTED if years == MISSING_INT else str(years)
+        if field == "qty_reviews":
+            reviews = self._columns["qty_reviews"][i]
+            return "" if reviews == MISSING_INT else str(reviews)
+        if field == "accepting_new_patients":
+            return bool(self._columns["accepting_new_patients"][i])
+        if field in ("latitude", "longitude"):
+            coordinate = self._columns[field][i]
+            return None if math.isnan(coordinate) else coordinate
+        raise KeyError(field)
+
+    def record(self, i: int) -> DoctorRecord:
+        return DoctorRecord(*(self.value(field, i) for field in DoctorRecord._fields))
+
+    def addresses(self) -> List[str]:
+        return [self._text_value("address", i) for i in range(self._count)]
+
+    def coordinates(self) -> List[Optional[Tuple[float, float]]]:
+        """Each record's (latitude, longitude), read from the columns without building records."""
+        return [
+            None if math.isnan(lat) or math.isnan(lon) else (lat, lon)
+            for lat, lon in zip(self._columns["latitude"], self._columns["longitude"])
+        ]
+
+    def _matching(self, fields: Sequence[str], value: str) -> FrozenSet[int]:
+        positions = set()
+        for field in fields:
+            postings, offsets = self._postings[field]
+            for value_id in self._keys[field].get(_key(value), ()):
+                positions.update(postings[offsets[value_id]:offsets[value_id + 1]])
+        return frozenset(positions)
+
+    def select(self, specialty: Optional[str] = None, condition: Optional[str] = None,
+               procedure: Optional[str] = None, insurance: Optional[str] = None,
+               accepting_new_patients: Optional[bool] = None) -> FrozenSet[int]:
+        """
+        Return the positions of the records matching every given criterion, see `DoctorDirectory.select`.
+        """
+        selected = None
+        for fields, value in (
+            (SPECIALTY_FIELDS, specialty),
+            (("conditions",), condition),
+            (("procedures",), procedure),
+            (("insurance_plans",), insurance),
+        ):
+            if value is None:
+                continue
+            ids = self._matching(fields, value)
+            selected = ids if selected is None else selected & ids
+        if accepting_new_patients is not None:
+            if selected is None:
+                postings, offsets = self._postings["accepting_new_patients"]
+                value = int(accepting_new_patients)
+                selected = frozenset(postings[offsets[value]:offsets[value + 1]])
+            else:
+                # Already narrowed down: checking the survivors is cheaper than building the whole posting set.
+                accepting = self._columns["accepting_new_patients"]
+                selected = frozenset(i for i in selected if bool(accepting[i]) == accepting_new_patients)
+        if selected is None:
+            return frozenset(range(self._count))
+        return selected
+
+    def query(self, **criteria) -> List[DoctorRecord]:
+        """
+        Return the records matching `criteria` (see `select`), in directory order.
+        """
+        return [self.records[i] for i in sorted(self.select(**criteria))]
+
+
+def import_directory(source: str, path: str, client=None) -> int:
+    """
+    Import a JSON list or JSON-lines directory file into a columnar store. Returns the record count.
+
+    With a Google Maps `client`, doctors without coordinates are geocoded first.
+    """
+    with open(source, "r") as f:
+        if source.endswith(".jsonl"):
+            doctors = [json.loads(line) for line in f if line.strip()]
+        else:
+            doctors = json.load(f)
+    if client is not None:
+        from .cache import locate_doctors
+
+        locate_doctors(client, doctors)
+    records = [DoctorRecord.from_dict(doc) for doc in doctors]
+    write_store(records, path)
+    return len(records)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Import a doctor directory into a columnar store.")
+    arg_parser.add_argument("source", help="JSON list or JSON-lines directory file")
+    arg_parser.add_argument("store", help="Directory to write the store to")
+    arg_parser.add_argument("--geocode", action="store_true",
+                            help="Geocode doctors without coordinates (needs GOOGLE_MAPS_API_KEY)")
+    args = arg_parser.parse_args()
+    client = None
+    if args.geocode:
+        from .agent import get_client
+
+        client = get_client()
+    print(f"{import_directory(args.source, args.store, client)} doctors written to {args.store}")
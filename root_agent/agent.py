@@ -1,8 +1,35 @@
 from google.adk.agents import Agent, SequentialAgent
+from google.adk.apps import App
 from diagnosis_agent.agent import diagnosis_agent , display_diagnosis_agent# uncomment once sub agent once it is up and running.
 #from maps_agent.agent import maps_agent
-from search_agent.agent import search_agent
 from google.adk.models.lite_llm import LiteLlm
+from common.telemetry_plugin import TelemetryPlugin
+from .shutdown import ShutdownPlugin
+from .pipeline import find_providers, refine_results, use_pipeline
+from .warmup import start_warmup, use_warmup
+
+# In pipeline mode find_providers imports the search tools when first called; only the agent
+# hand-off needs search_agent (and its HTTP and HTML libraries) at start-up.
+if not use_pipeline():
+    from search_agent.agent import search_agent
+
+forecast_and_display_agent = SequentialAgent(
+    name='forecast_and_display_agent',
+    description='An agent that uses the sub-agents to diagnose the paitients symptoms and display the diagnosis.',
+    sub_agents=[diagnosis_agent, display_diagnosis_agent])
+
+# Deterministic orchestration: once the diagnosis is shown, the search, insurance and distance
+# steps run in-process through find_providers and the root model only summarizes the result.
+PIPELINE_INSTRUCTIONS = """
+    Once the diagnosis has been displayed and the patient wants help finding a provider, ask for their address (or city)
+    and insurance plan if they have not given them, then call find_providers with the suggested specialty from
+    {diagnosis?}, the address and the plan. Do not transfer to search_agent.
+    Summarize the returned doctors for the patient: name, distance, experience, rating and whether their insurance is accepted.
+    If the result has an error, explain it briefly and ask the patient for a more precise address.
+    When the patient then asks for closer doctors, another insurance plan, better rated or more experienced doctors,
+    or more results, call refine_results with the matching filters, sort_by or page instead of find_providers: it
+    works on the doctors already found. Call find_providers again only for a new specialty or address.
+    """
 
 root_agent = Agent(
     model=LiteLlm(model="openai/gpt-4o"),
@@ -15,13 +42,17 @@ root_agent = Agent(
         - Find a doctor that can treat the patient's condition.
         - Verify insurance coverage for the proposed clinician mathes the patients insurance.
         - Politely decline requests that arn't specifically or immediatly related to the patient's care.
-    """,
+    """ + (PIPELINE_INSTRUCTIONS if use_pipeline() else ""),
     #sub_agents=[diagnosis_agent,  search_agent  ]
-    sub_agents=[
-        SequentialAgent(
-            name='forecast_and_display_agent',
-            description='An agent that uses the sub-agents to diagnose the paitients symptoms and display the diagnosis.',
-            sub_agents=[diagnosis_agent, display_diagnosis_agent])
-        ,  search_agent]
+    tools=[find_providers, refine_results] if use_pipeline() else [],
+    sub_agents=[forecast_and_display_agent] if use_pipeline() else [forecast_and_display_agent, search_agent]
 )
 
+# adk web serves `app` instead of `root_agent` when a module defines one; the telemetry plugin
+# times every agent, LLM call and tool call of a request (see common/telemetry.py) and the
+# shutdown plugin closes the HTTP connections when the runner is closed.
+app = App(name='root_agent', root_agent=root_agent, plugins=[TelemetryPlugin(), ShutdownPlugin()])
+
+# Load the model client, HTTP pools and data files in the background instead of on the first request.
+if use_warmup():
+    start_warmup()
@@ -0,0 +1,273 @@
+import asyncio
+import math
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from google.adk.tools.tool_context import ToolContext
+
+from common.telemetry import span
+
+# "agents" (the default) keeps the original hand-off to search_agent and insurance_agent;
+# "pipeline" lets root_agent call find_providers directly once the diagnosis is known.
+ORCHESTRATION_MODE = os.getenv("CARENAV_ORCHESTRATION", "agents").strip().lower()
+
+# find_providers only serves doctors from a directory ingested for the region (see
+# search_agent.ingest) when one is configured; the bundled file is test data.
+DIRECTORY_PATH = os.getenv("CARENAV_DIRECTORY_PATH")
+
+DEFAULT_TARGET_COUNT = 5
+DEFAULT_MAX_PAGES = 3
+
+# Session state key holding every candidate of the last find_providers search, so follow-up turns
+# can filter, re-sort and page through it with refine_results.
+RESULTS_STATE_KEY = "provider_results"
+SORT_ORDERS = ("rank", "distance", "rating", "reviews", "experience")
+
+
+def use_pipeline(mode: Optional[str] = None) -> bool:
+    return (mode or ORCHESTRATION_MODE) == "pipeline"
+
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str):
+    """Time a pipeline stage as a telemetry span and record its duration in `timings`."""
+    stage = None
+    try:
+        with span("find_providers" if name == "total" else f"find_providers.{name}") as stage:
+            yield stage
+    finally:
+        if stage is not None:
+            timings[name] = round(stage.duration_ms, 1)
+
+
+def _summary(doctor: Dict[str, Any], verdict: Optional[Dict[str, Any]], miles: Optional[float],
+             rank_score: float) -> Dict[str, Any]:
+    return {
+        "name": doctor.get("name"),
+        "url": doctor.get("url"),
+        "specialty": doctor.get("specialty"),
+        "address": doctor.get("address"),
+        "experience": doctor.get("experience"),
+        "score": doctor.get("score"),
+        "qty_reviews": doctor.get("qty_reviews"),
+        "distance_miles": miles,
+        "accepts_insurance": verdict.get("acceptsInsurance") if verdict else None,
+        "insurance_reason": verdict.get("reason") if verdict else None,
+        "rank_score": round(rank_score, 3),
+    }
+
+
+def _query(specialty: str, patient_address: str, insurance_plan: Optional[str]) -> Dict[str, str]:
+    return {
+        "specialty": " ".join(specialty.split()).casefold(),
+        "patient_address": " ".join(patient_address.split()).casefold(),
+        "insurance_plan": " ".join((insurance_plan or "").split()).casefold(),
+    }
+
+
+async def find_providers(specialty: str, patient_address: str, insurance_plan: Optional[str] = None,
+                         target_count: int = DEFAULT_TARGET_COUNT, max_pages: int = DEFAULT_MAX_PAGES,
+                         tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
+    """
+    Find doctors for a diagnosed specialty near the patient, in one deterministic pass.
+
+    Runs geocoding, the doctor lookup (the directory at CARENAV_DIRECTORY_PATH first, if set,
+    else a Healthgrades crawl), the
+    insurance check and the ranking (driving distance, rating, reviews and experience, see
+    `maps_agent.ranking`) in-process, so a triage needs no extra LLM hops between them. Only
+    doctors whose insurance the local matcher cannot decide are sent to the insurance LLM, all
+    in one batch.
+
+    Every candidate found, with its distance and insurance verdict, is kept in the session state
+    for `refine_results`; repeating the same search in the session is answered from there.
+
+    Args:
+        specialty (str): The specialty suggested by diagnosis_agent.
+        patient_address (str): The patient's address or general location.
+        insurance_plan (str, optional): The patient's insurance plan.
+        target_count (int): Number of suitable doctors to look for.
+        max_pages (int): Maximum number of search result pages to crawl.
+
+    Returns:
+        dict: A dictionary with keys:
+            - doctors (list[dict]): Doctors accepting new patients (and the plan, if given), best first.
+              Each has name, url, specialty, address, experience, score, qty_reviews, distance_miles,
+              accepts_insurance, insurance_reason and rank_score.
+            - total_found (int): Suitable doctors found in all; refine_results pages through the rest.
+            - source (str): "directory" if the doctors came from the local directory, "healthgrades" if they
+              were crawled live, "session" if this search was already run in the session.
+            - pages_searched (int): Number of search pages requested.
+            - errors (list[dict]): {"url", "error"} for each search page or profile that failed.
+            - timings_ms (dict): Wall time in milliseconds spent in each stage.
+            - error (str): Only present if the pipeline could not run.
+    """
+    timings: Dict[str, float] = {}
+    query = _query(specialty, patient_address, insurance_plan)
+    stored = tool_context.state.get(RESULTS_STATE_KEY) if tool_context is not None else None
+    if stored and stored["query"] == query:
+        accepted = [doctor for doctor in stored["doctors"] if doctor["accepts_insurance"] is not False]
+        return {"doctors": accepted[:target_count], "total_found": len(accepted), "source": "session",
+                "pages_searched": 0, "errors": [], "timings_ms": timings}
+
+    with _stage(timings, "total") as total:
+        total.set(specialty=specialty)
+        # Imported on first use so that importing root_agent stays fast (see root_agent/warmup.py).
+        from insurance_agent.batch import check_insurance_batch
+        from insurance_agent.matcher import plan_names
+        from search_agent.agent import crawl_doctors
+        try:
+            from maps_agent.agent import get_client
+            from maps_agent.cache import cached_distances, cached_geocode
+            from maps_agent.directory import DoctorRecord, get_directory
+            from maps_agent.ranking import nearby_doctors, top_k
+
+            gmaps = get_client()
+        except Exception as e:
+            total.fail(e)
+            return {"error": f"Maps client unavailable: {e}", "timings_ms": timings}
+
+        with _stage(timings, "geocode"):
+            location = await asyncio.to_thread(cached_geocode, gmaps, patient_address)
+        if location is None:
+            total.fail("patient address not found")
+            return {"error": f"Could not locate {patient_address}", "timings_ms": timings}
+
+        # Doctors ingested ahead of time (see search_agent.ingest) are served from the local directory;
+        # Healthgrades is only crawled live when the directory has nobody for this specialty nearby.
+        doctors, source = [], "directory"
+        crawl = {"pages_searched": 0, "errors": []}
+        if DIRECTORY_PATH:
+            with _stage(timings, "directory") as stage:
+                try:
+                    directory = get_directory(DIRECTORY_PATH)
+                    local = directory.select(specialty=specialty, accepting_new_patients=True)
+                    # Doctors ingested without coordinates are geocoded once, through the shared cache.
+                    nearby = await asyncio.to_thread(nearby_doctors, directory, location, local,
+                                                     client=gmaps) if local else []
+                    doctors = [directory.records[i].to_dict() for i in nearby]
+                except Exception as e:
+                    stage.fail(e)
+        if not doctors:
+            source = "healthgrades"
+            with _stage(timings, "search"):
+                crawl = await crawl_doctors(specialty, location[0], location[1], target_count, max_pages, insurance_plan)
+            doctors = [doc for doc in crawl["doctors"] if doc.get("accepting_new_patients")]
+
+        verdicts: Dict[str, Dict[str, Any]] = {}
+        if insurance_plan and doctors:
+            with _stage(timings, "insurance"):
+                verdicts = await check_insurance_batch(insurance_plan, doctors)
+
+        # Distances and scores cover the doctors rejected for this plan too: a follow-up turn may
+        # change the plan (see refine_results).
+        with _stage(timings, "distance"):
+            distances: List[Optional[float]] = await asyncio.to_thread(
+                cached_distances, gmaps, patient_address, [doc.get("address", "") for doc in doctors], location
+            )
+        ranked = top_k([DoctorRecord.from_dict(doc) for doc in doctors], distances, len(doctors))
+        candidates = [
+            _summary(doctors[i], verdicts.get(doctors[i].get("url")), distances[i], score) for score, i in ranked
+        ]
+        accepted = [doctor for doctor in candidates if doctor["accepts_insurance"] is not False]
+        total.set(source=source, doctors=min(len(accepted), target_count))
+
+    if tool_context is not None:
+        tool_context.state[RESULTS_STATE_KEY] = {
+            "query": query,
+            "insurance_plan": insurance_plan,
+            "doctors": candidates,
+            "insurance_plans": {
+                doc.get("url"): plan_names(doc.get("insurance_plans") or doc.get("insurance_data")) for doc in doctors
+            },
+        }
+    return {
+        "doctors": accepted[:target_count],
+        "total_found": len(accepted),
+        "source": source,
+        "pages_searched": crawl["pages_searched"],
+        "errors": crawl["errors"],
+        "timings_ms": timings,
+    }
+
+
+def refine_results(max_distance_miles: Optional[float] = None, insurance_plan: Optional[str] = None,
+                   min_rating: Optional[float] = None, min_experience_years: Optional[int] = None,
+                   sort_by: str = "rank", page: int = 1, page_size: int = DEFAULT_TARGET_COUNT,
+                   tool_context: Optional[ToolContext] = None) -> Dict[str, Any]:
+    """
+    Filter, re-sort or page through the doctors found by the last find_providers call in this
+    conversation, without searching again.
+
+    Use it when the patient asks for closer doctors, a different insurance plan, better rated or
+    more experienced doctors, or more results. The distances and insurance verdicts computed by
+    find_providers are reused; a different plan is checked against the plans each doctor lists,
+    and doctors the local rules cannot decide are kept with accepts_insurance set to None.
+
+    Args:
+        max_distance_miles (float, optional): Only doctors at most this far away by road.
+        insurance_plan (str, optional): Only doctors accepting this plan; defaults to the searched plan.
+        min_rating (float, optional): Only doctors rated at least this many stars.
+        min_experience_years (int, optional): Only doctors with at least this many years of experience.
+        sort_by (str): "rank" (the find_providers order), "distance", "rating", "reviews" or "experience".
+        page (int): Page of results to return, starting at 1.
+        page_size (int): Doctors per page.
+
+    Returns:
+        dict: A dictionary with keys:
+            - doctors (list[dict]): The requested page, in the same format as find_providers.
+            - total_found (int): Doctors matching the filters.
+            - page (int), pages (int): The page returned and the number of pages.
+            - error (str): Only present if there is no earlier search to refine.
+    """
+    stored = tool_context.state.get(RESULTS_STATE_KEY) if tool_context is not None else None
+    if not stored:
+        return {"error": "No doctors found yet in this conversation; call find_providers first."}
+    if sort_by not in SORT_ORDERS:
+        return {"error": f"Unknown sort_by {sort_by!r}; use one of {', '.join(SORT_ORDERS)}."}
+
+    from insurance_agent.matcher import match_insurance, normalize_plan
+    from maps_agent.directory import DoctorRecord
+    from maps_agent.ranking import experience_years, rating, review_count
+
+    with span("refine_results", sort_by=sort_by, page=page) as refine:
+        searched_plan = stored["insurance_plan"]
+        doctors = []
+        for doctor in stored["doctors"]:
+            if insurance_plan and normalize_plan(insurance_plan) != normalize_plan(searched_plan or ""):
+                verdict = match_insurance(insurance_plan, stored["insurance_plans"].get(doctor["url"]))
+                doctor = dict(doctor,
+                              accepts_insurance=verdict["acceptsInsurance"] if verdict else None,
+                              insurance_reason=verdict["reason"] if verdict else
+                              f"Could not be checked locally; search again with {insurance_plan} to confirm.")
+            if doctor["accepts_insurance"] is False:
+                continue
+            miles = doctor["distance_miles"]
+            if max_distance_miles is not None and (miles is None or miles > max_distance_miles):
+                continue
+            record = DoctorRecord.from_dict(doctor)
+            if min_rating is not None and (rating(record) or 0) < min_rating:
+                continue
+            if min_experience_years is not None and (experience_years(record) or 0) < min_experience_years:
+                continue
+            doctors.append((doctor, record))
+
+        if sort_by == "distance":
+            doctors.sort(key=lambda item: (item[0]["distance_miles"] is None, item[0]["distance_miles"] or 0))
+        elif sort_by == "rating":
+            doctors.sort(key=lambda item: (-(rating(item[1]) or 0), -review_count(item[1])))
+        elif sort_by == "reviews":
+            doctors.sort(key=lambda item: -review_count(item[1]))
+        elif sort_by == "experience":
+            doctors.sort(key=lambda item: -(experience_years(item[1]) or 0))
+
+        page_size = max(1, page_size)
+        pages = max(1, math.ceil(len(doctors) / page_size))
+        page = min(max(1, page), pages)
+        refine.set(doctors=len(doctors))
+    return {
+        "doctors": [doctor for doctor, _ in doctors[(page - 1) * page_size:page * page_size]],
+        "total_found": len(doctors),
+        "page": page,
+        "pages": pages,
+    }
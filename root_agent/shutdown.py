@@ -0,0 +1,21 @@
+import sys
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+
+class ShutdownPlugin(BasePlugin):
+    """
+    ADK plugin releasing the resources bound to the server's event loop when the runner is closed
+    (`Runner.close`, which adk web calls on shutdown): the pooled connections of the search
+    agent's fetch engine.
+    """
+
+    def __init__(self, name: str = "carenav_shutdown"):
+        super().__init__(name=name)
+
+    async def close(self) -> None:
+        # Nothing to close if no search tool ran, and no reason to import the HTTP stack for it.
+        if "search_agent.fetch" in sys.modules:
+            from search_agent.fetch import close_async_engine
+
+            await close_async_engine()
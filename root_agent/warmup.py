@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from common.telemetry import span
+
+# "1" warms the process up in a background thread as soon as root_agent is imported.
+WARMUP = os.getenv("CARENAV_WARMUP", "0").strip().lower()
+
+
+def use_warmup(mode: Optional[str] = None) -> bool:
+    return (mode or WARMUP) in ("1", "true", "yes")
+
+
+def _llm() -> None:
+    # LiteLlm imports litellm on its first call, which takes several seconds.
+    import litellm  # noqa: F401
+
+
+def _search() -> None:
+    # The async HTTP clients are bound to the event loop that uses them, so only what they share is
+    # loaded here: httpx, the TLS context and the parsers.
+    from bs4 import BeautifulSoup  # noqa: F401
+
+    from search_agent.agent import crawl_doctors  # noqa: F401
+    from search_agent.fetch import ssl_context
+    from search_agent.parser import parse_profile  # noqa: F401
+
+    ssl_context()
+
+
+def _maps() -> None:
+    from maps_agent.directory import get_directory
+    from maps_agent.ranking import doctor_index
+
+    doctor_index(get_directory())
+
+
+def _diagnosis() -> None:
+    from diagnosis_agent.specialties import get_resolver
+
+    get_resolver()
+
+
+def _insurance() -> None:
+    from insurance_agent.batch import get_runner
+
+    get_runner()
+
+
+def _cache() -> None:
+    from common.cache import get_cache
+
+    get_cache()
+
+
+STEPS: Dict[str, Callable[[], None]] = {
+    "llm": _llm,
+    "search": _search,
+    "maps": _maps,
+    "diagnosis": _diagnosis,
+    "insurance": _insurance,
+    "cache": _cache,
+}
+
+
+def warm_up(steps: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    Do the one-off work the first request would otherwise pay for: import the model client and
+    the HTTP stack with its TLS context, load the doctor directory and its spatial index, the
+    specialty resolver and the response cache.
+
+    A step that fails (e.g. a missing directory file) is reported and skipped; the request that
+    needs it will report the error itself.
+
+    Returns:
+        Milliseconds spent in each step that succeeded.
+    """
+    timings = {}
+    with span("warmup"):
+        for name in steps or STEPS:
+            start = time.perf_counter()
+            try:
+                with span(f"warmup.{name}"):
+                    STEPS[name]()
+            except Exception as e:
+                print(f"Warm-up step {name} failed: {e}")
+                continue
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
+
+
+def start_warmup(steps: Optional[Iterable[str]] = None) -> threading.Thread:
+    """Run `warm_up` in a daemon thread, so start-up does not wait for it."""
+    thread = threading.Thread(target=warm_up, args=(steps,), name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,21 +1,29 @@
-import json
-import re
-import requests
-
+import asyncio
+import os
 from google.adk.agents.llm_agent import Agent
 from google.adk.models.lite_llm import LiteLlm
-from bs4 import BeautifulSoup
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, Optional
 from insurance_agent.insurance_agent import insurance_agent
+from insurance_agent.batch import check_insurance_batch
+from insurance_agent.matcher import check_insurance
+from common.cache import get_cache
+from common.telemetry import span
+from .fetch import get_async_engine
+from .parser import ProfileParseError, parse_profile
+
+# Pointed at a local mock server by the load test.
+HEALTHGRADES_BASE_URL = os.getenv('HEALTHGRADES_BASE_URL', 'https://www.healthgrades.com').rstrip('/')
 
 
-def get_doctors_list(specialty: str, latitude: float, longitude: float, page : int = 1) -> Union[list[str], str]:
+async def get_doctors_list(specialty: str, latitude: float, longitude: float,
+                           page : int = 1) -> Union[list[Dict[str, Any]], str]:
     """
-    Retrieve a list of Healthgrades doctor profile URLs based on a medical specialty and geographic location.
+    Retrieve Healthgrades doctor profiles based on a medical specialty and geographic location.
 
     This function sends an HTTP GET request to Healthgrades using the provided medical specialty and
     latitude/longitude coordinates, then parses the returned HTML to extract links to individual
-    doctor profiles. Only results from the first page are returned.
+    doctor profiles. The profile pages are then fetched and parsed concurrently. Only the doctors on
+    results page `page` are returned.
 
     Args:
         specialty (str): The medical specialty to search for (e.g., "Oncology", "Pediatrics").
@@ -24,58 +32,189 @@ def get_doctors_list(specialty: str, latitude: float, longitude: float, page : i
         page (int): The page number of the search results to retrieve.
 
     Returns:
-        list[str]: A list of URLs to individual doctor profile pages on Healthgrades.
-        str: An error message string if the request or parsing fails.
+        list[dict]: One entry per doctor found, in search order: the parsed profile, or
+            {"url": str, "error": str} for a profile that failed to download or parse, without
+            affecting the others.
+        str: An error message string if the search request or parsing fails.
 
     Notes:
         - This function parses static HTML. If the site content is rendered dynamically via JavaScript,
           the results may be incomplete or empty.
         - The structure of Healthgrades pages may change, which could break this scraper.
-        - Currently, only the first page of results is retrieved. Pagination is not handled.
+        - Only the requested page of results is retrieved. Use `crawl_doctors` to search several pages.
+        - The profile URLs found for a search are cached on disk, keyed by the search URL. The
+          cache is SQLite, so it is read and written in worker threads, off the event loop.
+        - Requests go through the shared async HTTP client, so concurrent sessions do not block each other.
+        - `search_agent.stream.stream_doctors` yields the same profiles one by one as they finish.
     """
-    doctor_urls = []
+    from .stream import stream_doctors
+
+    doctors = {}
+    async for entry in stream_doctors(specialty, latitude, longitude, page=page):
+        if entry['status'] == 'ok':
+            doctors[entry['position']] = entry['doctor']
+        elif entry['status'] == 'error' and entry['position'] is not None:
+            doctors[entry['position']] = {'url': entry['url'], 'error': entry['error']}
+        elif entry['status'] == 'error':
+            return entry['error']
+    return [doctors[position] for position in sorted(doctors)]
+
+
+async def fetch_profile_urls(specialty: str, latitude: float, longitude: float, page: int = 1) -> Union[list[str], str]:
+    """
+    Fetch one Healthgrades search results page with the shared async HTTP client and extract the
+    doctor profile URLs on it.
+
+    Args:
+        specialty (str): The medical specialty to search for.
+        latitude (float): The latitude of the search location.
+        longitude (float): The longitude of the search location.
+        page (int): The page number of the search results to retrieve.
+
+    Returns:
+        list[str]: Profile URLs in search order, served from the on-disk cache when available.
+        str: An error message string if the request or parsing fails.
+    """
+    base_url = search_url(specialty, latitude, longitude, page)
+    with span('search.page', url=base_url) as search:
+        cache = get_cache()
+        cached_urls = await asyncio.to_thread(cache.get, f'search:{base_url}')
+        search.set(cache='miss' if cached_urls is None else 'hit')
+        if cached_urls is not None:
+            return cached_urls
+
+        result = await get_async_engine().fetch(base_url)
+        if not result.ok:
+            stale = await stale_entry(cache, f'search:{base_url}', result, search)
+            if stale is not None:
+                return stale
+            search.fail(result.error)
+            return result.error
+        doctor_urls = await asyncio.to_thread(extract_profile_urls, result.content)
+        if isinstance(doctor_urls, list):
+            await asyncio.to_thread(cache.set, f'search:{base_url}', doctor_urls)
+        return doctor_urls
+
+
+async def stale_entry(cache, key: str, result, current) -> Optional[Any]:
+    """
+    The expired cache entry for `key` when `result` failed because Healthgrades is struggling
+    (timeouts, 429/5xx, an open circuit), marking the span `current` as served stale; else None.
+    """
+    if not result.transient:
+        return None
+    stale = await asyncio.to_thread(cache.get_stale, key)
+    if stale is not None:
+        current.set(cache='stale', error=result.error)
+    return stale
+
 
-    base_url = (
-        f'https://www.healthgrades.com/usearch?what={specialty}'
+def search_url(specialty: str, latitude: float, longitude: float, page: int = 1) -> str:
+    return (
+        f'{HEALTHGRADES_BASE_URL}/usearch?what={specialty}'
         f'&pt={latitude}%2C{longitude}&pageNum={page}&sort.provider=bestmatch'
     )
-    print(f"[DEBUG] Requesting URL: {base_url}")
 
-    try:
-        response = requests.get(
-            base_url,
-            headers={'User-Agent': 'Mozilla/5.0'},
-            cookies={}
-        )
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
 
-        listings = soup.find_all('div', attrs={'role': 'presentation'})
+def extract_profile_urls(content: bytes) -> Union[list[str], str]:
+    """
+    Extract the doctor profile URLs from a downloaded search results page.
+
+    Returns:
+        list[str]: Profile URLs in search order.
+        str: An error message string if parsing fails.
+    """
+    # Imported here: BeautifulSoup is only needed once a search page has been downloaded.
+    from bs4 import BeautifulSoup
+
+    doctor_urls = []
+    with span('parse.search_page', bytes=len(content)) as parse:
+        try:
+            soup = BeautifulSoup(content, 'html.parser')
+
+            listings = soup.find_all('div', attrs={'role': 'presentation'})
+
+            for listing in listings:
+                link = listing.find('a', href=True)
+                if link and 'href' in link.attrs:
+                    doctor_urls.append(f'{HEALTHGRADES_BASE_URL}{link["href"]}')
+
+        except Exception as e:
+            import traceback
+            tb = traceback.extract_tb(e.__traceback__)
+            parse.fail(e)
+            return f'Error on line {tb[-1].lineno}: {e}'
 
-        for listing in listings:
-            link = listing.find('a', href=True)
-            if link and 'href' in link.attrs:
-                doctor_urls.append(f'https://www.healthgrades.com{link["href"]}')
+        parse.set(profiles=len(doctor_urls))
+    return doctor_urls
 
-    except Exception as e:
-        import traceback
-        tb = traceback.extract_tb(e.__traceback__)
-        return f'Error on line {tb[-1].lineno}: {e}'
 
-    return [parse_doctor_information(doctor) for doctor in doctor_urls]
+async def crawl_doctors(specialty: str, latitude: float, longitude: float, target_count: int = 10,
+                  max_pages: int = 5, patient_insurance: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Search several pages of Healthgrades results until enough suitable doctors are found.
+
+    Search pages are fetched concurrently, a few at a time, and the profiles found on them are
+    downloaded concurrently through the shared async HTTP client. The crawl stops as soon as `target_count` doctors accepting
+    new patients (and, if given, accepting the patient's insurance) were found, cancelling the
+    downloads still running, after `max_pages` pages, or at the first page that returns no doctors.
 
+    Args:
+        specialty (str): The medical specialty to search for (e.g., "Oncology", "Pediatrics").
+        latitude (float): The latitude of the search location.
+        longitude (float): The longitude of the search location.
+        target_count (int): Number of accepted doctors to stop at.
+        max_pages (int): Maximum number of search result pages to request.
+        patient_insurance (str, optional): The patient's insurance plan, used to decide which doctors count
+            towards `target_count`.
 
-def parse_doctor_information(url: str) -> Union[Dict[str, Any], str]:
+    Returns:
+        dict: A dictionary with keys:
+            - doctors (list[dict]): Parsed profiles, in search order, each listed once even when it
+              appears on several pages.
+            - accepted_count (int): How many of them count towards `target_count`.
+            - pages_searched (int): Number of search pages requested.
+            - errors (list[dict]): {"url", "error"} for each search page or profile that failed.
+    """
+    from .stream import stream_doctors
+
+    doctors = {}
+    errors = []
+    accepted_count = 0
+    pages_searched = 0
+    async for entry in stream_doctors(specialty, latitude, longitude, max_pages=max_pages,
+                                      patient_insurance=patient_insurance, stop_after=target_count):
+        if entry['status'] == 'page':
+            pages_searched += 1
+        elif entry['status'] == 'error':
+            pages_searched += entry['position'] is None
+            errors.append({'url': entry['url'], 'error': entry['error']})
+        else:
+            doctors[entry['position']] = entry['doctor']
+            accepted_count += entry['suitable']
+
+    return {
+        'doctors': [doctors[position] for position in sorted(doctors)],
+        'accepted_count': accepted_count,
+        'pages_searched': pages_searched,
+        'errors': errors,
+    }
+
+
+async def parse_doctor_information(url: str, allow_stale: bool = True) -> Union[Dict[str, Any], str]:
     """
     Parse detailed doctor profile information from a Healthgrades profile page.
 
-    This function retrieves a Healthgrades doctor profile page and extracts key details,
+    This function downloads a Healthgrades doctor profile page with the shared async HTTP client,
+    parses it in a worker thread so the event loop stays free, and extracts key details,
     including the doctor's name, specialty, years of experience, biography, address,
     frequently treated conditions, procedures, rating, review count, accepted insurance,
     and whether the doctor is currently accepting new patients.
 
     Args:
         url (str): Full URL to the doctor's profile page on Healthgrades.
+        allow_stale (bool): Return an expired cached profile when the download fails because
+            Healthgrades is struggling.
 
     Returns:
         dict: A dictionary containing the parsed doctor profile information with keys:
@@ -95,107 +234,58 @@ def parse_doctor_information(url: str) -> Union[Dict[str, Any], str]:
         str: An error message containing the exception details and line number if parsing fails.
 
     Notes:
+        - Successfully parsed profiles are kept in the on-disk cache (see `common.cache`),
+          so repeat lookups skip both the download and the HTML parsing until the entry expires.
+          While Healthgrades is failing or its circuit is open, an expired profile is returned instead.
         - This function assumes a stable HTML structure for Healthgrades profiles.
           If the structure changes, selectors may need updates.
         - Some elements may not exist on every profile (e.g., biography, years of experience).
         - The insurance data is extracted from embedded JavaScript and may require adjustments
           if Healthgrades changes its data storage format.
     """
-    try:
-        state = "request"
-
-        response = requests.get(
-            url,
-            headers={'User-Agent': 'Mozilla/5.0'},
-            cookies={}
-        )
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Doctor name
-        state = 'name'
-        name = soup.find('h1', class_='summary-provider-name').text.strip()
+    with span('search.profile', url=url) as profile:
+        cache = get_cache()
+        doctor = await asyncio.to_thread(cache.get, f'profile:{url}')
+        profile.set(cache='miss' if doctor is None else 'hit')
+        if doctor is not None:
+            return doctor
+
+        page = await get_async_engine().fetch(url)
+        if not page.ok:
+            stale = await stale_entry(cache, f'profile:{url}', page, profile) if allow_stale else None
+            if stale is not None:
+                return stale
+            profile.fail(page.error)
+            return f'Error in state request: {page.error}'
+        doctor = await asyncio.to_thread(parse_doctor_html, url, page.content)
+        if isinstance(doctor, dict):
+            await asyncio.to_thread(cache.set, f'profile:{url}', doctor)
+        return doctor
+
+
+def parse_doctor_html(url: str, content: bytes) -> Union[Dict[str, Any], str]:
+    """
+    Parse an already downloaded Healthgrades profile page.
 
-        # Specialty
-        state = 'specialty'
-        specialty = soup.find('div', class_='speciality-name-text').text.replace('*', '').strip()
+    Args:
+        url (str): Profile URL the page was downloaded from.
+        content (bytes): Raw HTML of the profile page.
 
-        # Years of experience
-        state = 'experience'
-        try:
-            experience = soup.find('div', class_='years-of-experience-text').text.split(' ')[0].replace('+', '').strip()
-            experience = f'{experience} years'
-        except AttributeError:
-            experience = 'not listed'
-
-        # Biography
-        state = 'bio'
-        bio = soup.find('p', attrs={'data-qa-target': 'premium-biography'}).text.strip()
-
-        # Address
-        state = 'address'
-        address = soup.find('address').text.strip()
-
-        # Conditions
-        state = 'conditions'
-        conditions = [
-            condition.split(':')[-1].strip()
-            for condition in soup.find('meta', attrs={'name': 'conditions'})['content'].split(',')
-        ]
-
-        # Procedures
-        state = 'procedures'
-        procedures = [
-            procedure.split(':')[-1].strip()
-            for procedure in soup.find('meta', attrs={'name': 'procedures'})['content'].split(',')
-        ]
-
-        # Review score and quantity
-        state = 'review'
-        score = soup.find('span', class_='score').text.strip()
-        qty_reviews = soup.find('span', class_='review-summary-horizontal-scroll__content').text.split(' ')[0].strip()
-
-        # Insurance data (from embedded script)
-        state = 'insurance'
+    Returns:
+        dict: The parsed profile, see `parse_doctor_information` for the keys.
+        str: An error message containing the exception details and line number if parsing fails.
+    """
+    with span('parse.profile', bytes=len(content)) as parse:
         try:
-            insurance_script = soup.find_all('script')[6]
-            insurance_data = None
-            for script in insurance_script.string.split('HG3.profile.pageState || ')[1].split(';'):
-                if 'insuranceAccepted' in script:
-                    insurance_data = dict(json.loads(script))['providerProfileModel']['insuranceAccepted']
-                    break
-        except:
-            insurance_data = None
-
-        # Accepting new patients (from utag_data script)
-        state = 'accepting_new_patients'
-        script = soup.find('script', string=re.compile(r'utag_data'))
-        raw_js = script.string
-        pattern = re.compile(r"utag_data\['(.*?)'\]\s*=\s*\"(.*?)\";")
-        utag_dict = dict(pattern.findall(raw_js))
-        accepting_new_patients = utag_dict.get('AcceptNewPatients') == 'yes'
-
-        return {
-            'name': name,
-            'url': url,
-            'specialty': specialty,
-            'experience': experience,
-            'bio': bio,
-            'address': address,
-            'conditions': conditions,
-            'procedures': procedures,
-            'insurance_data': insurance_data,
-            'score': score,
-            'qty_reviews': qty_reviews,
-            'accepting_new_patients': accepting_new_patients
-        }
-
-    except Exception as e:
-        import traceback
-        tb = traceback.extract_tb(e.__traceback__)
-        return f'Error in state {state} on line {tb[-1].lineno}: {e}'
-
+            return parse_profile(content, url).to_dict()
+        except ProfileParseError as e:
+            parse.fail(e)
+            return f'Error in state {e.state}: {e}'
+        except Exception as e:
+            import traceback
+            tb = traceback.extract_tb(e.__traceback__)
+            parse.fail(e)
+            return f'Error in state parse on line {tb[-1].lineno}: {e}'
 
 
 search_agent = Agent(
@@ -205,11 +295,14 @@ search_agent = Agent(
     instruction="""
     You retrieve Healthgrades doctor profiles based on a medical specialty and geographic location.
     If the location information is missing, request the user's city and state.
-    Use your sub-agent, insurance_agent, to check if the doctor accepts the patient's insurance plan before returning the profile.
+    Use crawl_doctors to search several result pages when the first page does not have enough suitable doctors.
+    Use the check_insurance tool to check if the doctor accepts the patient's insurance plan before returning the profile.
+    When checking several doctors, call check_insurance_batch once with all of their profiles instead.
+    Only when check_insurance returns null for acceptsInsurance, ask your sub-agent, insurance_agent, to decide instead.
     Summarize the doctor information for the user and return only those accepting new patients with mathching insurance.
     Refer any requests that aren't specifically and immediately related to finding doctor profiles to the root agent.
     """,
-    tools= [get_doctors_list]
+    tools= [get_doctors_list, crawl_doctors, check_insurance, check_insurance_batch]
     ,sub_agents = [insurance_agent]
 )
 
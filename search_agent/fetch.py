@@ -0,0 +1,396 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from common.telemetry import span
+
+# The HTTP libraries are imported when the first engine is created, not when the tools are loaded.
+if TYPE_CHECKING:
+    import ssl
+
+    import httpx
+
+
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+# Requests per second allowed against a single host, and how many may go out back to back.
+PER_HOST_RATE = float(os.getenv('CARENAV_PER_HOST_RATE', '4.0'))
+PER_HOST_BURST = int(os.getenv('CARENAV_PER_HOST_BURST', '4'))
+
+# Connections the async client keeps open in total and to any one host.
+MAX_CONNECTIONS = 64
+MAX_CONNECTIONS_PER_HOST = int(os.getenv('CARENAV_MAX_CONNECTIONS_PER_HOST', '8'))
+
+# Seconds to wait for a connection, and for each read once connected.
+CONNECT_TIMEOUT = float(os.getenv('CARENAV_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('CARENAV_READ_TIMEOUT', '20'))
+
+# Retries after the first attempt, with full-jitter exponential backoff (in seconds) between them.
+MAX_RETRIES = int(os.getenv('CARENAV_MAX_RETRIES', '3'))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+# Rate limiting and server-side failures are retried; other 4xx responses are not.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Consecutive failures that open a host's circuit, and how many seconds it stays open.
+BREAKER_THRESHOLD = int(os.getenv('CARENAV_BREAKER_THRESHOLD', '5'))
+BREAKER_COOLDOWN = float(os.getenv('CARENAV_BREAKER_COOLDOWN', '30'))
+
+
+@dataclass
+class FetchResult:
+    """
+    Outcome of fetching a single URL.
+
+    Exactly one of `content` and `error` is set, so a failed profile never hides the others.
+    """
+    url: str
+    content: Optional[bytes] = None
+    error: Optional[str] = None
+    # Set when the host rather than the URL is at fault (timeouts, 429/5xx, an open circuit), so a
+    # stale cached copy is a fair answer.
+    transient: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based): a random delay of up to
+    BACKOFF_BASE * 2**attempt, capped at BACKOFF_MAX, and no shorter than a Retry-After header asks.
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_MAX))
+    return delay
+
+
+def retry_after_seconds(headers: Any) -> Optional[float]:
+    value = headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        # The HTTP-date form; the backoff delay is used instead.
+        return None
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per host, shared by every fetch engine.
+
+    After `threshold` consecutive failures (timeouts, connection errors, 5xx) the host's circuit
+    opens and requests to it fail at once for `cooldown` seconds. Then a single probe request is
+    let through: if it succeeds the circuit closes, otherwise it stays open for another
+    `cooldown`. A 429 is not a failure here; it is left to `AdaptiveLimit`. A probe that ends
+    without an outcome (the request was cancelled) must be handed back with `release`.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        # host -> (consecutive failures, time the circuit opened or None, probe in flight)
+        self._hosts: Dict[str, tuple] = {}
+
+    def state(self, host: str) -> str:
+        with self._lock:
+            _, opened, probing = self._hosts.get(host, (0, None, False))
+        if opened is None:
+            return 'closed'
+        return 'half-open' if probing or time.monotonic() - opened >= self.cooldown else 'open'
+
+    def allow(self, host: str) -> str:
+        """
+        Whether a request to `host` may be sent now: 'closed' if the circuit is closed, 'probe' if
+        this request claimed the probe after the cooldown, '' (false) if it must not be sent.
+        """
+        with self._lock:
+            failures, opened, probing = self._hosts.get(host, (0, None, False))
+            if opened is None:
+                return 'closed'
+            if probing or time.monotonic() - opened < self.cooldown:
+                return ''
+            self._hosts[host] = (failures, opened, True)
+            return 'probe'
+
+    def release(self, host: str) -> None:
+        """Hand back a claimed probe that ended without an outcome, so the next request probes instead."""
+        with self._lock:
+            failures, opened, probing = self._hosts.get(host, (0, None, False))
+            if probing:
+                self._hosts[host] = (failures, opened, False)
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            failures, opened, probing = self._hosts.get(host, (0, None, False))
+            failures += 1
+            if probing or failures >= self.threshold:
+                opened = time.monotonic()
+            self._hosts[host] = (failures, opened, False)
+
+
+class AdaptiveLimit:
+    """
+    Concurrent requests allowed per host, adjusted by additive increase / multiplicative decrease.
+
+    Each host starts at `maximum`. An overloaded response (429, 5xx, timeout) multiplies its limit
+    by `decrease`, at most once per `cooldown` seconds so that the requests already in flight
+    when the host slowed down count once. Each success adds 1/limit, so the limit grows back by
+    about one per round of successful requests.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, decrease: float = 0.5, cooldown: float = 1.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        # host -> (limit, time of the last decrease)
+        self._limits: Dict[str, tuple] = {}
+
+    def limit(self, host: str) -> int:
+        with self._lock:
+            return int(self._limits.get(host, (self.maximum, 0.0))[0])
+
+    def on_success(self, host: str) -> None:
+        with self._lock:
+            limit, decreased = self._limits.get(host, (self.maximum, 0.0))
+            if limit < self.maximum:
+                self._limits[host] = (min(self.maximum, limit + 1 / limit), decreased)
+
+    def on_overload(self, host: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            limit, decreased = self._limits.get(host, (self.maximum, 0.0))
+            if now - decreased >= self.cooldown:
+                self._limits[host] = (max(self.minimum, limit * self.decrease), now)
+
+
+_breaker = CircuitBreaker()
+
+
+class HostRateLimiter:
+    """
+    Token bucket per host, shared by the requests of one engine.
+
+    Each host gets `burst` tokens refilled at `rate` tokens per second. `acquire` waits on the
+    event loop until a token for the URL's host is available.
+    """
+
+    def __init__(self, rate: float = PER_HOST_RATE, burst: int = PER_HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, tuple] = {}
+
+    def _take(self, url: str) -> float:
+        """Take a token for the URL's host; return 0, or how long to wait before trying again."""
+        host = urlsplit(url).netloc
+        now = time.monotonic()
+        tokens, last = self._buckets.get(host, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens >= 1:
+            self._buckets[host] = (tokens - 1, now)
+            return 0.0
+        self._buckets[host] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    async def acquire(self, url: str) -> None:
+        while (wait := self._take(url)) > 0:
+            await asyncio.sleep(wait)
+
+
+class AsyncFetchEngine:
+    """
+    HTTP fetcher for the tools running on the ADK event loop.
+
+    A single `httpx.AsyncClient` keeps connections alive between requests. At most
+    `max_connections_per_host` requests are in flight against one host (fewer while the host's
+    adaptive limit is reduced, see `AdaptiveLimit`), and each request waits for the host's token
+    bucket. Every request has connect and read timeouts; timeouts, connection errors, 429 and 5xx
+    responses are retried with jittered backoff, bounded by the host's circuit breaker
+    (see `CircuitBreaker`).
+    """
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS,
+                 max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST,
+                 rate: float = PER_HOST_RATE, burst: int = PER_HOST_BURST,
+                 client: Optional['httpx.AsyncClient'] = None,
+                 max_retries: int = MAX_RETRIES, breaker: Optional[CircuitBreaker] = None):
+        import httpx
+
+        self.max_connections_per_host = max_connections_per_host
+        self.max_retries = max_retries
+        self.breaker = breaker or _breaker
+        self.concurrency = AdaptiveLimit(max_connections_per_host)
+        self.limiter = HostRateLimiter(rate, burst)
+        self.client = client or httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            verify=ssl_context(),
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        # Exceptions worth retrying.
+        self._transient_errors = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+        self._in_flight: Dict[str, int] = {}
+        self._host_slots: Dict[str, asyncio.Condition] = {}
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        """Hold one of the host's adaptive concurrency slots."""
+        slots = self._host_slots.setdefault(host, asyncio.Condition())
+        async with slots:
+            await slots.wait_for(lambda: self._in_flight.get(host, 0) < self.concurrency.limit(host))
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            async with slots:
+                self._in_flight[host] -= 1
+                slots.notify_all()
+
+    async def fetch(self, url: str) -> FetchResult:
+        """
+        Fetch one URL without blocking the event loop, retrying transient failures.
+
+        Args:
+            url (str): URL to download.
+
+        Returns:
+            FetchResult: The response body, or the error message if every attempt failed.
+        """
+        host = urlsplit(url).netloc
+        with span('http.get', host=host) as request:
+            attempt = 0
+            while True:
+                admitted = self.breaker.allow(host)
+                if not admitted:
+                    request.fail('circuit open').set(circuit='open')
+                    return FetchResult(url=url, error=f'Error fetching {url}: circuit open for {host}', transient=True)
+                start = time.perf_counter()
+                try:
+                    async with self._host_slot(host):
+                        await self.limiter.acquire(url)
+                        # Time spent waiting for a connection slot and a rate-limit token.
+                        request.add('queued_ms', round((time.perf_counter() - start) * 1000, 3))
+                        request.set(attempts=attempt + 1)
+                        try:
+                            response, error = await self.client.get(url), None
+                        except Exception as e:
+                            response, error = None, e
+                except BaseException:
+                    # Cancelled (e.g. a tool call abandoned by the runner) before the outcome was
+                    # known: hand back the probe this attempt claimed.
+                    if admitted == 'probe':
+                        self.breaker.release(host)
+                    raise
+                result, delay = self._outcome(url, host, request, attempt, response, error)
+                if delay is None:
+                    return result
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _outcome(self, url: str, host: str, request: Any, attempt: int, response: Any,
+                 error: Optional[Exception]) -> Tuple[FetchResult, Optional[float]]:
+        """
+        Record the outcome of one attempt, given the response or the exception it raised.
+
+        Returns:
+            The result, and the seconds to wait before retrying (None when the result is final).
+        """
+        status_code, retry_after = None, None
+        if response is not None:
+            status_code, retry_after = response.status_code, retry_after_seconds(response.headers)
+            request.set(status_code=status_code).add('bytes', len(response.content))
+            if status_code < 400:
+                self._record(host, status_code, False)
+                return FetchResult(url=url, content=response.content), None
+            error = f'HTTP {status_code}'
+        transient_error = isinstance(error, self._transient_errors)
+        result = FetchResult(url=url, error=f'Error fetching {url}: {error}',
+                             transient=transient_error or status_code in RETRY_STATUSES)
+        if self._record(host, status_code, transient_error) and attempt < self.max_retries:
+            return result, backoff_delay(attempt, retry_after)
+        request.fail(result.error)
+        return result, None
+
+    def _record(self, host: str, status_code: Optional[int], transient_error: bool) -> bool:
+        """Update the breaker and the concurrency limit after one attempt; return whether to retry."""
+        if transient_error or (status_code is not None and status_code >= 500):
+            self.breaker.record_failure(host)
+            self.concurrency.on_overload(host)
+            return transient_error or status_code in RETRY_STATUSES
+        self.breaker.record_success(host)
+        if status_code == 429:
+            self.concurrency.on_overload(host)
+            return True
+        self.concurrency.on_success(host)
+        return False
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+_engine_lock = threading.Lock()
+_ssl_context: Optional['ssl.SSLContext'] = None
+_ssl_lock = threading.Lock()
+
+
+def ssl_context() -> 'ssl.SSLContext':
+    """
+    Return the TLS context shared by the async clients. Loading the CA bundle takes tens of
+    milliseconds, which each event loop's client would otherwise pay again.
+    """
+    global _ssl_context
+    with _ssl_lock:
+        if _ssl_context is None:
+            import httpx
+
+            _ssl_context = httpx.create_ssl_context()
+        return _ssl_context
+
+
+# Keyed weakly, so an engine is dropped with its loop when the loop was closed without
+# `close_async_engine` (e.g. a plain `loop.close()`).
+_async_engines: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncFetchEngine]' = weakref.WeakKeyDictionary()
+
+
+def get_async_engine() -> AsyncFetchEngine:
+    """
+    Return the async fetch engine for the running event loop, creating it on first use.
+
+    httpx clients are bound to the loop they were first used on, so each loop gets its own engine.
+    Close it with `close_async_engine` before the loop stops.
+    """
+    loop = asyncio.get_running_loop()
+    with _engine_lock:
+        engine = _async_engines.get(loop)
+        if engine is None or engine.client.is_closed:
+            engine = _async_engines[loop] = AsyncFetchEngine()
+        return engine
+
+
+async def close_async_engine() -> None:
+    """
+    Close the running loop's fetch engine and its pooled connections, if it has one.
+
+    Called by the app's shutdown hook (`root_agent.shutdown.ShutdownPlugin`) and by scripts at
+    the end of their `asyncio.run`. A later `get_async_engine` on the loop starts a new engine.
+    """
+    with _engine_lock:
+        engine = _async_engines.pop(asyncio.get_running_loop(), None)
+    if engine is not None:
+        await engine.aclose()
@@ -0,0 +1,266 @@
+"""
+Build a local doctor directory by crawling Healthgrades ahead of time.
+
+    python -m search_agent.ingest --lat 41.88 --lon -87.63 --specialties Oncology Cardiology \
+        --out assets/doctor_directory.jsonl [--pages 10] [--max-age-days 7] [--concurrency 8]
+
+Records are appended to the JSON-lines store as each search page finishes, and the pages done
+so far are kept in `<out>.checkpoint.json`, so an interrupted run picks up where it stopped.
+Profiles already in the store and younger than `--max-age-days` are not downloaded again.
+Profiles are parsed in worker processes when CARENAV_PARSE_WORKERS is set (see search_agent/workers.py).
+Records without coordinates are geocoded before the store is rewritten (needs GOOGLE_MAPS_API_KEY),
+so online requests read the doctors' coordinates from the directory.
+Point CARENAV_DIRECTORY_PATH at the store to serve online requests from it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from insurance_agent.matcher import plan_names
+from maps_agent.agent import get_client
+from maps_agent.cache import locate_doctors
+from .agent import parse_doctor_information, fetch_profile_urls
+from .fetch import close_async_engine
+from .workers import fetch_profiles, use_workers
+
+DEFAULT_PAGES = 10
+DEFAULT_MAX_AGE_DAYS = 7.0
+DEFAULT_CONCURRENCY = 8
+
+
+def normalize_profile(doctor: Dict[str, Any], specialty_query: str, fetched_at: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Convert a `parse_doctor_information` profile to the directory schema
+    (`maps_agent.directory.DoctorRecord`), plus the search it came from and when it was fetched.
+
+    `insurance_data` becomes the flat `insurance_plans` list and "15 years" becomes "15", as in
+    assets/doctor_data_test100.json.
+    """
+    experience = str(doctor.get('experience') or 'not listed')
+    years = re.match(r'\s*(\d+)', experience)
+    record = {
+        'name': doctor['name'],
+        'url': doctor['url'],
+        'specialty': doctor.get('specialty', ''),
+        'experience': years.group(1) if years else 'not listed',
+        'bio': doctor.get('bio', ''),
+        'address': doctor['address'],
+        'conditions': [item for item in doctor.get('conditions') or [] if item],
+        'procedures': [item for item in doctor.get('procedures') or [] if item],
+        'score': str(doctor.get('score', '')),
+        'qty_reviews': str(doctor.get('qty_reviews', '')),
+        'accepting_new_patients': bool(doctor.get('accepting_new_patients')),
+        'insurance_plans': plan_names(doctor.get('insurance_plans') or doctor.get('insurance_data')),
+    }
+    record['specialty_query'] = specialty_query
+    record['fetched_at'] = round(fetched_at if fetched_at is not None else time.time(), 1)
+    return record
+
+
+def load_store(path: str) -> Dict[str, Dict[str, Any]]:
+    """Read a JSON-lines store; when a URL appears more than once the last record wins."""
+    records: Dict[str, Dict[str, Any]] = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write can leave a truncated last line.
+                    continue
+                records[record['url']] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def append_records(path: str, records: List[Dict[str, Any]]) -> None:
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_store(path: str, records: Dict[str, Dict[str, Any]]) -> None:
+    """Rewrite the store with one line per URL, sorted by URL."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        for url in sorted(records):
+            f.write(json.dumps(records[url]) + '\n')
+    os.replace(tmp_path, path)
+
+
+class Checkpoint:
+    """
+    Search pages already ingested per specialty, for one region and page budget.
+
+    A checkpoint written for another region or page budget is ignored.
+    """
+
+    def __init__(self, path: str, region: Dict[str, Any]):
+        self.path = path
+        self.region = region
+        self.pages: Dict[str, int] = {}
+        self.done: List[str] = []
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('region') == region:
+                self.pages = data.get('pages', {})
+                self.done = data.get('done', [])
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def next_page(self, specialty: str) -> Optional[int]:
+        """The next page to ingest for `specialty`, or None if it is finished."""
+        if specialty in self.done:
+            return None
+        return self.pages.get(specialty, 0) + 1
+
+    def page_done(self, specialty: str, page: int) -> None:
+        self.pages[specialty] = page
+        self._save()
+
+    def specialty_done(self, specialty: str) -> None:
+        if specialty not in self.done:
+            self.done.append(specialty)
+        self._save()
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _save(self) -> None:
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'region': self.region, 'pages': self.pages, 'done': self.done}, f)
+        os.replace(tmp_path, self.path)
+
+
+def keep_coordinates(record: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    """Carry the coordinates of the previous version of a record over if its address is unchanged."""
+    if previous and previous.get('address') == record['address'] and previous.get('latitude') is not None:
+        record['latitude'], record['longitude'] = previous['latitude'], previous['longitude']
+
+
+async def ingest(specialties: List[str], latitude: float, longitude: float, out: str,
+                 pages: int = DEFAULT_PAGES, max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+                 concurrency: int = DEFAULT_CONCURRENCY, maps_client=None) -> Dict[str, int]:
+    """
+    Crawl every specialty around one location into the JSON-lines store at `out`.
+
+    Args:
+        specialties (list[str]): Specialties to search for.
+        latitude (float): Latitude of the region's center.
+        longitude (float): Longitude of the region's center.
+        out (str): Path of the JSON-lines store; existing records are kept and refreshed.
+        pages (int): Maximum number of search result pages per specialty.
+        max_age_days (float): Records fetched more recently than this are not downloaded again.
+        concurrency (int): Profiles downloaded at the same time.
+        maps_client: A `googlemaps.Client` to geocode new addresses with; without one, records are
+            stored without coordinates.
+
+    Returns:
+        dict: Counts of profiles fetched, profiles skipped as fresh, records that could not be
+            located, and errors.
+    """
+    store = load_store(out)
+    checkpoint = Checkpoint(f'{out}.checkpoint.json', {'latitude': latitude, 'longitude': longitude, 'pages': pages})
+    max_age = max_age_days * 24 * 60 * 60
+    slots = asyncio.Semaphore(concurrency)
+    stats = {'fetched': 0, 'fresh': 0, 'unlocated': 0, 'errors': 0}
+
+    async def fetch(url: str):
+        async with slots:
+            # A stale profile would be stored with a new fetched_at; leave the old record until the next run.
+            return url, await parse_doctor_information(url, allow_stale=False)
+
+    for specialty in specialties:
+        page = checkpoint.next_page(specialty)
+        if page is None:
+            continue
+        finished = True
+        while page <= pages:
+            urls = await fetch_profile_urls(specialty, latitude, longitude, page)
+            if isinstance(urls, str):
+                # Leave the checkpoint where it is so the next run retries this page.
+                print(f'{specialty} page {page}: {urls}')
+                stats['errors'] += 1
+                finished = False
+                break
+            if not urls:
+                break
+
+            now = time.time()
+            stale = [url for url in urls if now - store.get(url, {}).get('fetched_at', 0) > max_age]
+            stats['fresh'] += len(urls) - len(stale)
+            new_records = []
+            if use_workers():
+                fetched = zip(stale, await fetch_profiles(stale, fetch_concurrency=concurrency, allow_stale=False))
+            else:
+                fetched = await asyncio.gather(*(fetch(url) for url in stale))
+            for url, doctor in fetched:
+                if isinstance(doctor, str):
+                    print(f'{url}: {doctor}')
+                    stats['errors'] += 1
+                    continue
+                record = normalize_profile(doctor, specialty)
+                keep_coordinates(record, store.get(url))
+                store[url] = record
+                new_records.append(record)
+            stats['fetched'] += len(new_records)
+            append_records(out, new_records)
+            checkpoint.page_done(specialty, page)
+            print(f'{specialty} page {page}: {len(new_records)} fetched, {len(urls) - len(stale)} fresh')
+            page += 1
+        if finished:
+            checkpoint.specialty_done(specialty)
+
+    if maps_client is not None:
+        # Also covers records left without coordinates by an earlier run.
+        stats['unlocated'] = await asyncio.to_thread(locate_doctors, maps_client, store.values())
+    write_store(out, store)
+    if all(checkpoint.next_page(specialty) is None for specialty in specialties):
+        checkpoint.remove()
+    return stats
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--lat', type=float, required=True)
+    arg_parser.add_argument('--lon', type=float, required=True)
+    arg_parser.add_argument('--specialties', nargs='+', required=True)
+    arg_parser.add_argument('--out', required=True)
+    arg_parser.add_argument('--pages', type=int, default=DEFAULT_PAGES)
+    arg_parser.add_argument('--max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS)
+    arg_parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    args = arg_parser.parse_args()
+
+    try:
+        maps_client = get_client()
+    except ValueError as e:
+        print(f'{e}: doctors are stored without coordinates')
+        maps_client = None
+
+    async def run():
+        try:
+            return await ingest(args.specialties, args.lat, args.lon, args.out, args.pages,
+                                args.max_age_days, args.concurrency, maps_client)
+        finally:
+            await close_async_engine()
+
+    stats = asyncio.run(run())
+    print(f"{stats['fetched']} profiles fetched, {stats['fresh']} still fresh, "
+          f"{stats['unlocated']} not located, {stats['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
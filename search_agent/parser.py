@@ -0,0 +1,193 @@
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+# Element selectors for the text fields of a Healthgrades profile: field -> (tag, attribute, value).
+# An attribute of "class" matches any one of the element's classes.
+TEXT_FIELDS = {
+    'name': ('h1', 'class', 'summary-provider-name'),
+    'specialty': ('div', 'class', 'speciality-name-text'),
+    'experience': ('div', 'class', 'years-of-experience-text'),
+    'bio': ('p', 'data-qa-target', 'premium-biography'),
+    'address': ('address', None, None),
+    'score': ('span', 'class', 'score'),
+    'qty_reviews': ('span', 'class', 'review-summary-horizontal-scroll__content'),
+}
+META_FIELDS = ('conditions', 'procedures')
+
+# Fields every profile must have; the rest fall back to a default when missing.
+REQUIRED_FIELDS = ('name', 'specialty', 'bio', 'address', 'conditions', 'procedures', 'score',
+                   'qty_reviews', 'accepting_new_patients')
+
+PAGE_STATE_MARKER = 'HG3.profile.pageState || '
+UTAG_PATTERN = re.compile(r"utag_data\['(.*?)'\]\s*=\s*\"(.*?)\";")
+
+# Pages are fed to the parser in chunks so parsing can stop once every field has been seen.
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+class ProfileParseError(ValueError):
+    """Raised when a required field is missing from a profile page."""
+
+    def __init__(self, state: str):
+        super().__init__(f'{state} not found')
+        self.state = state
+
+
+@dataclass
+class DoctorProfile:
+    """A parsed Healthgrades profile. `to_dict` gives the dictionary returned by the search tools."""
+    name: str
+    url: str
+    specialty: str
+    experience: str
+    bio: str
+    address: str
+    conditions: List[str] = field(default_factory=list)
+    procedures: List[str] = field(default_factory=list)
+    insurance_data: Optional[Any] = None
+    score: str = ''
+    qty_reviews: str = ''
+    accepting_new_patients: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _ProfileHTMLParser(HTMLParser):
+    """
+    Collects every profile field in a single pass over the page.
+
+    Only the text inside the elements listed in TEXT_FIELDS, the conditions/procedures meta tags
+    and the two scripts holding insurance and new-patient data is kept.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.values: Dict[str, Any] = {}
+        # Open captures: [field, tag, depth of nested same-name tags, text parts]
+        self._captures: List[list] = []
+
+    @property
+    def complete(self) -> bool:
+        return all(key in self.values for key in (*TEXT_FIELDS, *META_FIELDS, 'insurance', 'utag'))
+
+    def handle_starttag(self, tag, attrs):
+        for capture in self._captures:
+            if capture[1] == tag:
+                capture[2] += 1
+
+        if tag == 'meta':
+            attrs = dict(attrs)
+            name = attrs.get('name')
+            if name in META_FIELDS and name not in self.values:
+                self.values[name] = attrs.get('content') or ''
+            return
+        if tag == 'script':
+            self._captures.append(['script', tag, 1, []])
+            return
+
+        attr_map = None
+        for key, (field_tag, attr, value) in TEXT_FIELDS.items():
+            if field_tag != tag or key in self.values or any(c[0] == key for c in self._captures):
+                continue
+            if attr is not None:
+                if attr_map is None:
+                    attr_map = dict(attrs)
+                actual = attr_map.get(attr) or ''
+                if (value not in actual.split()) if attr == 'class' else (actual != value):
+                    continue
+            self._captures.append([key, tag, 1, []])
+
+    def handle_endtag(self, tag):
+        still_open = []
+        for capture in self._captures:
+            if capture[1] == tag:
+                capture[2] -= 1
+                if capture[2] == 0:
+                    self._finish(capture[0], ''.join(capture[3]))
+                    continue
+            still_open.append(capture)
+        self._captures = still_open
+
+    def handle_data(self, data):
+        for capture in self._captures:
+            capture[3].append(data)
+
+    def _finish(self, key: str, text: str) -> None:
+        if key != 'script':
+            self.values.setdefault(key, text)
+        elif 'insurance' not in self.values and PAGE_STATE_MARKER in text:
+            self.values['insurance'] = text
+        elif 'utag' not in self.values and 'utag_data' in text:
+            self.values['utag'] = text
+
+
+def _split_meta(content: str) -> List[str]:
+    return [item.split(':')[-1].strip() for item in content.split(',')]
+
+
+def _insurance_accepted(script: Optional[str]) -> Optional[Any]:
+    if not script:
+        return None
+    try:
+        start = script.index(PAGE_STATE_MARKER) + len(PAGE_STATE_MARKER)
+        state, _ = json.JSONDecoder().raw_decode(script[start:].lstrip())
+        return state['providerProfileModel']['insuranceAccepted']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def parse_profile(content: bytes, url: str) -> DoctorProfile:
+    """
+    Parse a Healthgrades profile page in one pass.
+
+    Args:
+        content (bytes): Raw HTML of the profile page.
+        url (str): Profile URL the page was downloaded from.
+
+    Returns:
+        DoctorProfile: The parsed profile.
+
+    Raises:
+        ProfileParseError: If a required field is missing; `state` names the field, matching the
+            states reported by `parse_doctor_information`.
+    """
+    html = content.decode('utf-8', errors='replace') if isinstance(content, bytes) else content
+    parser = _ProfileHTMLParser()
+    for start in range(0, len(html), FEED_CHUNK_SIZE):
+        parser.feed(html[start:start + FEED_CHUNK_SIZE])
+        if parser.complete:
+            break
+    else:
+        parser.close()
+    values = parser.values
+
+    utag = values.get('utag')
+    for key in REQUIRED_FIELDS:
+        present = utag is not None if key == 'accepting_new_patients' else key in values
+        if not present:
+            raise ProfileParseError('review' if key in ('score', 'qty_reviews') else key)
+
+    experience = values.get('experience')
+    if experience is None:
+        experience = 'not listed'
+    else:
+        experience = f"{experience.strip().split(' ')[0].replace('+', '').strip()} years"
+
+    return DoctorProfile(
+        name=values['name'].strip(),
+        url=url,
+        specialty=values['specialty'].replace('*', '').strip(),
+        experience=experience,
+        bio=values['bio'].strip(),
+        address=values['address'].strip(),
+        conditions=_split_meta(values['conditions']),
+        procedures=_split_meta(values['procedures']),
+        insurance_data=_insurance_accepted(values.get('insurance')),
+        score=values['score'].strip(),
+        qty_reviews=values['qty_reviews'].strip().split(' ')[0].strip(),
+        accepting_new_patients=dict(UTAG_PATTERN.findall(utag)).get('AcceptNewPatients') == 'yes',
+    )
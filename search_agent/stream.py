@@ -0,0 +1,133 @@
+"""
+Incremental Healthgrades search: profiles are yielded as soon as each one is downloaded and parsed,
+instead of after the slowest page of the batch.
+
+`get_doctors_list` and `crawl_doctors` are built on `stream_doctors`; a caller that can show
+partial results (a streaming UI) can iterate it directly.
+"""
+import asyncio
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from insurance_agent.matcher import match_insurance
+from .agent import parse_doctor_information, fetch_profile_urls, search_url
+
+# Search result pages requested at the same time while crawling.
+PAGE_CONCURRENCY = 3
+
+
+async def completed_profiles(urls: List[str],
+                             allow_stale: bool = True) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], str]]]:
+    """
+    Download and parse profiles concurrently, yielding each one as soon as it is ready, parsed in
+    worker processes when CARENAV_PARSE_WORKERS is set (see `search_agent.workers`), else in threads.
+    Closing the iterator early cancels the downloads still running.
+
+    Yields:
+        tuple[int, dict | str]: The position of the URL in `urls` and its parsed profile or error
+        message, in completion order.
+    """
+    from .workers import iter_profiles, use_workers
+
+    if use_workers():
+        profiles = iter_profiles(urls, allow_stale=allow_stale)
+        try:
+            async for item in profiles:
+                yield item
+        finally:
+            await profiles.aclose()
+        return
+
+    tasks = {asyncio.ensure_future(parse_doctor_information(url, allow_stale)): i for i, url in enumerate(urls)}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield tasks[task], task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def stream_doctors(specialty: str, latitude: float, longitude: float, page: int = 1, max_pages: int = 1,
+                         patient_insurance: Optional[str] = None,
+                         stop_after: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Search Healthgrades and yield each search page, parsed profile and error as soon as it is ready.
+
+    Search pages are fetched a few at a time, starting at `page`, and the profiles listed on them
+    are downloaded concurrently. A profile listed on several pages is fetched once. The search stops
+    after `max_pages` pages, at the first page that fails or returns no doctors, or once
+    `stop_after` suitable doctors were yielded; downloads still running are then cancelled.
+
+    Args:
+        specialty (str): The medical specialty to search for.
+        latitude (float): The latitude of the search location.
+        longitude (float): The longitude of the search location.
+        page (int): The first page of search results to request.
+        max_pages (int): Maximum number of search result pages to request.
+        patient_insurance (str, optional): The patient's plan. When given, each doctor carries the
+            local insurance verdict (None when the matcher cannot decide).
+        stop_after (int, optional): Stop once this many suitable doctors were yielded.
+
+    Yields:
+        dict: One entry per event, with a "status" key:
+            - "page": {"status", "page", "url", "profiles"} for each search page requested.
+            - "ok": {"status", "position", "url", "doctor", "insurance", "suitable"} for each parsed
+              profile. `position` is the profile's place in search order; `suitable` is True when
+              the doctor accepts new patients and, if `patient_insurance` is given, the local
+              matcher says they accept it.
+            - "error": {"status", "position", "url", "error"} for a failed search page (position
+              None) or profile.
+    """
+    seen = set()
+    found = 0
+    numbers = iter(range(page, page + max_pages))
+    while True:
+        batch = list(islice(numbers, PAGE_CONCURRENCY))
+        if not batch:
+            return
+        page_urls = await asyncio.gather(
+            *(fetch_profile_urls(specialty, latitude, longitude, number) for number in batch)
+        )
+
+        last_page = False
+        new_urls = []
+        for number, urls in zip(batch, page_urls):
+            url = search_url(specialty, latitude, longitude, number)
+            if isinstance(urls, str):
+                yield {'status': 'error', 'position': None, 'url': url, 'error': urls}
+                last_page = True
+                break
+            yield {'status': 'page', 'page': number, 'url': url, 'profiles': len(urls)}
+            if not urls:
+                last_page = True
+                break
+            for profile_url in urls:
+                if profile_url not in seen:
+                    seen.add(profile_url)
+                    new_urls.append(profile_url)
+
+        offset = len(seen) - len(new_urls)
+        profiles = completed_profiles(new_urls)
+        try:
+            async for i, doctor in profiles:
+                position, profile_url = offset + i, new_urls[i]
+                if isinstance(doctor, str):
+                    yield {'status': 'error', 'position': position, 'url': profile_url, 'error': doctor}
+                    continue
+                verdict = match_insurance(patient_insurance, doctor.get('insurance_data')) if patient_insurance else None
+                suitable = bool(doctor.get('accepting_new_patients')) and (
+                    not patient_insurance or bool(verdict and verdict['acceptsInsurance'])
+                )
+                yield {'status': 'ok', 'position': position, 'url': profile_url, 'doctor': doctor,
+                       'insurance': verdict, 'suitable': suitable}
+                found += suitable
+                if stop_after is not None and found >= stop_after:
+                    return
+        finally:
+            # Runs on early termination and when the consumer closes this generator.
+            await profiles.aclose()
+        if last_page:
+            return
@@ -0,0 +1,180 @@
+"""
+Process-pool mode for parsing large batches of Healthgrades profiles.
+
+Profile parsing is pure Python and holds the GIL, so with hundreds of profiles per batch the
+worker threads of the default mode take turns on one core. In this mode the two stages are split:
+
+    download  async tasks on the event loop (the shared `AsyncFetchEngine`, cache lookups)
+    parse     a pool of worker processes, sent only the URL and the raw page bytes, returning
+              the profile dictionary (or an error string)
+
+Downloaded pages wait in a bounded queue between the stages. When the parsers fall behind the
+queue fills up, the downloaders block on it while holding their download slots, and no new
+download starts until a parser frees a place, so memory stays bounded by
+`fetch_concurrency + queue_size` pages.
+
+Set CARENAV_PARSE_WORKERS to the number of processes (e.g. the number of cores) to have
+`get_doctors_list`, `crawl_doctors` and offline ingestion use this mode; 0 (the default) keeps
+parsing in threads.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from common.cache import get_cache
+from common.telemetry import span
+from .fetch import MAX_CONNECTIONS_PER_HOST, get_async_engine
+from .parser import ProfileParseError, parse_profile
+
+PARSE_WORKERS = int(os.getenv('CARENAV_PARSE_WORKERS', '0'))
+
+# Downloaded pages allowed to wait for a parser, per worker process.
+QUEUE_PAGES_PER_WORKER = 4
+
+
+def use_workers(workers: Optional[int] = None) -> bool:
+    return (PARSE_WORKERS if workers is None else workers) > 0
+
+
+def parse_page(url: str, content: bytes) -> Union[Dict[str, Any], str]:
+    """
+    Parse one profile page. Runs in a worker process, so it only takes and returns plain data.
+    """
+    try:
+        return parse_profile(content, url).to_dict()
+    except ProfileParseError as e:
+        return f'Error in state {e.state}: {e}'
+    except Exception as e:
+        return f'Error parsing {url}: {e}'
+
+
+def start_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Start a pool of `workers` parser processes.
+
+    Workers are started by a fork server rather than forked from this process, whose HTTP client
+    and agent threads may hold locks at the moment of the fork.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Return the process-wide parser pool with CARENAV_PARSE_WORKERS processes (one per core if
+    unset), starting it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = start_pool(PARSE_WORKERS or os.cpu_count() or 1)
+        return _pool
+
+
+async def fetch_profiles(urls: List[str], pool: Optional[Executor] = None, workers: Optional[int] = None,
+                         fetch_concurrency: int = MAX_CONNECTIONS_PER_HOST, queue_size: Optional[int] = None,
+                         allow_stale: bool = True) -> List[Union[Dict[str, Any], str]]:
+    """
+    Download and parse profile pages, parsing in worker processes.
+
+    Cached profiles are returned without downloading, and freshly parsed ones are cached, as in
+    `parse_doctor_information`. The arguments are those of `iter_profiles`.
+
+    Returns:
+        list[dict | str]: One parsed profile or error message per URL, in the same order as `urls`.
+    """
+    results: List[Union[Dict[str, Any], str, None]] = [None] * len(urls)
+    async for index, doctor in iter_profiles(urls, pool, workers, fetch_concurrency, queue_size, allow_stale):
+        results[index] = doctor
+    return results
+
+
+async def iter_profiles(urls: List[str], pool: Optional[Executor] = None, workers: Optional[int] = None,
+                        fetch_concurrency: int = MAX_CONNECTIONS_PER_HOST, queue_size: Optional[int] = None,
+                        allow_stale: bool = True) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], str]]]:
+    """
+    Download and parse profile pages, parsing in worker processes, yielding each profile as soon
+    as it is ready. Closing the iterator early cancels the downloads and parses still running.
+
+    Args:
+        urls (list[str]): Profile URLs.
+        pool (Executor, optional): Executor running `parse_page`; the shared pool by default.
+        workers (int, optional): Pages parsed at the same time; the pool's size by default.
+        fetch_concurrency (int): Pages downloaded, or waiting for the queue, at the same time.
+        queue_size (int, optional): Downloaded pages allowed to wait for a parser
+            (QUEUE_PAGES_PER_WORKER per worker by default).
+        allow_stale (bool): Return an expired cached profile when the download fails because
+            Healthgrades is struggling.
+
+    Yields:
+        tuple[int, dict | str]: The position of the URL in `urls` and its parsed profile or error
+        message, in completion order.
+    """
+    # Imported here: search_agent.agent imports this module lazily.
+    from .agent import stale_entry
+
+    pool = pool or get_pool()
+    workers = workers or PARSE_WORKERS or os.cpu_count() or 1
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or QUEUE_PAGES_PER_WORKER * workers)
+    finished: asyncio.Queue = asyncio.Queue()
+    downloads = asyncio.Semaphore(fetch_concurrency)
+    cache = get_cache()
+    engine = get_async_engine()
+    loop = asyncio.get_running_loop()
+
+    async def download(index: int, url: str) -> None:
+        try:
+            async with downloads:
+                with span('search.profile', url=url) as profile:
+                    doctor = await asyncio.to_thread(cache.get, f'profile:{url}')
+                    profile.set(cache='miss' if doctor is None else 'hit')
+                    if doctor is not None:
+                        finished.put_nowait((index, doctor))
+                        return
+                    page = await engine.fetch(url)
+                    if not page.ok:
+                        stale = await stale_entry(cache, f'profile:{url}', page, profile) if allow_stale else None
+                        if stale is None:
+                            profile.fail(page.error)
+                            stale = f'Error in state request: {page.error}'
+                        finished.put_nowait((index, stale))
+                        return
+                # Blocks, still holding the download slot, while every parser is busy and the queue is full.
+                await queue.put((index, url, page.content))
+        except Exception as e:
+            # Every URL gets an answer, so the consumer is never left waiting for a lost one.
+            finished.put_nowait((index, f'Error in state request: {e!r}'))
+
+    async def parse() -> None:
+        while True:
+            index, url, content = await queue.get()
+            try:
+                with span('parse.profile', bytes=len(content), worker='process') as parsing:
+                    try:
+                        doctor = await loop.run_in_executor(pool, parse_page, url, content)
+                    except Exception as e:
+                        doctor = f'Error parsing {url}: {e!r}'
+                    if isinstance(doctor, str):
+                        parsing.fail(doctor)
+                    else:
+                        await asyncio.to_thread(cache.set, f'profile:{url}', doctor)
+                finished.put_nowait((index, doctor))
+            finally:
+                queue.task_done()
+
+    tasks = [asyncio.create_task(parse()) for _ in range(workers)]
+    tasks += [asyncio.create_task(download(index, url)) for index, url in enumerate(urls)]
+    try:
+        for _ in urls:
+            yield await finished.get()
+    finally:
+        for task in tasks:
+            task.cancel()
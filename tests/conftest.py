@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+# The stub services shared with the benchmarks (fake Maps client, stub LLM, mock Healthgrades).
+sys.path.insert(0, str(REPO_ROOT / 'benchmarks'))
+
+# Read when the modules are imported: keep caches and stored data out of the user's home and the repo.
+os.environ.setdefault('CARENAV_CACHE_DIR', tempfile.mkdtemp(prefix='carenav-tests-'))
+os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'AIzaFAKEKEYFAKEKEYFAKEKEYFAKEKEYFAKEK')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+from diagnosis_agent.agent import _patient_text
+from diagnosis_agent.cache import DiagnosisCache, age_band, canonical_key, sex
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("I'm having headaches", 'unknown'),
+    ('I’m dizzy', 'unknown'),
+    ('I am a 40 year old woman', 'female'),
+    ("My girl's ear hurts", 'female'),
+    ('Male, chest pain', 'male'),
+    ('45 yo F with a cough', 'female'),
+    ('32 y/o m, back pain', 'male'),
+    ('She has a rash', 'unknown'),
+    ('Fever of 101F', 'unknown'),
+])
+def test_sex_only_from_explicit_words(text, expected):
+    assert sex(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('headaches for 2 years, I am 60 years old', 'middle-aged'),
+    ('a 7-year-old with a fever', 'child'),
+    ('45 yo, cough', 'middle-aged'),
+    ('age 30, knee pain', 'adult'),
+    ('aged 70', 'senior'),
+    ('coughing for 3 years', 'unknown'),
+    ('pain for 10 yrs', 'unknown'),
+])
+def test_age_only_from_age_phrases(text, expected):
+    assert age_band(text) == expected
+
+
+def test_duration_does_not_split_the_key():
+    assert canonical_key('I am 60 years old with headaches for 2 years') == \
+        canonical_key('I am 60 years old and have headaches')
+
+
+def test_similar_description_hits():
+    cache = DiagnosisCache(similarity_threshold=0.5)
+    diagnosis = {'diagnosis': 'Migraine', 'specialty': 'Neurology'}
+    cache.store('I am a 30 year old woman with bad headaches and nausea', diagnosis)
+    entry = cache.lookup("I'm a 30 year old woman, headaches and nausea")
+    assert entry is not None and entry.diagnosis == diagnosis
+    assert cache.lookup("I'm a 30 year old man, headaches and nausea") is None
+
+
+def event(author, text, invocation_id):
+    content = types.Content(role='user' if author == 'user' else 'model', parts=[types.Part(text=text)])
+    return SimpleNamespace(author=author, content=content, invocation_id=invocation_id)
+
+
+def context(events, invocation_id):
+    return SimpleNamespace(session=SimpleNamespace(events=events), invocation_id=invocation_id, user_content=None)
+
+
+def test_patient_text_skips_turns_before_the_last_diagnosis():
+    events = [
+        event('user', 'I have a rash', 'a'),
+        event('diagnosis_agent', '{"diagnosis": "Eczema"}', 'a'),
+        event('user', 'I live at 1 Main St, Chicago. My insurance is Aetna.', 'b'),
+        event('search_agent', 'Here are some dermatologists.', 'b'),
+        event('diagnosis_agent', '{"diagnosis": "Eczema"}', 'b'),
+        event('user', 'Now my knee hurts', 'c'),
+    ]
+    assert _patient_text(context(events, 'c')) == 'Now my knee hurts'
+
+
+def test_patient_text_keeps_this_turns_answer_from_resetting():
+    events = [
+        event('user', 'I have a rash', 'a'),
+        event('diagnosis_agent', '{"diagnosis": "Eczema"}', 'a'),
+    ]
+    # cache_diagnosis runs after the agent answered and must key on the same text as the lookup.
+    assert _patient_text(context(events, 'a')) == 'I have a rash'
@@ -0,0 +1,71 @@
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from common.cache import DiskCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    # Uncompressed, so each entry's size is the length of its JSON.
+    return DiskCache(tmp_path / 'cache.sqlite3', max_bytes=100, compress=False)
+
+
+def test_running_total_follows_writes(cache):
+    cache.set('a', 'x' * 20)
+    cache.set('b', 'y' * 10)
+    cache.set('a', 'z' * 5)
+    cache.delete('b')
+    cache.delete('missing')
+    assert cache._total == cache._stored_bytes() == len('"zzzzz"')
+    cache.clear()
+    assert cache._total == 0
+
+
+def test_evicts_least_recently_used_past_max_bytes(cache):
+    for key in 'abc':
+        cache.set(key, 'x' * 28)  # 30 bytes each
+        time.sleep(0.01)
+    cache.get('a')
+    cache.set('d', 'x' * 28)
+    assert cache.get('b') is None
+    assert all(cache.get(key) is not None for key in 'acd')
+    assert cache._total == cache._stored_bytes() <= cache.max_bytes
+
+
+def test_total_is_read_back_when_reopened(cache, tmp_path):
+    cache.set('a', 'x' * 40)
+    assert DiskCache(tmp_path / 'cache.sqlite3', max_bytes=100)._total == 42
+
+
+def test_expired_entries_are_served_stale(tmp_path):
+    cache = DiskCache(tmp_path / 'cache.sqlite3', ttl=0, stale_ttl=60)
+    cache.set('a', {'name': 'Dr. A'})
+    time.sleep(0.01)
+    assert cache.get('a') is None
+    assert cache.get_stale('a') == {'name': 'Dr. A'}
+
+
+def write_repeatedly(path, worker, start):
+    cache = DiskCache(path, max_bytes=10_000, compress=False)
+    start.wait()
+    for i in range(300):
+        cache.set('shared', {'worker': worker, 'i': i})
+        cache.get('shared')
+
+
+def test_processes_can_write_the_same_key(tmp_path):
+    path = tmp_path / 'cache.sqlite3'
+    context = multiprocessing.get_context('fork')
+    start = context.Barrier(2)
+    workers = [context.Process(target=write_repeatedly, args=(path, worker, start)) for worker in (1, 2)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    assert [process.exitcode for process in workers] == [0, 0]
+    cache = DiskCache(path, max_bytes=10_000, compress=False)
+    assert cache.get('shared')['i'] == 299
+    assert cache._total == len(json.dumps(cache.get('shared')))
@@ -0,0 +1,168 @@
+import asyncio
+import gc
+import time
+
+import httpx
+
+from search_agent import fetch
+from search_agent.fetch import AsyncFetchEngine, CircuitBreaker, close_async_engine, get_async_engine
+
+
+def engine_for(handler, breaker, max_retries=0):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return AsyncFetchEngine(client=client, rate=1000, burst=1000, max_retries=max_retries, breaker=breaker)
+
+
+def test_breaker_opens_after_threshold_and_probes_after_cooldown():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.record_failure('h')
+    assert breaker.allow('h') == 'closed'
+    breaker.record_failure('h')
+    assert not breaker.allow('h')
+
+    time.sleep(0.06)
+    assert breaker.allow('h') == 'probe'
+    # Only one probe at a time.
+    assert not breaker.allow('h')
+    breaker.record_success('h')
+    assert breaker.state('h') == 'closed'
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record_failure('h')
+    time.sleep(0.06)
+    assert breaker.allow('h') == 'probe'
+    breaker.record_failure('h')
+    assert breaker.state('h') == 'open'
+
+
+def test_cancelled_probe_is_released():
+    async def scenario():
+        hanging = {'on': True}
+
+        async def handler(request):
+            if hanging['on']:
+                await asyncio.sleep(3600)
+            return httpx.Response(200, content=b'ok')
+
+        breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+        engine = engine_for(handler, breaker)
+        breaker.record_failure('h')
+        await asyncio.sleep(0.06)
+
+        probe = asyncio.create_task(engine.fetch('http://h/profile'))
+        await asyncio.sleep(0.01)
+        assert breaker.state('h') == 'half-open'
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+
+        hanging['on'] = False
+        result = await engine.fetch('http://h/profile')
+        await engine.aclose()
+        return result, breaker.state('h')
+
+    result, state = asyncio.run(scenario())
+    assert result.ok and result.content == b'ok'
+    assert state == 'closed'
+
+
+def test_retries_server_errors_then_succeeds():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503, headers={'Retry-After': '0'})
+        return httpx.Response(200, content=b'ok')
+
+    async def scenario():
+        engine = engine_for(handler, CircuitBreaker(threshold=10), max_retries=3)
+        try:
+            return await engine.fetch('http://h/page')
+        finally:
+            await engine.aclose()
+
+    result = asyncio.run(scenario())
+    assert result.ok
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried_or_transient():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404)
+
+    async def scenario():
+        engine = engine_for(handler, CircuitBreaker(), max_retries=3)
+        try:
+            return await engine.fetch('http://h/missing')
+        finally:
+            await engine.aclose()
+
+    result = asyncio.run(scenario())
+    assert not result.ok and not result.transient
+    assert len(calls) == 1
+
+
+def test_overload_halves_the_host_limit():
+    def handler(request):
+        return httpx.Response(429, headers={'Retry-After': '0'})
+
+    async def scenario():
+        engine = engine_for(handler, CircuitBreaker(), max_retries=0)
+        try:
+            result = await engine.fetch('http://h/page')
+            return result, engine.concurrency.limit('h'), engine.max_connections_per_host
+        finally:
+            await engine.aclose()
+
+    result, limit, maximum = asyncio.run(scenario())
+    assert result.transient
+    assert limit == maximum // 2
+
+
+def test_async_engine_is_closed_explicitly():
+    async def scenario():
+        first = get_async_engine()
+        same = get_async_engine()
+        await close_async_engine()
+        second = get_async_engine()
+        await close_async_engine()
+        return first, same, second
+
+    first, same, second = asyncio.run(scenario())
+    assert first is same and first.client.is_closed
+    assert second is not first and second.client.is_closed
+    # Closing a loop without an engine is a no-op.
+    asyncio.run(close_async_engine())
+
+
+def test_shutdown_plugin_closes_the_engine():
+    from root_agent.shutdown import ShutdownPlugin
+
+    async def scenario():
+        engine = get_async_engine()
+        await ShutdownPlugin().close()
+        return engine
+
+    assert asyncio.run(scenario()).client.is_closed
+
+
+def test_engine_is_dropped_with_a_loop_closed_without_it():
+    loop = asyncio.new_event_loop()
+
+    async def engine():
+        return get_async_engine()
+
+    assert loop.run_until_complete(engine()) is not None
+    assert loop in fetch._async_engines
+    loop.close()
+    del loop
+    gc.collect()
+    assert not [loop for loop in fetch._async_engines if loop.is_closed()]
@@ -0,0 +1,132 @@
+import json
+import os
+import random
+
+import pytest
+from stubs import FakeMapsClient, fake_latlon
+
+from common.telemetry import metrics, span
+from maps_agent.cache import cached_distances, locate_doctors
+from maps_agent.directory import ASSETS_DIR, DoctorDirectory, DoctorRecord
+from maps_agent.distance import driving_distances
+from maps_agent.geo import GeoIndex, haversine_miles
+from maps_agent.ranking import RankingWeights, nearby_doctors, rank_doctors
+
+
+def brute_force(points, lat, lon, k, radius=None):
+    distances = sorted((haversine_miles(lat, lon, *point), i) for i, point in enumerate(points))
+    return [i for miles, i in distances if radius is None or miles <= radius][:k]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_geo_index_matches_brute_force(seed):
+    rng = random.Random(seed)
+    points = [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(300)]
+    index = GeoIndex(points)
+    for _ in range(20):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        assert [i for i, _ in index.nearest(lat, lon, k=7)] == brute_force(points, lat, lon, 7)
+        assert [i for i, _ in index.nearest(lat, lon, k=50, radius=1500)] == brute_force(points, lat, lon, 50, 1500)
+
+
+def test_geo_index_across_the_antimeridian():
+    index = GeoIndex([(0.0, 179.9), (0.0, 170.0), (0.0, -179.9)])
+    nearest = index.nearest(0.0, -179.95, k=2)
+    assert [i for i, _ in nearest] == [2, 0]
+    assert nearest[1][1] == pytest.approx(haversine_miles(0.0, -179.95, 0.0, 179.9))
+
+
+def test_geo_index_edge_cases():
+    assert GeoIndex([]).nearest(0, 0) == []
+    assert GeoIndex([(1.0, 1.0)]).nearest(0, 0, k=0) == []
+    assert len(GeoIndex([(1.0, 1.0), (2.0, 2.0)]).nearest(0, 0, k=10)) == 2
+
+
+@pytest.fixture
+def doctors():
+    with open(os.path.join(ASSETS_DIR, 'doctor_data_test100.json')) as f:
+        return json.load(f)
+
+
+def directory_of(doctors, name):
+    # doctor_index caches per (path, mtime), so every directory built here needs its own.
+    return DoctorDirectory((DoctorRecord.from_dict(doc) for doc in doctors), path=name, mtime=0.0)
+
+
+def test_locate_doctors_geocodes_each_address_once(doctors):
+    client = FakeMapsClient(latency=0)
+    doctors = doctors[:10] + [dict(doctors[0], url='copy')]
+    assert locate_doctors(client, doctors) == 0
+    assert client.calls['geocode'] <= 10
+    assert (doctors[3]['latitude'], doctors[3]['longitude']) == pytest.approx(fake_latlon(doctors[3]['address']))
+
+
+def test_nearby_doctors_fills_the_shortlist_with_unlocated_doctors(doctors):
+    located = doctors[:50]
+    locate_doctors(FakeMapsClient(latency=0), located)
+    directory = directory_of(located + doctors[50:], 'partly-located')
+    patient = fake_latlon('1 Patient St')
+
+    nearest = nearby_doctors(directory, patient, range(len(directory)), shortlist=10)
+    miles = [haversine_miles(*patient, *fake_latlon(directory.records[i].address)) for i in nearest]
+    assert all(i < 50 for i in nearest) and miles == sorted(miles)
+
+    filled = nearby_doctors(directory, patient, range(len(directory)), shortlist=55, radius=10_000)
+    assert filled[50:] == [50, 51, 52, 53, 54]
+
+
+def test_driving_distances_batches_destinations():
+    client = FakeMapsClient(latency=0)
+    destinations = [f'{number} Main St' for number in range(60)]
+    distances = driving_distances(client, 'Origin', destinations, max_workers=1)
+    assert client.calls['distance_matrix'] == 3
+    assert all(miles is not None for miles in distances)
+
+
+def test_cached_distances_only_ask_for_new_destinations():
+    client = FakeMapsClient(latency=0)
+    first = cached_distances(client, '10 Cache Rd', ['1 A St', '2 B St', '1 A St'])
+    assert client.calls['distance_matrix'] == 1
+    second = cached_distances(client, '10 Cache Rd', ['2 B St', '1 A St', '3 C St'])
+    assert client.calls['distance_matrix'] == 2
+    assert second[:2] == [first[1], first[0]]
+
+
+def test_rank_doctors_filters_and_orders(doctors):
+    client = FakeMapsClient(latency=0)
+    locate_doctors(client, doctors)
+    directory = directory_of(doctors, 'ranked')
+    ranked = rank_doctors(client, directory, '100 Rank Ave, Chicago, IL', k=5, specialty='Oncology',
+                          min_rating=4.0, radius=10_000)
+    assert 0 < len(ranked) <= 5
+    assert [doctor.rank_score for doctor in ranked] == sorted((doctor.rank_score for doctor in ranked), reverse=True)
+    assert all(doctor.specialty == 'Oncology' and doctor.rating >= 4.0 and doctor.accepting_new_patients
+               for doctor in ranked)
+
+
+def test_rank_doctors_places_an_uncoordinated_directory(doctors):
+    client = FakeMapsClient(latency=0)
+    directory = directory_of(doctors, 'uncoordinated')
+    patient = '1 Sheridan Rd, Zion, IL'
+    nearest_only = RankingWeights(distance=1, rating=0, reviews=0, experience=0)
+    ranked = rank_doctors(client, directory, patient, k=3, weights=nearest_only, specialty='Oncology', shortlist=5,
+                          radius=10_000)
+
+    candidates = [directory.records[i] for i in directory.select(specialty='Oncology', accepting_new_patients=True)]
+    miles = driving_distances(client, patient, [record.address for record in candidates])
+    closest = sorted(zip(miles, (record.url for record in candidates)))[:3]
+    assert [doctor.url for doctor in ranked] == [url for _, url in closest]
+
+
+def test_failed_distance_batches_are_recorded_not_printed(capsys):
+    class FailingClient(FakeMapsClient):
+        def distance_matrix(self, origins, destinations, **kwargs):
+            raise RuntimeError('quota exceeded')
+
+    with span('test.distances') as parent:
+        distances = driving_distances(FailingClient(latency=0), 'Origin', ['1 A St', '2 B St'])
+    assert distances == [None, None]
+    assert capsys.readouterr().out == ''
+    assert 'span="googlemaps.distance_matrix",status="error"' in metrics.text()
+    # The caller still gets its answer; only the failed request is marked.
+    assert parent.status == 'ok'
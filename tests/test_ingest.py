@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+
+from search_agent import ingest
+from search_agent.ingest import load_store, normalize_profile
+
+
+def profile(url, experience='15 years', address='1 Main St Chicago, IL 60601'):
+    return {
+        'name': f'Dr. {url}', 'url': url, 'specialty': 'Neurology', 'experience': experience, 'bio': '',
+        'address': address, 'conditions': ['Migraine', ''], 'procedures': [], 'score': 4.5, 'qty_reviews': '12',
+        'accepting_new_patients': True,
+        'insurance_data': [{'carrierName': 'Aetna', 'plans': [{'name': 'Aetna PPO'}]}],
+    }
+
+
+def test_normalize_profile_matches_the_directory_schema():
+    record = normalize_profile(profile('a'), 'neurology', fetched_at=100.04)
+    assert record['experience'] == '15'
+    assert record['insurance_plans'] == ['Aetna', 'Aetna PPO']
+    assert record['conditions'] == ['Migraine']
+    assert record['score'] == '4.5'
+    assert (record['specialty_query'], record['fetched_at']) == ('neurology', 100.0)
+    assert 'insurance_data' not in record
+    assert normalize_profile(profile('b', experience=None), 'neurology')['experience'] == 'not listed'
+
+
+class Healthgrades:
+    """Search pages of two profiles each; `fail_on` raises (like a killed run) when that page is requested."""
+
+    def __init__(self, pages=3):
+        self.pages = {page: [f'p{page}-{i}' for i in range(2)] for page in range(1, pages + 1)}
+        self.searched, self.fetched = [], []
+        self.fail_on = None
+
+    async def fetch_profile_urls(self, specialty, latitude, longitude, page=1):
+        if page == self.fail_on:
+            raise KeyboardInterrupt
+        self.searched.append(page)
+        return self.pages.get(page, [])
+
+    async def parse_doctor_information(self, url, allow_stale=True):
+        self.fetched.append(url)
+        return profile(url)
+
+
+@pytest.fixture
+def healthgrades(monkeypatch):
+    site = Healthgrades()
+    monkeypatch.setattr(ingest, 'fetch_profile_urls', site.fetch_profile_urls)
+    monkeypatch.setattr(ingest, 'parse_doctor_information', site.parse_doctor_information)
+    monkeypatch.setattr(ingest, 'use_workers', lambda: False)
+    return site
+
+
+def run(out, **kwargs):
+    return asyncio.run(ingest.ingest(['Neurology'], 41.88, -87.63, str(out), **kwargs))
+
+
+def test_interrupted_ingest_resumes_without_duplicates(healthgrades, tmp_path):
+    out = tmp_path / 'directory.jsonl'
+    healthgrades.fail_on = 2
+    with pytest.raises(KeyboardInterrupt):
+        run(out, pages=3)
+    assert healthgrades.searched == [1]
+    assert json.loads((tmp_path / 'directory.jsonl.checkpoint.json').read_text())['pages'] == {'Neurology': 1}
+    # A run killed mid-write leaves a truncated line behind.
+    with open(out, 'a') as f:
+        f.write('{"url": "p2-0", "na')
+
+    healthgrades.fail_on = None
+    stats = run(out, pages=3)
+    assert healthgrades.searched == [1, 2, 3]
+    assert healthgrades.fetched.count('p1-0') == 1
+    assert stats == {'fetched': 4, 'fresh': 0, 'unlocated': 0, 'errors': 0}
+    urls = [json.loads(line)['url'] for line in out.read_text().splitlines()]
+    assert urls == ['p1-0', 'p1-1', 'p2-0', 'p2-1', 'p3-0', 'p3-1']
+    assert not (tmp_path / 'directory.jsonl.checkpoint.json').exists()
+
+
+def test_rerun_only_refreshes_stale_records(healthgrades, tmp_path):
+    out = tmp_path / 'directory.jsonl'
+    run(out, pages=2)
+    store = load_store(str(out))
+    store['p1-0']['fetched_at'] = 0
+    store['p1-0']['latitude'], store['p1-0']['longitude'] = 41.9, -87.6
+    ingest.write_store(str(out), store)
+
+    healthgrades.fetched.clear()
+    stats = run(out, pages=2)
+    assert healthgrades.fetched == ['p1-0']
+    assert (stats['fetched'], stats['fresh']) == (1, 3)
+    # The address did not change, so the refreshed record keeps its coordinates.
+    assert load_store(str(out))['p1-0']['latitude'] == 41.9
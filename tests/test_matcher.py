@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from insurance_agent.batch import check_insurance_batch
+from insurance_agent.matcher import NO_PLANS_REASON, check_insurance, match_insurance, plan_carriers
+
+
+def accepts(patient_plan, doctor_plans):
+    verdict = match_insurance(patient_plan, doctor_plans)
+    return None if verdict is None else verdict['acceptsInsurance']
+
+
+@pytest.mark.parametrize('patient_plan, doctor_plans, expected', [
+    ('UNH', ['UnitedHealthcare Choice Plus'], True),
+    ('Aetna', ['aetna ppo'], True),
+    ('BCBS', ['Highmark Blue Cross Blue Shield'], True),
+    ('Cigna', ['Aetna', 'Humana'], False),
+    ('Blue Cross', ['Blue Shield of California'], False),
+    ('Medicare', ['Medicare'], True),
+    ('Medicare', ['Aetna PPO'], False),
+])
+def test_clear_cases(patient_plan, doctor_plans, expected):
+    assert accepts(patient_plan, doctor_plans) is expected
+
+
+@pytest.mark.parametrize('patient_plan, doctor_plans', [
+    ('Medicare', ['Aetna Medicare Advantage']),
+    ('Aetna Medicare Advantage', ['Medicare']),
+    ('Humana Medicaid', ['Medicaid']),
+    ('Aetna', ['Aetna Medicare Advantage']),
+    ('Tricare', ['Humana Military Tricare']),
+])
+def test_government_program_with_another_carrier_is_undecided(patient_plan, doctor_plans):
+    assert accepts(patient_plan, doctor_plans) is None
+
+
+def test_exact_plan_wins_over_an_undecided_one():
+    assert accepts('Aetna Medicare Advantage', ['Medicare', 'Aetna Medicare Advantage']) is True
+
+
+@pytest.mark.parametrize('doctor_plans', [None, [], {'carriers': []}])
+def test_missing_plans_are_undecided(doctor_plans):
+    assert match_insurance('Aetna', doctor_plans) is None
+    assert check_insurance('Aetna', doctor_plans) == {'acceptsInsurance': None, 'reason': NO_PLANS_REASON}
+
+
+def test_batch_does_not_ask_the_model_about_missing_plans():
+    verdicts = asyncio.run(check_insurance_batch('Aetna', [
+        {'url': 'a', 'insurance_data': None},
+        {'url': 'b', 'insurance_plans': ['Aetna HMO']},
+    ]))
+    assert verdicts['a']['acceptsInsurance'] is None
+    assert verdicts['b']['acceptsInsurance'] is True
+
+
+def test_plan_carriers_prefers_longer_aliases():
+    assert plan_carriers('Blue Shield of California PPO') == {'blue shield of california'}
+    assert plan_carriers('Highmark (Blue Cross Blue Shield affiliate)') == {'highmark', 'blue cross blue shield'}
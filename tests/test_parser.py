@@ -0,0 +1,16 @@
+import pytest
+from bench_parser import FIXTURES_DIR, parse_single_pass, parse_with_soup
+
+URL = 'https://www.healthgrades.com/physician/dr-test-abc12'
+
+
+@pytest.mark.parametrize('fixture', sorted(FIXTURES_DIR.glob('*.html')), ids=lambda path: path.stem)
+def test_single_pass_parser_matches_beautifulsoup(fixture):
+    content = fixture.read_bytes()
+    assert parse_single_pass(URL, content) == parse_with_soup(URL, content)
+
+
+def test_fixtures_cover_both_accepting_states():
+    accepting = {parse_single_pass(URL, path.read_bytes())['accepting_new_patients']
+                 for path in FIXTURES_DIR.glob('*.html')}
+    assert accepting == {True, False}
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+from stubs import FakeMapsClient
+
+import maps_agent.agent
+from maps_agent.cache import locate_doctors
+from maps_agent.directory import ASSETS_DIR
+from root_agent import pipeline
+from root_agent.pipeline import RESULTS_STATE_KEY, find_providers, refine_results
+
+
+def doctor(url, miles, score, experience, reviews, accepts=True):
+    return {'name': f'Dr. {url}', 'url': url, 'specialty': 'Neurology', 'address': f'{url} Main St',
+            'experience': experience, 'score': score, 'qty_reviews': reviews, 'distance_miles': miles,
+            'accepts_insurance': accepts, 'insurance_reason': None, 'rank_score': 0.5}
+
+
+@pytest.fixture
+def context():
+    # Stored in rank order, as find_providers leaves it.
+    return SimpleNamespace(state={RESULTS_STATE_KEY: {
+        'query': {},
+        'insurance_plan': 'Aetna',
+        'doctors': [
+            doctor('a', 12.0, '4.5', '20', '10'),
+            doctor('b', 3.0, '3.9', '5', '200'),
+            doctor('c', None, '4.9', 'not listed', '1,200'),
+            doctor('d', 1.0, '5.0', '40', '3', accepts=False),
+            doctor('e', 8.0, '', '12', '0', accepts=None),
+        ],
+        'insurance_plans': {'a': ['Aetna PPO'], 'b': ['Cigna'], 'c': [], 'd': ['Cigna HMO'], 'e': ['Aetna']},
+    }})
+
+
+def urls(result):
+    return [doctor['url'] for doctor in result['doctors']]
+
+
+def test_refine_needs_an_earlier_search():
+    assert 'error' in refine_results(tool_context=SimpleNamespace(state={}))
+    assert 'error' in refine_results()
+
+
+def test_refine_rejects_unknown_sort_orders(context):
+    assert 'error' in refine_results(sort_by='price', tool_context=context)
+
+
+@pytest.mark.parametrize('sort_by, expected', [
+    ('rank', ['a', 'b', 'c', 'e']),
+    ('distance', ['b', 'e', 'a', 'c']),
+    ('rating', ['c', 'a', 'b', 'e']),
+    ('reviews', ['c', 'b', 'a', 'e']),
+    ('experience', ['a', 'e', 'b', 'c']),
+])
+def test_refine_sorts_without_the_rejected_doctors(context, sort_by, expected):
+    assert urls(refine_results(sort_by=sort_by, tool_context=context)) == expected
+
+
+def test_refine_filters(context):
+    assert urls(refine_results(max_distance_miles=10, tool_context=context)) == ['b', 'e']
+    assert urls(refine_results(min_rating=4.0, tool_context=context)) == ['a', 'c']
+    assert urls(refine_results(min_experience_years=10, tool_context=context)) == ['a', 'e']
+
+
+def test_refine_rechecks_a_different_plan_locally(context):
+    result = refine_results(insurance_plan='Cigna', tool_context=context)
+    assert urls(result) == ['b', 'c', 'd']
+    assert [doctor['accepts_insurance'] for doctor in result['doctors']] == [True, None, True]
+    # The searched plan keeps the stored verdicts.
+    assert urls(refine_results(insurance_plan=' aetna ', tool_context=context)) == ['a', 'b', 'c', 'e']
+
+
+def test_refine_pages(context):
+    first = refine_results(page_size=3, tool_context=context)
+    last = refine_results(page=9, page_size=3, tool_context=context)
+    assert (urls(first), first['pages'], first['total_found']) == (['a', 'b', 'c'], 2, 4)
+    assert (urls(last), last['page']) == (['e'], 2)
+
+
+@pytest.fixture
+def directory_path(tmp_path, monkeypatch):
+    with open(os.path.join(ASSETS_DIR, 'doctor_data_test100.json')) as f:
+        doctors = json.load(f)
+    client = FakeMapsClient(latency=0)
+    locate_doctors(client, doctors)
+    path = tmp_path / 'doctors.json'
+    path.write_text(json.dumps(doctors))
+    monkeypatch.setattr(pipeline, 'DIRECTORY_PATH', str(path))
+    monkeypatch.setattr(maps_agent.agent, 'gmaps', client)
+    return path
+
+
+def test_find_providers_from_the_directory_then_refine(directory_path):
+    context = SimpleNamespace(state={})
+    result = asyncio.run(find_providers('Neurology', '1 Lake Shore Dr, Chicago, IL', tool_context=context))
+    assert result['source'] == 'directory'
+    assert result['total_found'] == 5 and len(result['doctors']) == 5
+    scores = [doctor['rank_score'] for doctor in result['doctors']]
+    assert scores == sorted(scores, reverse=True)
+
+    client = maps_agent.agent.gmaps
+    calls = dict(client.calls)
+    again = asyncio.run(find_providers('neurology ', '1 Lake Shore Dr,  Chicago, IL', tool_context=context))
+    assert again['source'] == 'session' and again['doctors'] == result['doctors']
+    assert client.calls == calls
+
+    nearest = refine_results(sort_by='distance', page_size=2, tool_context=context)
+    miles = [doctor['distance_miles'] for doctor in result['doctors']]
+    assert [doctor['distance_miles'] for doctor in nearest['doctors']] == sorted(miles)[:2]
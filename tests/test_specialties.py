@@ -0,0 +1,47 @@
+import pytest
+
+from diagnosis_agent.specialties import CORE_SPECIALTIES, DEFAULT_SPECIALTY, get_resolver
+
+ENT = 'Ear, Nose, and Throat'
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Neurology', 'Neurology'),
+    ('  neurology ', 'Neurology'),
+    ('ENT', ENT),
+    ('Otolaryngologist', ENT),
+    ('Obstetrics and Gynecology', 'Obstetrics & Gynecology'),
+    ('a pediatrician', 'Pediatrics'),
+    ('Pediatric Cardiology', 'Pediatric Cardiology'),
+    ('Cardiolgy', 'Cardiology'),
+])
+def test_match(text, expected):
+    assert get_resolver().match(text) == expected
+
+
+@pytest.mark.parametrize('text', ['', 'someone nice', 'astrology'])
+def test_unknown_answers_fall_back_to_the_default(text):
+    assert get_resolver().match(text) is None
+    assert get_resolver().resolve(text) == DEFAULT_SPECIALTY
+
+
+@pytest.mark.parametrize('symptoms, expected', [
+    ('My ear hurts', ENT),
+    ('Both ears ring and I have an earache', ENT),
+    ('I feel dizzy', 'Neurology'),
+    ('Dizziness when I stand up', 'Neurology'),
+    ('Itching all over', 'Dermatology'),
+])
+def test_shortlist_leads_with_hinted_specialties(symptoms, expected):
+    assert get_resolver().shortlist(symptoms)[0] == expected
+
+
+@pytest.mark.parametrize('symptoms', [
+    'I woke up early and earlier than usual yesterday; I earn little',
+    'It happens periodically, a number of times',
+    'After football practice',
+])
+def test_words_that_only_start_like_a_hint_do_not_match(symptoms):
+    resolver = get_resolver()
+    core = [name for name in CORE_SPECIALTIES if name in resolver.specialties]
+    assert resolver.shortlist(symptoms) == core[:15]
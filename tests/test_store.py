@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+from stubs import FakeMapsClient
+
+from maps_agent.directory import ASSETS_DIR, DoctorDirectory, DoctorRecord
+from maps_agent.ranking import rank_doctors
+from maps_agent.store import ColumnarDirectory, write_store
+
+
+@pytest.fixture
+def records():
+    with open(os.path.join(ASSETS_DIR, 'doctor_data_test100.json')) as f:
+        doctors = json.load(f)
+    doctors[0].update(score='4.75', latitude=41.88, longitude=-87.63)
+    doctors[1].update(score='')
+    return [DoctorRecord.from_dict(doc) for doc in doctors]
+
+
+def test_round_trip(records, tmp_path):
+    write_store(records, str(tmp_path))
+    store = ColumnarDirectory(str(tmp_path))
+    assert list(store) == records
+    assert store.records[0].score == '4.75'
+    assert store.coordinates()[:2] == [(41.88, -87.63), None]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+@pytest.mark.parametrize('criteria', [
+    {'accepting_new_patients': True},
+    {'accepting_new_patients': False},
+    {'specialty': 'oncology', 'accepting_new_patients': True},
+    {'insurance': 'Aetna', 'accepting_new_patients': False},
+    {'specialty': '4.75'},
+])
+def test_select_matches_the_json_directory(records, tmp_path, criteria):
+    write_store(records, str(tmp_path))
+    assert ColumnarDirectory(str(tmp_path)).select(**criteria) == DoctorDirectory(records).select(**criteria)
+
+
+def test_rewrite_leaves_an_open_store_readable(records, tmp_path):
+    write_store(records, str(tmp_path))
+    store = ColumnarDirectory(str(tmp_path))
+    write_store(records[:10], str(tmp_path))
+    assert store.records[-1] == records[-1]
+    assert len(ColumnarDirectory(str(tmp_path))) == 10
+
+
+def test_value_reads_single_fields(records, tmp_path):
+    write_store(records, str(tmp_path))
+    store = ColumnarDirectory(str(tmp_path))
+    for i in (0, 1, 50):
+        assert [store.value(field, i) for field in DoctorRecord._fields] == list(records[i])
+
+
+def test_ranking_only_builds_the_shortlisted_records(records, tmp_path, monkeypatch):
+    write_store(records, str(tmp_path))
+    store = ColumnarDirectory(str(tmp_path))
+    built = []
+    record = ColumnarDirectory.record
+    monkeypatch.setattr(ColumnarDirectory, 'record', lambda self, i: built.append(i) or record(self, i))
+
+    ranked = rank_doctors(FakeMapsClient(latency=0), store, '1 Lake Shore Dr, Chicago, IL', k=3,
+                          specialty='Oncology', insurance='Aetna', min_rating=4.0, min_experience=5, shortlist=5)
+    assert 0 < len(ranked) <= 3
+    assert len(built) <= 5
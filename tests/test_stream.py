@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from search_agent import agent, stream
+
+
+@pytest.fixture
+def healthgrades(monkeypatch):
+    """Three search pages listing overlapping profiles; profile i takes i * 10 ms."""
+    pages = {1: ['p3', 'p1', 'bad'], 2: ['p1', 'p2', 'p6'], 3: ['p5', 'p4'], 4: []}
+    fetched, cancelled = [], []
+
+    async def fetch_profile_urls(specialty, latitude, longitude, page=1):
+        return pages[page] if page in pages else 'HTTP 500'
+
+    async def parse_doctor_information(url, allow_stale=True):
+        fetched.append(url)
+        if url == 'bad':
+            return 'Error in state request: HTTP 404'
+        try:
+            await asyncio.sleep(int(url[1:]) / 100)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return {'url': url, 'accepting_new_patients': url != 'p1', 'insurance_data': ['Aetna PPO']}
+
+    monkeypatch.setattr(stream, 'fetch_profile_urls', fetch_profile_urls)
+    monkeypatch.setattr(stream, 'parse_doctor_information', parse_doctor_information)
+    return fetched, cancelled
+
+
+def collect(generator):
+    async def run():
+        return [entry async for entry in generator]
+    return asyncio.run(run())
+
+
+def test_profiles_arrive_in_completion_order_with_structured_errors(healthgrades):
+    entries = collect(stream.stream_doctors('Neurology', 41.9, -87.6))
+    assert [entry['status'] for entry in entries] == ['page', 'error', 'ok', 'ok']
+    assert entries[1] == {'status': 'error', 'position': 2, 'url': 'bad', 'error': 'Error in state request: HTTP 404'}
+    assert [(entry['position'], entry['url'], entry['suitable']) for entry in entries[2:]] == \
+        [(1, 'p1', False), (0, 'p3', True)]
+
+
+def test_stops_after_enough_suitable_doctors_and_cancels_the_rest(healthgrades):
+    fetched, cancelled = healthgrades
+    entries = collect(stream.stream_doctors('Neurology', 41.9, -87.6, max_pages=4, stop_after=2))
+    assert [entry['url'] for entry in entries if entry['status'] == 'ok'] == ['p1', 'p2', 'p3']
+    assert sorted(cancelled) == ['p4', 'p5', 'p6']
+    # A profile listed on two pages is fetched once.
+    assert fetched.count('p1') == 1
+
+
+def test_insurance_decides_what_is_suitable(healthgrades):
+    entries = collect(stream.stream_doctors('Neurology', 41.9, -87.6, patient_insurance='Cigna'))
+    assert all(not entry['suitable'] and entry['insurance']['acceptsInsurance'] is False
+               for entry in entries if entry['status'] == 'ok')
+
+
+def test_get_doctors_list_keeps_search_order_and_reports_failures(healthgrades):
+    doctors = asyncio.run(agent.get_doctors_list('Neurology', 41.9, -87.6))
+    assert [doctor['url'] for doctor in doctors] == ['p3', 'p1', 'bad']
+    assert doctors[2] == {'url': 'bad', 'error': 'Error in state request: HTTP 404'}
+    assert asyncio.run(agent.get_doctors_list('Neurology', 41.9, -87.6, page=9)) == 'HTTP 500'
+
+
+def test_crawl_fetches_each_profile_once_and_keeps_search_order(healthgrades):
+    fetched, _ = healthgrades
+    crawl = asyncio.run(agent.crawl_doctors('Neurology', 41.9, -87.6, target_count=10, max_pages=6))
+    assert [doctor['url'] for doctor in crawl['doctors']] == ['p3', 'p1', 'p2', 'p6', 'p5', 'p4']
+    assert sorted(fetched) == ['bad', 'p1', 'p2', 'p3', 'p4', 'p5', 'p6']
+    # The empty fourth page ends the crawl before the failing fifth one is reported.
+    assert (crawl['pages_searched'], crawl['accepted_count']) == (4, 5)
+    assert crawl['errors'] == [{'url': 'bad', 'error': 'Error in state request: HTTP 404'}]
+
+
+def test_crawl_skips_a_page_listing_only_known_profiles(healthgrades, monkeypatch):
+    fetched, _ = healthgrades
+    pages = {1: ['p2', 'p3'], 2: ['p3', 'p2'], 3: ['p1']}
+
+    async def fetch_profile_urls(specialty, latitude, longitude, page=1):
+        return pages.get(page, 'HTTP 500')
+
+    monkeypatch.setattr(stream, 'fetch_profile_urls', fetch_profile_urls)
+    crawl = asyncio.run(agent.crawl_doctors('Neurology', 41.9, -87.6, target_count=10, max_pages=4))
+    assert [doctor['url'] for doctor in crawl['doctors']] == ['p2', 'p3', 'p1']
+    assert sorted(fetched) == ['p1', 'p2', 'p3']
+    assert crawl['errors'][0]['error'] == 'HTTP 500'
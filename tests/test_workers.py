@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from stubs import PROFILES
+
+from search_agent import workers
+from search_agent.fetch import AsyncFetchEngine, CircuitBreaker
+from search_agent.workers import fetch_profiles, iter_profiles, parse_page
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """Profiles served through a mock transport; URLs ending in "missing" are 404s."""
+    requests = []
+
+    def handler(request):
+        requests.append(str(request.url))
+        if str(request.url).endswith('missing'):
+            return httpx.Response(404)
+        return httpx.Response(200, content=PROFILES[len(requests) % len(PROFILES)])
+
+    def engine():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return AsyncFetchEngine(client=client, rate=1000, burst=1000, max_retries=0, breaker=CircuitBreaker())
+
+    monkeypatch.setattr(workers, 'get_async_engine', engine)
+    return requests
+
+
+def urls(count):
+    # Unique per test, so the shared profile cache starts empty.
+    run = uuid.uuid4().hex
+    return [f'http://h/physician/{run}-{i}' for i in range(count)]
+
+
+def test_results_keep_url_order_and_are_cached(site):
+    batch = urls(5) + ['http://h/physician/missing']
+    with ThreadPoolExecutor(2) as pool:
+        doctors = asyncio.run(fetch_profiles(batch, pool=pool, workers=2, allow_stale=False))
+        assert [doctor['url'] for doctor in doctors[:5]] == batch[:5]
+        assert doctors[5].startswith('Error in state request:') and 'HTTP 404' in doctors[5]
+        assert asyncio.run(fetch_profiles(batch[:5], pool=pool, workers=2)) == doctors[:5]
+    assert len(site) == 6
+
+
+def test_downloads_wait_for_the_parsers(site, monkeypatch):
+    release = threading.Event()
+
+    def slow_parse(url, content):
+        release.wait(5)
+        return parse_page(url, content)
+
+    monkeypatch.setattr(workers, 'parse_page', slow_parse)
+
+    async def scenario(pool):
+        task = asyncio.create_task(fetch_profiles(urls(10), pool=pool, workers=1, fetch_concurrency=1, queue_size=1))
+        await asyncio.sleep(0.3)
+        # One page parsing, one queued and one download holding its slot until the queue has room.
+        waiting = len(site)
+        release.set()
+        return waiting, await task
+
+    with ThreadPoolExecutor(1) as pool:
+        waiting, doctors = asyncio.run(scenario(pool))
+    assert waiting == 3
+    assert all(isinstance(doctor, dict) for doctor in doctors)
+
+
+def test_closing_the_iterator_cancels_the_rest(site):
+    async def scenario(pool):
+        profiles = iter_profiles(urls(20), pool=pool, workers=1, fetch_concurrency=1, queue_size=1)
+        first = await profiles.__anext__()
+        await profiles.aclose()
+        await asyncio.sleep(0.1)
+        return first
+
+    with ThreadPoolExecutor(1) as pool:
+        index, doctor = asyncio.run(scenario(pool))
+    assert index == 0 and isinstance(doctor, dict)
+    assert len(site) < 20